@@ -0,0 +1,265 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+from instrumentacion import contar, tramo
+
+# Configuración de conexión a PostgreSQL (se puede sobrescribir con variables de entorno)
+PARAMETROS_CONEXION = {
+    "dbname": os.environ.get("PANCHITA_DB_NOMBRE", "dpanchita2"),
+    "user": os.environ.get("PANCHITA_DB_USUARIO", "postgres"),
+    "password": os.environ.get("PANCHITA_DB_CLAVE", "123456"),
+    "host": os.environ.get("PANCHITA_DB_HOST", "localhost"),
+    "port": os.environ.get("PANCHITA_DB_PUERTO", "5432"),
+}
+
+# Tamaño del pool de conexiones por proceso
+MIN_CONEXIONES = 1
+MAX_CONEXIONES = int(os.environ.get("PANCHITA_DB_MAX_CONEXIONES", "8"))
+
+# Espera máxima por una conexión libre cuando todas están prestadas
+ESPERA_CONEXION_SEGUNDOS = float(os.environ.get("PANCHITA_DB_ESPERA_CONEXION", "30"))
+
+# Límites de la caché de resultados
+TTL_CACHE_SEGUNDOS = 300
+MAX_ENTRADAS_CACHE = 128
+MAX_BYTES_CACHE = 256 * 1024 * 1024
+
+# Cada cuántos segundos se vuelve a comprobar si Hechos_Ventas cambió
+INTERVALO_VERIFICACION_SEGUNDOS = 5
+
+# Versión de la tabla de hechos: último id_venta y contador de cambios de PostgreSQL. Los
+# contadores se suman sobre el árbol de particiones (con la tabla sin particionar es ella sola).
+QUERY_VERSION_HECHOS = '''
+    SELECT (SELECT COALESCE(MAX(id_venta), 0) FROM Hechos_Ventas) AS max_id_venta,
+           (SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+              FROM pg_stat_user_tables
+             WHERE relid IN (SELECT relid FROM pg_partition_tree('hechos_ventas'))) AS cambios
+'''
+
+# Horizonte seguro para procesar ventas por id_venta: el MAX visible y la foto de transacciones
+# de la misma sentencia. Una transacción abierta puede confirmar más tarde un id_venta menor que
+# ese MAX (la secuencia no espera al COMMIT), así que solo sin transacciones en curso vale ya.
+QUERY_HORIZONTE_VENTAS = '''
+    SELECT (SELECT COALESCE(MAX(id_venta), 0) FROM Hechos_Ventas) AS max_id_venta,
+           txid_snapshot_xmin(txid_current_snapshot()) AS xmin,
+           txid_snapshot_xmax(txid_current_snapshot()) AS xmax,
+           NOT EXISTS (SELECT 1 FROM txid_snapshot_xip(txid_current_snapshot()) AS x
+                       WHERE x IS DISTINCT FROM txid_current_if_assigned()) AS sin_pendientes
+'''
+
+_pool = None
+_cupos = None
+_pid_pool = None
+_candado_pool = threading.Lock()
+
+
+# Pool de conexiones del proceso actual (se recrea si el proceso fue bifurcado) y sus cupos.
+# psycopg2 se importa y la conexión se abre solo cuando la primera consulta lo necesita.
+def obtener_pool():
+    from psycopg2 import pool
+
+    global _pool, _cupos, _pid_pool
+    with _candado_pool:
+        if _pool is None or _pool.closed or _pid_pool != os.getpid():
+            _pool = pool.ThreadedConnectionPool(MIN_CONEXIONES, MAX_CONEXIONES, **PARAMETROS_CONEXION)
+            _cupos = threading.BoundedSemaphore(MAX_CONEXIONES)
+            _pid_pool = os.getpid()
+        return _pool, _cupos
+
+
+# Préstamo de una conexión del pool; se devuelve siempre al terminar. ThreadedConnectionPool
+# lanza PoolError en cuanto no quedan conexiones, así que los cupos hacen esperar a quien llega
+# con el pool lleno (hasta ESPERA_CONEXION_SEGUNDOS).
+@contextmanager
+def conexion():
+    pool_actual, cupos = obtener_pool()
+    if not cupos.acquire(timeout=ESPERA_CONEXION_SEGUNDOS):
+        from psycopg2.pool import PoolError
+
+        raise PoolError(f"Sin conexiones libres tras {ESPERA_CONEXION_SEGUNDOS:g} s de espera")
+    try:
+        conn = pool_actual.getconn()
+    except Exception:
+        cupos.release()
+        raise
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool_actual.putconn(conn, close=bool(conn.closed))
+        cupos.release()
+
+
+# Hasta qué id_venta se puede procesar sin saltarse ventas que aún no se confirmaron. Devuelve
+# (hasta, pendiente): `hasta` es None si todavía no es seguro avanzar y `pendiente` es el candidato
+# (MAX de id_venta, siguiente xid de entonces) que se debe guardar para la próxima llamada. El
+# candidato se acepta cuando ya terminaron todas las transacciones que existían al anotarlo.
+def horizonte_ventas(cur, pendiente=None):
+    cur.execute(QUERY_HORIZONTE_VENTAS)
+    maximo, xmin, xmax, sin_pendientes = cur.fetchone()
+    if sin_pendientes:
+        return maximo, None
+    if pendiente is None:
+        return None, (maximo, xmax)
+    if xmin >= pendiente[1]:
+        return pendiente[0], (maximo, xmax)
+    return None, pendiente
+
+
+# Cerrar todas las conexiones del pool (por ejemplo al terminar un script)
+def cerrar_pool():
+    global _pool, _cupos
+    with _candado_pool:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+        _cupos = None
+
+
+# Normaliza el SQL para la clave de caché: espacios y mayúsculas fuera de los literales
+def normalizar_sql(query):
+    partes = re.split(r"('(?:[^']|'')*')", query)
+    normalizadas = []
+    for i, parte in enumerate(partes):
+        if i % 2 == 1:
+            normalizadas.append(parte)
+        else:
+            normalizadas.append(re.sub(r"\s+", " ", parte).lower())
+    return "".join(normalizadas).strip().rstrip(";").strip()
+
+
+def clave_parametros(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return tuple(sorted((k, repr(v)) for k, v in params.items()))
+    return tuple(repr(v) for v in params)
+
+
+# Caché LRU de DataFrames con expiración por tiempo y límite de entradas/bytes
+class CacheConsultas:
+    def __init__(self, ttl=TTL_CACHE_SEGUNDOS, max_entradas=MAX_ENTRADAS_CACHE, max_bytes=MAX_BYTES_CACHE):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        # Se incrementa en cada limpieza; permite a otras cachés saber que los datos cambiaron
+        self.generacion = 0
+
+    def obtener(self, clave):
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            df, creado, tamano = entrada
+            if time.monotonic() - creado > self.ttl:
+                self._quitar(clave)
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return df
+
+    def guardar(self, clave, df):
+        tamano = int(df.memory_usage(deep=True).sum())
+        if tamano > self.max_bytes:
+            return
+        with self._candado:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (df, time.monotonic(), tamano)
+            self._bytes += tamano
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._entradas)))
+
+    def limpiar(self):
+        with self._candado:
+            self._entradas.clear()
+            self._bytes = 0
+            self.generacion += 1
+
+    def _quitar(self, clave):
+        _, _, tamano = self._entradas.pop(clave)
+        self._bytes -= tamano
+
+
+cache_consultas = CacheConsultas()
+
+_version_hechos = None
+_ultima_verificacion = 0.0
+_candado_version = threading.Lock()
+
+
+# Consulta barata (índice de la PK + estadísticas) para detectar cambios en Hechos_Ventas
+def version_hechos():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute(QUERY_VERSION_HECHOS)
+            return tuple(cur.fetchone())
+
+
+# Invalida la caché si Hechos_Ventas cambió desde la última comprobación
+def verificar_cambios(forzar=False):
+    global _version_hechos, _ultima_verificacion
+    with _candado_version:
+        ahora = time.monotonic()
+        if not forzar and ahora - _ultima_verificacion < INTERVALO_VERIFICACION_SEGUNDOS:
+            return _version_hechos
+        version = version_hechos()
+        if version != _version_hechos:
+            cache_consultas.limpiar()
+            _version_hechos = version
+        _ultima_verificacion = ahora
+        return _version_hechos
+
+
+# Ejecutar una consulta sin pasar por la caché. Equivale a pd.read_sql, pero separa el viaje
+# a la base de datos (execute + fetchall) de la construcción del DataFrame para poder medirlos.
+# Con `instantanea` (identificador de pg_export_snapshot) la consulta ve exactamente los mismos
+# datos que la transacción que la exportó, aunque se ejecute en otra conexión.
+def ejecutar_consulta(query, params=None, instantanea=None):
+    with tramo("consulta", "db", consulta=normalizar_sql(query)[:200]) as atributos:
+        with conexion() as conn:
+            with conn.cursor() as cur:
+                if instantanea is not None:
+                    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                    cur.execute("SET TRANSACTION SNAPSHOT %s", (instantanea,))
+                with tramo("consulta:ida_y_vuelta", "db"):
+                    cur.execute(query, params)
+                    filas = cur.fetchall()
+                columnas = [c[0] for c in cur.description]
+        with tramo("consulta:dataframe", "decodificacion"):
+            df = pd.DataFrame.from_records(filas, columns=columnas, coerce_float=True)
+        atributos.update(filas=len(df), bytes=int(df.memory_usage(index=False).sum()))
+    contar("consultas_bd")
+    return df
+
+
+# Función para obtener datos de la base de datos (con pool y caché compartida)
+def obtener_datos(query, params=None, usar_cache=True):
+    if not usar_cache:
+        return ejecutar_consulta(query, params)
+    verificar_cambios()
+    clave = (normalizar_sql(query), clave_parametros(params))
+    df = cache_consultas.obtener(clave)
+    contar("cache_consultas:" + ("fallo" if df is None else "acierto"))
+    if df is None:
+        df = ejecutar_consulta(query, params)
+        cache_consultas.guardar(clave, df)
+    # Copia para que las páginas puedan modificar su DataFrame sin alterar la caché
+    return df.copy()
@@ -0,0 +1,250 @@
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from acceso_datos import MAX_CONEXIONES, cache_consultas, cerrar_pool, obtener_datos, verificar_cambios
+from cache_figuras import CacheFiguras
+from consultas_tablero import REPORTES, Filtros, catalogo, consultas_sin_filtros, obtener_reporte
+from refresco_tablero import ACTIVO as REFRESCO_EN_FONDO, EDAD_REVALIDAR_SEGUNDOS, HILOS_REFRESCO, obtener_refrescador
+
+# Servicio HTTP sin interfaz con los mismos reportes del tablero, para terminales de venta,
+# herramientas de BI o tareas programadas. Usa la instantánea del hilo de refresco (sin filtros)
+# y la caché de consultas y el pool de acceso_datos (con filtros).
+HOST = '127.0.0.1'
+PUERTO = 8600
+
+FORMATOS = {
+    'json': 'application/json; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Las respuestas más pequeñas se envían sin comprimir
+MIN_BYTES_GZIP = 1024
+
+# Respuestas ya codificadas por (reporte, filtros, formato, versión de los datos): la misma LRU
+# por bytes que las figuras. Con cientos de clientes consultando lo mismo, solo el primero paga
+# la consulta y la codificación de cada versión.
+cache_respuestas = CacheFiguras(max_entradas=512, max_bytes=128 * 1024 * 1024)
+
+# Consultas simultáneas a PostgreSQL desde la API (el resto del pool queda para el refresco)
+_consultas_bd = threading.BoundedSemaphore(max(1, MAX_CONEXIONES - HILOS_REFRESCO - 1))
+_candados_claves = {}
+_candado_claves = threading.Lock()
+
+CAMPOS_LISTA = {'anio': 'anios', 'trimestre': 'trimestres', 'mes': 'meses', 'sucursal': 'sucursales',
+                'categoria': 'categorias'}
+RANGOS_VALIDOS = {'trimestres': range(1, 5), 'meses': range(1, 13)}
+
+
+# Filtros desde la query string: ?desde=2024-01-01&hasta=2024-03-31&sucursal=1,2&mes=3&mes=4
+def filtros_desde_parametros(parametros):
+    valores = {}
+    for campo, nombre in (('desde', 'fecha_desde'), ('hasta', 'fecha_hasta')):
+        if parametros.get(campo):
+            try:
+                valores[nombre] = date.fromisoformat(parametros[campo][-1])
+            except ValueError:
+                raise ValueError(f"'{campo}' debe ser una fecha AAAA-MM-DD") from None
+    for campo, nombre in CAMPOS_LISTA.items():
+        textos = [t for valor in parametros.get(campo, []) for t in valor.split(',') if t.strip()]
+        try:
+            numeros = tuple(sorted({int(t) for t in textos}))
+        except ValueError:
+            raise ValueError(f"'{campo}' debe ser una lista de enteros") from None
+        if nombre in RANGOS_VALIDOS and any(n not in RANGOS_VALIDOS[nombre] for n in numeros):
+            raise ValueError(f"'{campo}' fuera de rango")
+        valores[nombre] = numeros
+    return Filtros(**valores)
+
+
+# Versión de los datos que respondería la petición, sin leerlos: el número de la instantánea
+# o, con filtros, la generación de la caché de consultas (que cambia con Hechos_Ventas)
+def version_datos(filtros):
+    if not filtros.activos() and REFRESCO_EN_FONDO:
+        instantanea = obtener_refrescador().instantanea()
+        if instantanea is not None:
+            return ('instantanea', instantanea.numero), instantanea
+    verificar_cambios()
+    return ('consultas', cache_consultas.generacion), None
+
+
+def datos_reporte(nombre, filtros, instantanea):
+    if filtros.activos():
+        return obtener_reporte(nombre, filtros)
+    if instantanea is not None:
+        return instantanea.reporte(nombre)
+    query, params = consultas_sin_filtros()[nombre]
+    return obtener_datos(query, params)
+
+
+def codificar(df, formato):
+    if formato == 'arrow':
+        import pyarrow as pa
+
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        salida = pa.BufferOutputStream()
+        with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return salida.getvalue().to_pybytes()
+    return df.to_json(orient='records', date_format='iso', force_ascii=False).encode('utf-8')
+
+
+# Respuesta codificada (y comprimida si vale la pena) con su ETag; las peticiones simultáneas
+# por la misma clave esperan a la primera en lugar de repetir la consulta. El candado de la clave
+# lo quita quien lo creó o quien lo usó, pero solo si sigue siendo el mismo: uno nuevo creado
+# mientras tanto pertenece a otras peticiones.
+def respuesta(nombre, filtros, formato):
+    version, instantanea = version_datos(filtros)
+    clave = (nombre, filtros, formato, version)
+    entrada = cache_respuestas.obtener(clave)
+    if entrada is not None:
+        return entrada
+    with _candado_claves:
+        candado = _candados_claves.setdefault(clave, threading.Lock())
+    try:
+        with candado:
+            entrada = cache_respuestas.obtener(clave)
+            if entrada is None:
+                with _consultas_bd:
+                    df = datos_reporte(nombre, filtros, instantanea)
+                cuerpo = codificar(df, formato)
+                etag = '"' + hashlib.blake2b(cuerpo, digest_size=16).hexdigest() + '"'
+                entrada = {'cuerpo': cuerpo, 'etag': etag, 'gzip': None, 'filas': len(df)}
+                if len(cuerpo) >= MIN_BYTES_GZIP:
+                    entrada['gzip'] = gzip.compress(cuerpo, compresslevel=6)
+                cache_respuestas.guardar(clave, entrada, len(cuerpo) + len(entrada['gzip'] or b''))
+    finally:
+        with _candado_claves:
+            if _candados_claves.get(clave) is candado:
+                del _candados_claves[clave]
+    return entrada
+
+
+def _etags(cabecera):
+    return {etiqueta.strip().removeprefix('W/') for etiqueta in (cabecera or '').split(',') if etiqueta.strip()}
+
+
+# GET /reportes                      catálogo
+# GET /reportes/<nombre>?formato=... reporte en JSON (por defecto) o Arrow, con filtros opcionales
+# GET /salud                         estado de la instantánea
+class ManejadorReportes(BaseHTTPRequestHandler):
+    server_version = 'PanchitaReportes/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._atender(con_cuerpo=True)
+
+    def do_HEAD(self):
+        self._atender(con_cuerpo=False)
+
+    def _atender(self, con_cuerpo):
+        url = urlsplit(self.path)
+        partes = [parte for parte in url.path.split('/') if parte]
+        try:
+            if partes == ['reportes']:
+                self._enviar_json(200, catalogo(), con_cuerpo)
+            elif partes == ['salud']:
+                self._enviar_json(200, self._salud(), con_cuerpo)
+            elif len(partes) == 2 and partes[0] == 'reportes':
+                self._reporte(partes[1], parse_qs(url.query), con_cuerpo)
+            else:
+                self._enviar_json(404, {'error': 'Ruta desconocida'}, con_cuerpo)
+        except ValueError as e:
+            self._enviar_json(400, {'error': str(e)}, con_cuerpo)
+        except Exception as e:
+            self.log_error('Error en %s: %r', self.path, e)
+            self._enviar_json(500, {'error': 'Error al consultar la base de datos'}, con_cuerpo)
+
+    def _formato(self, parametros):
+        if parametros.get('formato'):
+            formato = parametros['formato'][-1]
+        elif FORMATOS['arrow'] in (self.headers.get('Accept') or ''):
+            formato = 'arrow'
+        else:
+            formato = 'json'
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconocido: {formato} (use {', '.join(FORMATOS)})")
+        return formato
+
+    def _reporte(self, nombre, parametros, con_cuerpo):
+        if nombre not in consultas_sin_filtros():
+            self._enviar_json(404, {'error': f'Reporte desconocido: {nombre}'}, con_cuerpo)
+            return
+        formato = self._formato(parametros)
+        filtros = filtros_desde_parametros(parametros)
+        if filtros.activos() and nombre not in REPORTES:
+            raise ValueError(f'El reporte {nombre} no admite filtros')
+        entrada = respuesta(nombre, filtros, formato)
+
+        # Cada codificación tiene su propio ETag (la comprimida con el sufijo -gz)
+        comprimir = entrada['gzip'] is not None and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        etag = entrada['etag'][:-1] + '-gz"' if comprimir else entrada['etag']
+        cabeceras = {'ETag': etag, 'Cache-Control': f'public, max-age={EDAD_REVALIDAR_SEGUNDOS}',
+                     'Vary': 'Accept, Accept-Encoding'}
+        if etag in _etags(self.headers.get('If-None-Match')) or '*' in _etags(self.headers.get('If-None-Match')):
+            self._enviar(304, b'', None, cabeceras, con_cuerpo=False)
+            return
+        if comprimir:
+            cabeceras['Content-Encoding'] = 'gzip'
+        cuerpo = entrada['gzip'] if comprimir else entrada['cuerpo']
+        self._enviar(200, cuerpo, FORMATOS[formato], cabeceras, con_cuerpo)
+
+    def _salud(self):
+        refrescador = obtener_refrescador() if REFRESCO_EN_FONDO else None
+        instantanea = refrescador.instantanea() if refrescador else None
+        return {
+            'instantanea': instantanea.numero if instantanea else None,
+            'edad_segundos': round(instantanea.edad, 1) if instantanea else None,
+            'escuchando_avisos': bool(refrescador and refrescador.escuchando),
+            'ultimo_error': repr(refrescador.ultimo_error) if refrescador and refrescador.ultimo_error else None,
+            'respuestas_en_cache': {'aciertos': cache_respuestas.aciertos, 'fallos': cache_respuestas.fallos},
+        }
+
+    def _enviar_json(self, estado, datos, con_cuerpo):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode('utf-8')
+        self._enviar(estado, cuerpo, FORMATOS['json'], {'Cache-Control': 'no-cache'}, con_cuerpo)
+
+    def _enviar(self, estado, cuerpo, tipo, cabeceras, con_cuerpo):
+        self.send_response(estado)
+        if tipo:
+            self.send_header('Content-Type', tipo)
+        for nombre, valor in cabeceras.items():
+            self.send_header(nombre, valor)
+        self.send_header('Content-Length', str(len(cuerpo)) if estado != 304 else '0')
+        self.end_headers()
+        if con_cuerpo and cuerpo:
+            self.wfile.write(cuerpo)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="API HTTP de los reportes del tablero (JSON o Arrow)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    args = parser.parse_args(argumentos)
+
+    # La primera instantánea se empieza a preparar antes de la primera petición
+    if REFRESCO_EN_FONDO:
+        obtener_refrescador()
+    servidor = ThreadingHTTPServer((args.host, args.puerto), ManejadorReportes)
+    servidor.daemon_threads = True
+    print(f"Reportes en http://{args.host}:{args.puerto}/reportes")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        cerrar_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    # Uso: python api_reportes.py --puerto 8600
+    #      curl -H 'Accept-Encoding: gzip' 'http://127.0.0.1:8600/reportes/sucursal?desde=2024-01-01&sucursal=1,2'
+    sys.exit(main())
@@ -0,0 +1,350 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# El banco de pruebas borra y vuelve a crear las tablas: por defecto usa su propia base de datos.
+# Debe fijarse antes de importar acceso_datos, que lee la configuración al importarse.
+os.environ.setdefault("PANCHITA_DB_NOMBRE", "dpanchita_benchmark")
+
+import numpy as np
+import pandas as pd
+
+from acceso_datos import PARAMETROS_CONEXION, cache_consultas, cerrar_pool, conexion, normalizar_sql, obtener_datos
+from ingesta import DIAS_SEMANA_SQL
+
+RAIZ = Path(__file__).resolve().parent
+ARCHIVO_ESQUEMA = RAIZ / "base de datos.sql"
+
+# Base de datos del tablero: el banco se niega a usarla salvo que se pida expresamente
+BASE_PRINCIPAL = "dpanchita2"
+
+DIRECTORIO_BENCHMARKS = RAIZ / "benchmarks"
+DIRECTORIO_RESULTADOS = DIRECTORIO_BENCHMARKS / "resultados"
+
+TAMANOS = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+
+# Filas generadas y enviadas con COPY por lote
+FILAS_POR_LOTE = 500_000
+
+# Días cubiertos por las ventas sintéticas
+FECHA_INICIO = "2024-01-01"
+DIAS_SINTETICOS = 365
+
+# Filas con las que se entrenan los modelos (muestra de la tabla de hechos)
+MAX_FILAS_MODELOS = 200_000
+
+# Una medición empeora si es más lenta que la línea base en esta fracción y en al menos MIN_DIFERENCIA_S
+TOLERANCIA = 0.20
+MIN_DIFERENCIA_S = 0.05
+
+TABLAS = [
+    "Hechos_Ventas", "Resumen_Ventas_Diario", "Control_Rollups", "Dim_Metodos_Pago", "Dim_Fecha",
+    "Dim_Clientes", "Dim_Genero", "Dim_Productos", "Dim_Subcategorias", "Dim_Categorias",
+    "Dim_Sucursales", "Dim_Ubicacion_Sucursales", "Dim_Ciudades", "Dim_Paises",
+]
+
+
+def filas_desde_texto(texto):
+    return TAMANOS.get(texto) or int(texto)
+
+
+def crear_base_si_falta():
+    import psycopg2
+
+    parametros = {**PARAMETROS_CONEXION, "dbname": "postgres"}
+    conn = psycopg2.connect(**parametros)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (PARAMETROS_CONEXION["dbname"],))
+            if cur.fetchone() is None:
+                cur.execute(f'CREATE DATABASE "{PARAMETROS_CONEXION["dbname"]}"')
+    finally:
+        conn.close()
+
+
+# Esquema y dimensiones del script del proyecto, más las fechas que cubren las ventas sintéticas
+def crear_esquema():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS " + ", ".join(TABLAS) + " CASCADE")
+            cur.execute(ARCHIVO_ESQUEMA.read_text(encoding="utf-8"))
+            cur.execute(f"""
+                INSERT INTO Dim_Fecha (id_fecha, dia, mes, anio, dia_semana, trimestre)
+                SELECT d::date, EXTRACT(DAY FROM d), EXTRACT(MONTH FROM d), EXTRACT(YEAR FROM d),
+                       {DIAS_SEMANA_SQL}, EXTRACT(QUARTER FROM d)
+                FROM generate_series(%(inicio)s::date, %(inicio)s::date + %(dias)s - 1, interval '1 day') AS d
+                ON CONFLICT (id_fecha) DO NOTHING
+            """, {"inicio": FECHA_INICIO, "dias": DIAS_SINTETICOS})
+
+
+# Carga las ventas sintéticas con el mismo camino que ingesta.py (claves naturales resueltas en
+# memoria, COPY FROM STDIN por lotes, índices reconstruidos) y actualiza los resúmenes
+def cargar_ventas(filas, semilla=0):
+    from ingesta import CacheDimensiones, generar_ventas, ingerir
+
+    cache = CacheDimensiones().cargar()
+    lotes = generar_ventas(cache, filas, FECHA_INICIO, DIAS_SINTETICOS, semilla, FILAS_POR_LOTE)
+    informe, _ = ingerir(lotes, cache, filas_estimadas=filas)
+    return informe
+
+
+# Textos SQL pasados como primer argumento a una función en un script (sin ejecutarlo)
+def _consultas_llamadas(ruta, funcion):
+    arbol = ast.parse(Path(ruta).read_text(encoding="utf-8"))
+    consultas = []
+    for nodo in ast.walk(arbol):
+        if (isinstance(nodo, ast.Call) and getattr(nodo.func, "id", None) == funcion and nodo.args
+                and isinstance(nodo.args[0], ast.Constant) and isinstance(nodo.args[0].value, str)):
+            consultas.append((nodo.lineno, nodo.args[0].value))
+    return sorted(consultas)
+
+
+# Consulta SELECT asignada dentro de cargar_datos() en una página
+def _consulta_cargar_datos(ruta):
+    arbol = ast.parse(Path(ruta).read_text(encoding="utf-8"))
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.FunctionDef) and nodo.name == "cargar_datos":
+            for hijo in ast.walk(nodo):
+                if (isinstance(hijo, ast.Constant) and isinstance(hijo.value, str)
+                        and hijo.value.strip().upper().startswith("SELECT")):
+                    return hijo.value
+    return None
+
+
+def medir(resultados, nombre, funcion, repeticiones, **extra):
+    tiempos = []
+    valor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        valor = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    resultados[nombre] = {"mediana_s": statistics.median(tiempos), "minimo_s": min(tiempos),
+                          "repeticiones_s": tiempos, **extra}
+    print(f"  {nombre:<55} {statistics.median(tiempos):9.4f} s")
+    return valor
+
+
+def _sin_cache(funcion):
+    def envoltura():
+        cache_consultas.limpiar()
+        return funcion()
+    return envoltura
+
+
+def medir_tablero(resultados, repeticiones):
+    from consultas_tablero import REPORTES, Filtros, consulta_reporte, opciones_filtros
+    from cubo_ventas import obtener_cubo
+
+    reportes = []
+    # Reportes del tablero sin filtros y con un filtro estrecho (último mes de una sucursal),
+    # que debe ser más rápido porque PostgreSQL solo agrega las filas filtradas
+    opciones = opciones_filtros()
+    estrecho = Filtros(fecha_desde=opciones["hasta"] - timedelta(days=30),
+                       sucursales=(int(opciones["sucursales"]["id_sucursal"].iloc[0]),))
+    for nombre in REPORTES:
+        for sufijo, filtros in (("", None), (":filtrado", estrecho)):
+            query, params = consulta_reporte(nombre, filtros)
+            df = medir(resultados, f"tablero:{nombre}{sufijo}",
+                       lambda q=query, p=params: obtener_datos(q, p, usar_cache=False), repeticiones)
+            if not sufijo:
+                reportes.append(df)
+    # Consultas que siguen escritas directamente en visualizador.py
+    for _, query in _consultas_llamadas(RAIZ / "visualizador.py", "obtener_datos"):
+        # El nombre depende del texto de la consulta y no de su línea, para comparar con la línea base
+        texto = normalizar_sql(query)
+        nombre = f"visualizador:{hashlib.sha1(texto.encode()).hexdigest()[:8]}"
+        df = medir(resultados, nombre, lambda q=query: obtener_datos(q, usar_cache=False), repeticiones,
+                   consulta=texto[:120])
+        reportes.append(df)
+    cubo = medir(resultados, "cubo:construccion", _sin_cache(obtener_cubo), repeticiones)
+    for metodo in [m for m in dir(cubo) if m.startswith("ventas_")]:
+        medir(resultados, f"cubo:{metodo}", getattr(cubo, metodo), repeticiones)
+    return reportes
+
+
+# Carga de cada página con el periodo por defecto (todo el histórico) y con el último mes, que
+# con Hechos_Ventas particionada (particiones.py) solo lee una o dos particiones
+def medir_paginas(resultados, repeticiones):
+    from carga_masiva import cargar_hechos, rango_fechas_hechos
+
+    desde, hasta = rango_fechas_hechos()
+    periodos = {"": {"desde": desde, "hasta": hasta},
+                ":ultimo_mes": {"desde": hasta - timedelta(days=30), "hasta": hasta}}
+    datos = {}
+    for pagina in ("Predicciones.py", "Cantidad_predicha.py"):
+        query = _consulta_cargar_datos(RAIZ / "pages" / pagina)
+        for sufijo, params in periodos.items():
+            df = medir(resultados, f"{pagina}:cargar_datos{sufijo}",
+                       _sin_cache(lambda q=query, p=params: cargar_hechos(q, params=p)), repeticiones)
+            datos.setdefault(pagina, df)
+    return datos
+
+
+def medir_modelos(resultados, datos, repeticiones):
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    from xgboost import XGBRegressor
+
+    from entrenamiento_incremental import preparar_cantidad
+
+    if len(datos) > MAX_FILAS_MODELOS:
+        datos = datos.sample(n=MAX_FILAS_MODELOS, random_state=0)
+    X, y = preparar_cantidad(datos)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    modelos = {
+        "Regresión Lineal": LinearRegression(),
+        "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
+        "Gradient Boosting": GradientBoostingRegressor(random_state=42),
+        "XGBoost": XGBRegressor(random_state=42),
+    }
+    for nombre, modelo in modelos.items():
+        medir(resultados, f"modelo:{nombre}:fit", lambda m=modelo: m.fit(X_train, y_train), repeticiones,
+              filas=len(X_train))
+        medir(resultados, f"modelo:{nombre}:predict", lambda m=modelo: m.predict(X_test), repeticiones,
+              filas=len(X_test))
+
+
+def medir_pca(resultados, datos, repeticiones):
+    import cache_columnar
+    from pca_incremental import ajustar_pca
+
+    columnas = ['id_sucursal', 'id_producto', 'id_cliente', 'cantidad', 'total']
+    directorio_original = cache_columnar.DIRECTORIO_CACHE
+    with tempfile.TemporaryDirectory() as temporal:
+        archivo = Path(temporal) / "hechos.csv"
+        datos[columnas].to_csv(archivo, index=False)
+        # Caché columnar vacía para medir también la conversión inicial
+        cache_columnar.DIRECTORIO_CACHE = Path(temporal) / "cache"
+        try:
+            medir(resultados, "pca:conversion_y_ajuste", lambda: ajustar_pca(archivo, columnas), 1,
+                  filas=len(datos))
+            medir(resultados, "pca:ajuste_con_cache", lambda: ajustar_pca(archivo, columnas), repeticiones,
+                  filas=len(datos))
+        finally:
+            cache_columnar.DIRECTORIO_CACHE = directorio_original
+
+
+def medir_exportacion(resultados, reportes, repeticiones):
+    from consultas_tablero import consulta_hechos
+    from exportacion import FORMATOS, crear_zip
+
+    # Mismas fuentes que el botón de exportación del tablero
+    fuentes = [consulta_hechos()] + reportes[:2]
+    nombres = ['hechos_ventas'] + [f'reporte_{i}' for i in range(1, len(fuentes))]
+    for formato in FORMATOS:
+        medir(resultados, f"crear_zip_con_datos:{formato}",
+              lambda f=formato: crear_zip(fuentes, nombres, f), repeticiones)
+
+
+def comparar(resultados, base):
+    filas = []
+    for nombre, medicion in resultados.items():
+        anterior = base.get("resultados", {}).get(nombre)
+        if anterior is None:
+            continue
+        actual, previo = medicion["mediana_s"], anterior["mediana_s"]
+        cociente = actual / previo if previo > 0 else float("inf")
+        empeora = cociente > 1 + TOLERANCIA and actual - previo > MIN_DIFERENCIA_S
+        filas.append({"medicion": nombre, "base_s": previo, "actual_s": actual, "cociente": cociente,
+                      "empeora": empeora})
+    return pd.DataFrame(filas, columns=["medicion", "base_s", "actual_s", "cociente", "empeora"])
+
+
+def _entorno():
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "sistema": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit_learn": sklearn.__version__,
+        "base_de_datos": PARAMETROS_CONEXION["dbname"],
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de consultas, cargas y modelos")
+    parser.add_argument("--filas", default="10k", help="10k, 1M, 10M o un número de filas")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--sin-carga", action="store_true", help="Reutilizar los datos ya cargados")
+    parser.add_argument("--particionar", action="store_true",
+                        help="Particionar Hechos_Ventas por mes antes de cargar las ventas")
+    parser.add_argument("--solo", nargs="+", choices=["tablero", "paginas", "modelos", "pca", "exportacion"],
+                        help="Ejecutar solo estos grupos de mediciones")
+    parser.add_argument("--base", help="JSON de línea base (por defecto benchmarks/base_<filas>.json)")
+    parser.add_argument("--guardar-base", action="store_true", help="Guardar este resultado como línea base")
+    parser.add_argument("--permitir-base-principal", action="store_true",
+                        help=f"Permitir ejecutar sobre {BASE_PRINCIPAL} (borra sus tablas)")
+    args = parser.parse_args(argumentos)
+
+    if PARAMETROS_CONEXION["dbname"] == BASE_PRINCIPAL and not args.permitir_base_principal:
+        parser.error(f"PANCHITA_DB_NOMBRE apunta a {BASE_PRINCIPAL}; usa otra base o --permitir-base-principal")
+
+    filas = filas_desde_texto(args.filas)
+    grupos = set(args.solo or ["tablero", "paginas", "modelos", "pca", "exportacion"])
+    resultados = {}
+
+    if not args.sin_carga:
+        print(f"Cargando {filas:,} ventas sintéticas en {PARAMETROS_CONEXION['dbname']}...")
+        crear_base_si_falta()
+        medir(resultados, "carga:esquema", crear_esquema, 1)
+        if args.particionar:
+            from particiones import migrar
+
+            medir(resultados, "carga:particionar", migrar, 1)
+        medir(resultados, "carga:ventas_copy_y_resumenes", lambda: cargar_ventas(filas), 1, filas=filas)
+
+    print("Mediciones:")
+    reportes = medir_tablero(resultados, args.repeticiones) if grupos & {"tablero", "exportacion"} else []
+    datos = medir_paginas(resultados, args.repeticiones) if grupos & {"paginas", "modelos", "pca"} else {}
+    if "modelos" in grupos:
+        medir_modelos(resultados, datos["Cantidad_predicha.py"], args.repeticiones)
+    if "pca" in grupos:
+        medir_pca(resultados, datos["Predicciones.py"], args.repeticiones)
+    if "exportacion" in grupos:
+        medir_exportacion(resultados, reportes, args.repeticiones)
+    cerrar_pool()
+
+    salida = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "filas": filas,
+        "repeticiones": args.repeticiones,
+        "entorno": _entorno(),
+        "resultados": resultados,
+    }
+    DIRECTORIO_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    archivo = DIRECTORIO_RESULTADOS / f"benchmark_{args.filas}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    archivo.write_text(json.dumps(salida, indent=2, ensure_ascii=False))
+    print(f"Resultados guardados en {archivo}")
+
+    ruta_base = Path(args.base) if args.base else DIRECTORIO_BENCHMARKS / f"base_{args.filas}.json"
+    empeoradas = 0
+    if ruta_base.exists():
+        tabla = comparar(resultados, json.loads(ruta_base.read_text()))
+        empeoradas = int(tabla["empeora"].sum())
+        print(f"\nComparación con {ruta_base}:")
+        print(tabla.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        print(f"\n{empeoradas} mediciones empeoraron más de un {TOLERANCIA:.0%}")
+    if args.guardar_base:
+        ruta_base.write_text(json.dumps(salida, indent=2, ensure_ascii=False))
+        print(f"Línea base guardada en {ruta_base}")
+    # Código de salida distinto de cero si hay regresiones (útil antes de desplegar)
+    return 1 if empeoradas and not args.guardar_base else 0
+
+
+if __name__ == "__main__":
+    # Uso: PANCHITA_DB_NOMBRE=dpanchita_benchmark python benchmark.py --filas 1M [--guardar-base]
+    sys.exit(main())
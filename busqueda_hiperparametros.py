@@ -0,0 +1,215 @@
+import functools
+import math
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from entrenamiento import MAX_PROCESOS, fijar_hilos, hilos_por_modelo
+from registro_modelos import DIRECTORIO_MODELOS, calcular_metricas, huella_datos
+
+# Espacios de búsqueda: modelo base y valores candidatos de cada hiperparámetro.
+# Gradient Boosting y XGBoost se detienen solos cuando la validación deja de mejorar,
+# por eso su n_estimators es solo un tope. Se construyen al primer uso para que importar
+# este módulo no cargue scikit-learn ni XGBoost.
+@functools.lru_cache(maxsize=None)
+def espacios():
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    return {
+        "Regresión Lineal": (LinearRegression(), {}),
+        "Random Forest": (RandomForestRegressor(random_state=42), {
+            "n_estimators": [50, 100, 200, 400],
+            "max_depth": [None, 8, 16, 32],
+            "min_samples_leaf": [1, 2, 5, 10],
+            "max_features": [1.0, 0.5, "sqrt"],
+        }),
+        "Gradient Boosting": (GradientBoostingRegressor(random_state=42, n_estimators=500, n_iter_no_change=10,
+                                                        validation_fraction=0.1), {
+            "learning_rate": [0.03, 0.05, 0.1, 0.2],
+            "max_depth": [2, 3, 4, 6],
+            "subsample": [0.7, 0.85, 1.0],
+            "min_samples_leaf": [1, 5, 20],
+        }),
+        "XGBoost": (XGBRegressor(random_state=42, n_estimators=1000, early_stopping_rounds=20), {
+            "learning_rate": [0.03, 0.05, 0.1, 0.3],
+            "max_depth": [3, 4, 6, 8],
+            "subsample": [0.7, 0.85, 1.0],
+            "colsample_bytree": [0.7, 1.0],
+            "min_child_weight": [1, 5, 10],
+        }),
+    }
+
+
+# Configuraciones iniciales por modelo y factor de descarte en cada ronda (se queda 1 de cada ETA)
+CONFIGURACIONES = 9
+ETA = 3
+
+# Filas mínimas de entrenamiento en la primera ronda
+MIN_FILAS = 1_000
+
+# Fracción del conjunto de entrenamiento que se aparta como validación
+FRACCION_VALIDACION = 0.2
+
+DIRECTORIO_BUSQUEDAS = DIRECTORIO_MODELOS / "busquedas"
+
+_busquedas = {}
+_candado = threading.Lock()
+
+# Datos de la búsqueda en cada proceso hijo (se envían una sola vez al crear el proceso)
+_datos_proceso = {}
+
+
+@dataclass
+class ResultadoBusqueda:
+    ensayos: pd.DataFrame
+    mejores: dict
+    segundos: float
+    archivo: str
+
+
+def _iniciar_proceso(X_train, y_train, X_val, y_val):
+    _datos_proceso.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+
+# Se ejecuta en un proceso hijo: entrena una configuración con las primeras `filas` filas
+# (orden ya barajado) y la evalúa en la validación
+def _evaluar_configuracion(modelo, hilos, filas):
+    from sklearn.ensemble import GradientBoostingRegressor
+    from xgboost import XGBRegressor
+
+    X_train, y_train = _datos_proceso["X_train"].iloc[:filas], _datos_proceso["y_train"].iloc[:filas]
+    X_val, y_val = _datos_proceso["X_val"], _datos_proceso["y_val"]
+    # Los procesos se reutilizan entre ensayos, así que la memoria de cada uno se mide con
+    # tracemalloc (asignaciones de Python y NumPy) y no con el pico del proceso
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    with threadpool_limits(limits=hilos):
+        modelo = fijar_hilos(modelo, hilos)
+        if isinstance(modelo, XGBRegressor):
+            modelo.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        else:
+            modelo.fit(X_train, y_train)
+        predicciones = modelo.predict(X_val)
+    segundos = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+
+    # Iteraciones realmente usadas por los modelos con parada temprana
+    if isinstance(modelo, XGBRegressor):
+        iteraciones = modelo.best_iteration + 1
+    elif isinstance(modelo, GradientBoostingRegressor):
+        iteraciones = modelo.n_estimators_
+    else:
+        iteraciones = None
+    return {**calcular_metricas(y_val, predicciones), "segundos": segundos, "memoria_mb": memoria,
+            "iteraciones": iteraciones}
+
+
+# Filas de entrenamiento de cada ronda: crecen ETA veces por ronda hasta usar todo el conjunto
+def _filas_por_ronda(total, rondas, eta):
+    return [max(min(MIN_FILAS, total), int(total / eta ** (rondas - 1 - i))) for i in range(rondas)]
+
+
+# Modelo final con la mejor configuración: el número de iteraciones encontrado por la parada
+# temprana pasa a ser fijo, porque el entrenamiento definitivo no tiene conjunto de validación
+def _modelo_final(nombre, params, iteraciones):
+    from sklearn.base import clone
+    from sklearn.ensemble import GradientBoostingRegressor
+    from xgboost import XGBRegressor
+
+    modelo = clone(espacios()[nombre][0]).set_params(**params)
+    if isinstance(modelo, XGBRegressor):
+        modelo.set_params(n_estimators=int(iteraciones), early_stopping_rounds=None)
+    elif isinstance(modelo, GradientBoostingRegressor):
+        modelo.set_params(n_estimators=int(iteraciones), n_iter_no_change=None)
+    return modelo
+
+
+# Búsqueda por successive halving: cada modelo arranca con CONFIGURACIONES combinaciones al azar
+# entrenadas con pocas filas; en cada ronda solo sigue la mejor fracción 1/ETA (por MAE en
+# validación) y las filas se multiplican por ETA. Todas las configuraciones de una ronda se
+# entrenan en paralelo. Devuelve la tabla de ensayos y el mejor modelo (sin entrenar) por nombre.
+def buscar_hiperparametros(X, y, nombres=None, configuraciones=CONFIGURACIONES, eta=ETA, semilla=42,
+                           max_procesos=None):
+    from sklearn.base import clone
+    from sklearn.model_selection import ParameterSampler, train_test_split
+
+    nombres = list(nombres or espacios())
+    clave = (huella_datos(X, y), tuple(nombres), configuraciones, eta, semilla)
+    with _candado:
+        if clave in _busquedas:
+            return _busquedas[clave]
+
+    inicio = time.perf_counter()
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=FRACCION_VALIDACION, random_state=semilla)
+    rondas = int(math.log(configuraciones, eta)) + 1
+    filas_ronda = _filas_por_ronda(len(X_train), rondas, eta)
+
+    with warnings.catch_warnings():
+        # Espacios pequeños: ParameterSampler avisa si hay menos combinaciones que las pedidas
+        warnings.simplefilter("ignore", UserWarning)
+        vivos = {nombre: list(ParameterSampler(espacios()[nombre][1], n_iter=configuraciones, random_state=semilla))
+                 if espacios()[nombre][1] else [{}] for nombre in nombres}
+
+    ensayos = []
+    num_procesos = max_procesos or MAX_PROCESOS
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=num_procesos, mp_context=contexto, initializer=_iniciar_proceso,
+                             initargs=(X_train, y_train, X_val, y_val)) as ejecutor:
+        for ronda, filas in enumerate(filas_ronda):
+            # Los modelos con una sola configuración solo se entrenan en la última ronda
+            tareas = [(nombre, params) for nombre, lista in vivos.items() for params in lista
+                      if len(lista) > 1 or ronda == rondas - 1]
+            if not tareas:
+                continue
+            hilos = hilos_por_modelo(len(tareas), min(len(tareas), num_procesos))
+            futuros = [
+                ejecutor.submit(_evaluar_configuracion, clone(espacios()[nombre][0]).set_params(**params), hilos, filas)
+                for nombre, params in tareas
+            ]
+            resultados_ronda = []
+            for (nombre, params), futuro in zip(tareas, futuros):
+                resultado = futuro.result()
+                fila = {"modelo": nombre, "ronda": ronda + 1, "filas": filas, "parametros": params, **resultado,
+                        "continua": False}
+                ensayos.append(fila)
+                resultados_ronda.append(fila)
+
+            # Se descartan las peores configuraciones de cada modelo
+            for nombre in nombres:
+                propios = sorted((f for f in resultados_ronda if f["modelo"] == nombre), key=lambda f: f["mae"])
+                if propios and ronda < rondas - 1:
+                    siguen = propios[:max(1, len(propios) // eta)]
+                    for f in siguen:
+                        f["continua"] = True
+                    vivos[nombre] = [f["parametros"] for f in siguen]
+
+    tabla = pd.DataFrame(ensayos)
+    mejores = {}
+    for nombre in nombres:
+        propios = tabla[tabla["modelo"] == nombre]
+        ultima = propios[propios["ronda"] == propios["ronda"].max()]
+        mejor = ultima.loc[ultima["mae"].idxmin()]
+        mejores[nombre] = _modelo_final(nombre, mejor["parametros"], mejor["iteraciones"])
+    tabla["parametros"] = tabla["parametros"].map(repr)
+
+    # Tabla de ensayos en disco para comparar búsquedas
+    DIRECTORIO_BUSQUEDAS.mkdir(parents=True, exist_ok=True)
+    archivo = DIRECTORIO_BUSQUEDAS / f"busqueda_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.csv"
+    tabla.to_csv(archivo, index=False)
+
+    resultado = ResultadoBusqueda(ensayos=tabla, mejores=mejores, segundos=time.perf_counter() - inicio,
+                                  archivo=str(archivo))
+    with _candado:
+        _busquedas[clave] = resultado
+    return resultado
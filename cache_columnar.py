@@ -0,0 +1,238 @@
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Carpeta de la caché columnar y tamaño máximo antes de expulsar los archivos menos usados
+DIRECTORIO_CACHE = Path(os.environ.get("PANCHITA_DIR_CACHE", Path(__file__).resolve().parent / ".cache_columnar"))
+MAX_BYTES_CACHE = int(os.environ.get("PANCHITA_MAX_BYTES_CACHE", 2 * 1024 ** 3))
+
+# Filas por lote al convertir y al leer (cada lote es un record batch del archivo Arrow)
+TAMANO_LOTE = 50_000
+
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+_huellas_rutas = {}
+_candado = threading.Lock()
+
+
+def _extension(archivo):
+    nombre = getattr(archivo, 'name', archivo)
+    return Path(str(nombre)).suffix.lower()
+
+
+def _rebobinar(archivo):
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+
+
+# Huella del contenido: archivos subidos (en memoria) o rutas en disco. Para las rutas se
+# recuerda por (ruta, tamaño, fecha de modificación) para no releer el archivo en cada ejecución.
+def huella_archivo(archivo):
+    h = hashlib.blake2b(digest_size=16)
+    if hasattr(archivo, 'getbuffer'):
+        h.update(archivo.getbuffer())
+        return h.hexdigest()
+    ruta = Path(archivo)
+    info = ruta.stat()
+    firma = (str(ruta.resolve()), info.st_size, info.st_mtime_ns)
+    with _candado:
+        if firma in _huellas_rutas:
+            return _huellas_rutas[firma]
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE_HASH), b''):
+            h.update(bloque)
+    with _candado:
+        _huellas_rutas[firma] = h.hexdigest()
+    return _huellas_rutas[firma]
+
+
+# Lectura por bloques del archivo original (solo se usa al convertirlo la primera vez):
+# CSV con chunksize, XLSX en modo de solo lectura de openpyxl; XLS no admite lectura parcial.
+# Un archivo con encabezado y sin filas da un único bloque vacío con sus columnas.
+def leer_bloques_origen(archivo, tamano=TAMANO_LOTE):
+    _rebobinar(archivo)
+    extension = _extension(archivo)
+    if extension == '.csv':
+        vacio = True
+        for bloque in pd.read_csv(archivo, chunksize=tamano):
+            vacio = False
+            yield bloque
+        if vacio:
+            _rebobinar(archivo)
+            yield pd.read_csv(archivo, nrows=0)
+    elif extension == '.xlsx':
+        from openpyxl import load_workbook
+
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            columnas = [str(c) for c in next(filas, ())]
+            lote = []
+            vacio = True
+            for fila in filas:
+                lote.append(fila)
+                if len(lote) == tamano:
+                    vacio = False
+                    yield pd.DataFrame(lote, columns=columnas)
+                    lote = []
+            if lote or vacio:
+                yield pd.DataFrame(lote, columns=columnas)
+        finally:
+            libro.close()
+    else:
+        df = pd.read_excel(archivo)
+        for desde in range(0, max(len(df), 1), tamano):
+            yield df.iloc[desde:desde + tamano]
+
+
+# Columna cuyo tipo (fijado con el primer lote) no admite los valores de un lote posterior:
+# args = (columna, tipo Arrow con el que se vuelve a convertir)
+class _CambioDeTipo(Exception):
+    pass
+
+
+# Esquema estable a partir del primer lote: los enteros se conservan como int64 (los vacíos de
+# lotes posteriores quedan como nulos), el resto de números como float64 y los textos o columnas
+# mixtas como string. `forzados` fija el tipo de las columnas que cambiaron en lotes posteriores.
+def _esquema(lote, forzados=None):
+    forzados = forzados or {}
+    campos = []
+    for columna in lote.columns:
+        serie = lote[columna]
+        if str(columna) in forzados:
+            tipo = forzados[str(columna)]
+        elif pd.api.types.is_bool_dtype(serie):
+            tipo = pa.bool_()
+        elif pd.api.types.is_integer_dtype(serie):
+            tipo = pa.int64()
+        elif pd.api.types.is_numeric_dtype(serie):
+            tipo = pa.float64()
+        elif pd.api.types.is_datetime64_any_dtype(serie):
+            tipo = pa.timestamp('us')
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(str(columna), tipo))
+    return pa.schema(campos)
+
+
+# Valores que había en el lote y que la conversión dejó como nulos: la columna no es del tipo
+# que se dedujo del primer lote y se pasa a texto en lugar de perder esos valores
+def _comprobar_perdidos(nombre, original, convertida):
+    if (original.notna() & convertida.isna()).any():
+        raise _CambioDeTipo(nombre, pa.string())
+
+
+def _a_tabla(lote, esquema):
+    lote = lote.copy()
+    lote.columns = [str(c) for c in lote.columns]
+    for campo in esquema:
+        serie = lote[campo.name]
+        if pa.types.is_string(campo.type):
+            lote[campo.name] = serie.map(lambda v: None if pd.isna(v) else str(v))
+        elif pa.types.is_boolean(campo.type):
+            if not serie.dropna().map(lambda v: isinstance(v, (bool, np.bool_))).all():
+                raise _CambioDeTipo(campo.name, pa.string())
+        elif pa.types.is_integer(campo.type):
+            valores = pd.to_numeric(serie, errors='coerce')
+            _comprobar_perdidos(campo.name, serie, valores)
+            presentes = valores.dropna()
+            if not presentes.eq(presentes.round()).all():
+                raise _CambioDeTipo(campo.name, pa.float64())
+            lote[campo.name] = valores.astype('Int64')
+        elif pa.types.is_floating(campo.type):
+            valores = pd.to_numeric(serie, errors='coerce')
+            _comprobar_perdidos(campo.name, serie, valores)
+            lote[campo.name] = valores
+        elif pa.types.is_timestamp(campo.type):
+            valores = pd.to_datetime(serie, errors='coerce')
+            _comprobar_perdidos(campo.name, serie, valores)
+            lote[campo.name] = valores
+    return pa.Table.from_pandas(lote, schema=esquema, preserve_index=False)
+
+
+def _escribir(archivo, temporal, forzados):
+    escritor = None
+    try:
+        for lote in leer_bloques_origen(archivo):
+            if escritor is None:
+                esquema = _esquema(lote, forzados)
+                escritor = pa.ipc.new_file(temporal, esquema)
+            escritor.write_table(_a_tabla(lote, esquema), max_chunksize=TAMANO_LOTE)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    if escritor is None:
+        # Sin un archivo Arrow válido no se debe reemplazar el destino de la caché
+        raise ValueError("El archivo no tiene encabezado ni filas")
+
+
+# Conversión única a un archivo Arrow IPC (Feather v2) sin compresión, apto para memory-map.
+# Cada conversión escribe en su propio temporal (dos sesiones pueden subir el mismo libro a la
+# vez) y lo renombra al destino. Si una columna cambia de tipo más adelante (decimales en una
+# columna entera, textos en una numérica o de fechas) se vuelve a convertir con el tipo nuevo.
+def _convertir(archivo, destino):
+    descriptor, temporal = tempfile.mkstemp(prefix=destino.stem + '.', suffix='.tmp', dir=destino.parent)
+    os.close(descriptor)
+    forzados = {}
+    try:
+        while True:
+            try:
+                _escribir(archivo, temporal, forzados)
+                break
+            except _CambioDeTipo as e:
+                columna, tipo = e.args
+                forzados[columna] = tipo
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+
+
+def _expulsar(conservar):
+    archivos = sorted(DIRECTORIO_CACHE.glob('*.arrow'), key=lambda p: p.stat().st_mtime, reverse=True)
+    total = 0
+    for ruta in archivos:
+        total += ruta.stat().st_size
+        if total > MAX_BYTES_CACHE and ruta != conservar:
+            ruta.unlink(missing_ok=True)
+
+
+# Ruta del archivo columnar del libro; lo convierte si aún no existe en la caché
+def ruta_columnar(archivo):
+    DIRECTORIO_CACHE.mkdir(parents=True, exist_ok=True)
+    destino = DIRECTORIO_CACHE / f"{huella_archivo(archivo)}.arrow"
+    if destino.exists():
+        # Marca de uso para la expulsión por antigüedad
+        os.utime(destino)
+    else:
+        _convertir(archivo, destino)
+        _expulsar(destino)
+    return destino
+
+
+# Tabla Arrow mapeada en memoria (no copia los datos al abrirla)
+def abrir_tabla(archivo, columnas=None):
+    lector = pa.ipc.open_file(pa.memory_map(str(ruta_columnar(archivo)), 'r'))
+    tabla = lector.read_all()
+    return tabla.select(columnas) if columnas else tabla
+
+
+# Lotes del archivo columnar como DataFrames, para recorridos fuera de memoria
+def leer_lotes(archivo, columnas=None):
+    lector = pa.ipc.open_file(pa.memory_map(str(ruta_columnar(archivo)), 'r'))
+    for i in range(lector.num_record_batches):
+        lote = lector.get_batch(i)
+        if columnas:
+            lote = lote.select(columnas)
+        yield lote.to_pandas()
+
+
+# DataFrame completo desde la copia columnar
+def cargar(archivo, columnas=None):
+    return abrir_tabla(archivo, columnas).to_pandas()
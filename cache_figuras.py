@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+from instrumentacion import contar, tramo
+
+# Límites de la caché de figuras (las claves llevan la versión de los datos, así que no caducan:
+# las figuras de versiones anteriores salen por LRU)
+MAX_ENTRADAS_FIGURAS = 256
+MAX_BYTES_FIGURAS = 64 * 1024 * 1024
+
+
+# Caché LRU de resultados ya construidos para dibujar: figuras de Plotly (con su JSON compacto)
+# y tablas remodeladas para st.bar_chart. Lo guardado se comparte entre sesiones y no se modifica.
+class CacheFiguras:
+    def __init__(self, max_entradas=MAX_ENTRADAS_FIGURAS, max_bytes=MAX_BYTES_FIGURAS):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._candado = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(self, clave, valor, tamano):
+        if tamano > self.max_bytes:
+            return
+        with self._candado:
+            if clave in self._entradas:
+                self._bytes -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (valor, tamano)
+            self._bytes += tamano
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._bytes -= self._entradas.popitem(last=False)[1][1]
+
+    def limpiar(self):
+        with self._candado:
+            self._entradas.clear()
+            self._bytes = 0
+
+
+cache_figuras = CacheFiguras()
+
+
+# Figura de un reporte con el tipo de gráfico elegido para una versión de los datos. `construir`
+# (consulta + px/go) solo se llama si falta; lo que ocupa en la caché se mide por su JSON.
+def figura(reporte, tipo, version, construir):
+    clave = ('figura', reporte, tipo, version)
+    with tramo('figura:' + reporte, 'grafico', tipo=tipo) as atributos:
+        entrada = cache_figuras.obtener(clave)
+        acierto = entrada is not None
+        contar('cache_figuras:' + ('acierto' if acierto else 'fallo'))
+        if not acierto:
+            fig = construir()
+            entrada = {'figura': fig, 'bytes': len(fig.to_json())}
+            cache_figuras.guardar(clave, entrada, entrada['bytes'])
+        atributos.update(bytes=entrada['bytes'], acierto=acierto)
+    return entrada['figura']
+
+
+# Tabla remodelada (pivot / pivot_table) para un gráfico nativo de Streamlit
+def tabla(reporte, nombre, version, construir):
+    clave = ('tabla', reporte, nombre, version)
+    df = cache_figuras.obtener(clave)
+    contar('cache_figuras:' + ('fallo' if df is None else 'acierto'))
+    if df is None:
+        with tramo(f'pivot:{reporte}:{nombre}', 'transformacion'):
+            df = construir()
+        cache_figuras.guardar(clave, df, int(df.memory_usage(deep=True).sum()))
+    return df
@@ -0,0 +1,85 @@
+import tempfile
+
+import pandas as pd
+
+from acceso_datos import clave_parametros, cache_consultas, conexion, normalizar_sql, obtener_datos, verificar_cambios
+from instrumentacion import contar, tramo
+
+# El texto de COPY se acumula en memoria hasta este tamaño y luego pasa a disco
+MAX_BYTES_EN_MEMORIA = 64 * 1024 * 1024
+
+try:
+    import pyarrow  # noqa: F401
+    MOTOR_CSV = 'pyarrow'
+except ImportError:
+    MOTOR_CSV = 'c'
+
+# Tipos de las columnas de Hechos_Ventas al cargarlas para entrenamiento
+TIPOS_HECHOS = {
+    'id_venta': 'int32',
+    'id_sucursal': 'int32',
+    'id_producto': 'int32',
+    'id_cliente': 'int32',
+    'id_metodo_pago': 'int32',
+    'cantidad': 'int32',
+    'total': 'float32',
+    'id_fecha': 'datetime64[ns]',
+    'fecha': 'datetime64[ns]',
+}
+
+# Primera y última fecha con ventas (MIN/MAX por el índice sobre id_fecha de cada partición)
+QUERY_RANGO_HECHOS = 'SELECT MIN(id_fecha) AS desde, MAX(id_fecha) AS hasta FROM Hechos_Ventas'
+
+
+# Decodifica el CSV de COPY directamente en columnas NumPy tipadas
+def _decodificar(archivo, tipos):
+    fechas = [c for c, t in tipos.items() if str(t).startswith('datetime64')]
+    numericos = {c: t for c, t in tipos.items() if c not in fechas}
+    opciones = {'dtype': numericos, 'parse_dates': fechas}
+    if MOTOR_CSV == 'c':
+        opciones['date_format'] = '%Y-%m-%d'
+    return pd.read_csv(archivo, engine=MOTOR_CSV, **opciones)
+
+
+# Carga el resultado de una consulta con COPY ... TO STDOUT (CSV) en lugar de pd.read_sql:
+# no se crean objetos Python por fila y cada columna llega con su tipo final
+def cargar_copy(query, tipos=None, params=None):
+    with tramo("copy", "carga") as atributos, tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_EN_MEMORIA) as archivo:
+        with tramo("copy:transferencia", "db"):
+            with conexion() as conn:
+                with conn.cursor() as cur:
+                    sql = cur.mogrify(query.strip().rstrip(';'), params).decode()
+                    cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER)", archivo)
+        atributos["bytes"] = archivo.tell()
+        archivo.seek(0)
+        # Solo se aplican los tipos de las columnas presentes en el resultado
+        columnas = archivo.readline().decode().strip().split(',')
+        archivo.seek(0)
+        tipos = {c: t for c, t in (tipos or {}).items() if c in columnas}
+        with tramo("copy:decodificacion", "decodificacion", motor=MOTOR_CSV):
+            df = _decodificar(archivo, tipos)
+        atributos["filas"] = len(df)
+        return df
+
+
+# Igual que cargar_copy pero compartiendo la caché de acceso_datos (se invalida al cambiar Hechos_Ventas)
+def cargar_hechos(query, tipos=None, params=None):
+    tipos = tipos or TIPOS_HECHOS
+    verificar_cambios()
+    clave = ('copy', normalizar_sql(query), clave_parametros(params), tuple(sorted(tipos.items())))
+    df = cache_consultas.obtener(clave)
+    contar("cache_consultas:" + ("fallo" if df is None else "acierto"))
+    if df is None:
+        df = cargar_copy(query, tipos, params)
+        cache_consultas.guardar(clave, df)
+    return df.copy()
+
+
+# Rango de fechas de las ventas como (date, date), o (None, None) si la tabla está vacía.
+# Las páginas lo usan para acotar sus consultas por id_fecha y leer solo las particiones del periodo.
+def rango_fechas_hechos():
+    rango = obtener_datos(QUERY_RANGO_HECHOS)
+    desde, hasta = rango['desde'].iloc[0], rango['hasta'].iloc[0]
+    if pd.isna(desde) or pd.isna(hasta):
+        return None, None
+    return pd.Timestamp(desde).date(), pd.Timestamp(hasta).date()
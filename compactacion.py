@@ -0,0 +1,124 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Script con las definiciones del esquema en estrella
+ARCHIVO_ESQUEMA = Path(__file__).resolve().parent / "base de datos.sql"
+
+# Columnas derivadas en las páginas que corresponden a columnas de Dim_Fecha
+ALIAS_COLUMNAS = {
+    'año': ('dim_fecha', 'anio'),
+    'mes': ('dim_fecha', 'mes'),
+    'día': ('dim_fecha', 'dia'),
+    'fecha': ('dim_fecha', 'id_fecha'),
+}
+
+# Columnas calculadas con dt.weekday (Lunes=0 ... Domingo=6), no el texto de Dim_Fecha
+COLUMNAS_DIA_SEMANA_NUMERICO = {'día_semana'}
+
+# Un texto se guarda como categórico si tiene menos valores distintos que esta fracción de filas
+MAX_FRACCION_CATEGORIAS = 0.5
+
+# float32 representa exactamente enteros hasta 2^24
+MAX_ENTERO_EXACTO_FLOAT32 = 2 ** 24
+
+
+# Lee los CREATE TABLE del script SQL: {tabla: {columna: tipo}} (nombres en minúsculas)
+@lru_cache(maxsize=None)
+def leer_esquema(ruta=ARCHIVO_ESQUEMA):
+    texto = Path(ruta).read_text(encoding='utf-8')
+    texto = re.sub(r'--[^\n]*', '', texto)
+    esquema = {}
+    for tabla, cuerpo in re.findall(r'CREATE\s+TABLE\s+(\w+)\s*\((.*?)\);', texto, re.S | re.I):
+        columnas = {}
+        for linea in re.split(r',\s*\n', cuerpo):
+            linea = linea.strip()
+            coincidencia = re.match(r'(\w+)\s+([A-Za-z]+(?:\s*\(\s*\d+\s*(?:,\s*\d+\s*)?\))?)', linea)
+            if not coincidencia or coincidencia.group(1).upper() in ('FOREIGN', 'PRIMARY', 'UNIQUE', 'CONSTRAINT'):
+                continue
+            columnas[coincidencia.group(1).lower()] = re.sub(r'\s+', '', coincidencia.group(2).upper())
+        esquema[tabla.lower()] = columnas
+    return esquema
+
+
+# Tipo SQL de una columna buscando primero en las tablas indicadas y luego en los alias
+def tipo_sql(columna, tablas, esquema):
+    nombre = columna.lower()
+    for tabla in tablas:
+        if nombre in esquema.get(tabla, {}):
+            return esquema[tabla][nombre]
+    if nombre in ALIAS_COLUMNAS:
+        tabla, original = ALIAS_COLUMNAS[nombre]
+        return esquema.get(tabla, {}).get(original)
+    return None
+
+
+# Entero con el ancho mínimo que admite los valores presentes
+def _entero_minimo(serie):
+    if serie.isna().any():
+        return serie
+    return pd.to_numeric(serie, downcast='integer')
+
+
+# DECIMAL(p, s): float32 si es exacto a esa escala; si no, entero escalado o float64
+def _decimal(serie, escala, escalar):
+    valores = pd.to_numeric(serie, errors='coerce').astype('float64')
+    maximo = np.nanmax(np.abs(valores.to_numpy())) if len(valores) else 0.0
+    if escalar and not valores.isna().any():
+        return pd.to_numeric(np.round(valores * 10 ** escala).astype('int64'), downcast='integer'), escala
+    if maximo * 10 ** escala < MAX_ENTERO_EXACTO_FLOAT32:
+        return valores.astype('float32'), None
+    return valores, None
+
+
+# Compacta un DataFrame según los tipos de las tablas del esquema. Devuelve el DataFrame
+# compacto y un informe de memoria (bytes antes y después, y tipo final de cada columna).
+# Con escalar_decimales=True los DECIMAL se guardan como enteros escalados (df.attrs['escalas']).
+def compactar(df, tablas=('hechos_ventas', 'dim_fecha'), escalar_decimales=False):
+    esquema = leer_esquema()
+    tablas = [t.lower() for t in tablas]
+    antes = int(df.memory_usage(deep=True).sum())
+    resultado = df.copy()
+    escalas = {}
+
+    for columna in resultado.columns:
+        serie = resultado[columna]
+        tipo = tipo_sql(columna, tablas, esquema)
+        if columna in COLUMNAS_DIA_SEMANA_NUMERICO and pd.api.types.is_integer_dtype(serie):
+            resultado[columna] = _entero_minimo(serie)
+        elif tipo is None:
+            continue
+        elif tipo in ('INT', 'INTEGER', 'SERIAL', 'SMALLINT', 'BIGINT', 'BIGSERIAL'):
+            resultado[columna] = _entero_minimo(serie)
+        elif tipo.startswith(('DECIMAL', 'NUMERIC')):
+            escala = int(re.search(r',(\d+)\)', tipo).group(1)) if ',' in tipo else 0
+            resultado[columna], escala_usada = _decimal(serie, escala, escalar_decimales)
+            if escala_usada is not None:
+                escalas[columna] = escala_usada
+        elif tipo == 'DATE' and not pd.api.types.is_datetime64_any_dtype(serie):
+            resultado[columna] = pd.to_datetime(serie)
+        elif tipo.startswith(('VARCHAR', 'TEXT', 'CHAR')):
+            if serie.nunique(dropna=True) < MAX_FRACCION_CATEGORIAS * max(len(serie), 1):
+                resultado[columna] = serie.astype('category')
+        elif tipo == 'BOOLEAN' and not serie.isna().any():
+            resultado[columna] = serie.astype('bool')
+
+    if escalas:
+        resultado.attrs['escalas'] = escalas
+    despues = int(resultado.memory_usage(deep=True).sum())
+    informe = {
+        'bytes_antes': antes,
+        'bytes_despues': despues,
+        'reduccion': antes / despues if despues else float('nan'),
+        'tipos': {c: str(t) for c, t in resultado.dtypes.items()},
+    }
+    return resultado, informe
+
+
+# Texto corto para mostrar el informe de memoria en las páginas
+def resumen_memoria(nombre, informe):
+    return (f"{nombre}: {informe['bytes_antes'] / 2 ** 20:.2f} MB → "
+            f"{informe['bytes_despues'] / 2 ** 20:.2f} MB ({informe['reduccion']:.1f}x menos memoria)")
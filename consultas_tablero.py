@@ -0,0 +1,208 @@
+from dataclasses import dataclass, fields
+from datetime import date
+
+import pandas as pd
+
+from acceso_datos import obtener_datos
+
+# Reportes del tablero sobre el resumen diario (alias r). {donde} recibe las condiciones de los
+# filtros, que se aplican sobre las claves del resumen (id_fecha, id_sucursal, id_producto) para
+# que PostgreSQL use los índices y agregue solo las filas que pasan el filtro.
+REPORTES = {
+    'dia_semana_producto': '''
+        SELECT f.dia_semana AS dia_semana,
+               p.nombre AS nombre_producto,
+               SUM(r.suma_cantidad)::numeric / SUM(r.num_ventas) AS promedio_cantidad_vendida,
+               SUM(r.suma_total) AS total_ventas_dia
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Fecha f ON r.id_fecha = f.id_fecha
+        JOIN Dim_Productos p ON r.id_producto = p.id_producto
+        {donde}
+        GROUP BY f.dia_semana, p.nombre
+        ORDER BY
+            CASE
+                WHEN f.dia_semana = 'Lunes' THEN 1
+                WHEN f.dia_semana = 'Martes' THEN 2
+                WHEN f.dia_semana = 'Miércoles' THEN 3
+                WHEN f.dia_semana = 'Jueves' THEN 4
+                WHEN f.dia_semana = 'Viernes' THEN 5
+                WHEN f.dia_semana = 'Sábado' THEN 6
+                WHEN f.dia_semana = 'Domingo' THEN 7
+            END, p.nombre
+    ''',
+    'mes': '''
+        SELECT d.mes, SUM(r.suma_total) AS total_ventas
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Fecha d ON r.id_fecha = d.id_fecha
+        {donde}
+        GROUP BY d.mes
+        ORDER BY d.mes
+    ''',
+    'sucursal': '''
+        SELECT s.nombre, SUM(r.num_ventas)::bigint AS total_ventas
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Sucursales s ON r.id_sucursal = s.id_sucursal
+        {donde}
+        GROUP BY s.nombre
+    ''',
+    'categoria_subcategoria': '''
+        SELECT c.nombre AS categoria, sc.nombre_subcategoria, SUM(r.num_ventas)::bigint AS total_ventas
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Productos p ON r.id_producto = p.id_producto
+        JOIN Dim_Subcategorias sc ON p.id_subcategoria = sc.id_subcategoria
+        JOIN Dim_Categorias c ON sc.id_categoria = c.id_categoria
+        {donde}
+        GROUP BY c.nombre, sc.nombre_subcategoria
+        ORDER BY total_ventas DESC
+    ''',
+    'metodo_pago': '''
+        SELECT mp.metodo_pago, SUM(r.num_ventas)::bigint AS total_ventas
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Metodos_Pago mp ON r.id_metodo_pago = mp.id_metodo_pago
+        {donde}
+        GROUP BY mp.metodo_pago
+    ''',
+    'sucursal_dia_semana': '''
+        SELECT s.nombre AS sucursal, f.dia_semana, SUM(r.suma_total) AS total_ventas
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Sucursales s ON r.id_sucursal = s.id_sucursal
+        JOIN Dim_Fecha f ON r.id_fecha = f.id_fecha
+        {donde}
+        GROUP BY s.nombre, f.dia_semana
+        ORDER BY total_ventas DESC
+    ''',
+    'categoria_sucursal': '''
+        SELECT c.nombre AS categoria, s.nombre AS sucursal, SUM(r.num_ventas)::bigint AS total_ventas
+        FROM Resumen_Ventas_Diario r
+        JOIN Dim_Productos p ON r.id_producto = p.id_producto
+        JOIN Dim_Subcategorias sc ON p.id_subcategoria = sc.id_subcategoria
+        JOIN Dim_Categorias c ON sc.id_categoria = c.id_categoria
+        JOIN Dim_Sucursales s ON r.id_sucursal = s.id_sucursal
+        {donde}
+        GROUP BY c.nombre, s.nombre
+    ''',
+}
+
+# Ventas completas para la exportación (alias h); los filtros de fecha descartan las particiones
+# mensuales fuera del rango y dentro de cada una se usa el índice (id_fecha, id_sucursal)
+QUERY_HECHOS = 'SELECT h.* FROM Hechos_Ventas h {donde} ORDER BY h.id_venta'
+
+# Valores disponibles para la barra de filtros
+QUERY_RANGO_FECHAS = 'SELECT MIN(id_fecha) AS desde, MAX(id_fecha) AS hasta FROM Resumen_Ventas_Diario'
+QUERY_SUCURSALES = 'SELECT id_sucursal, nombre FROM Dim_Sucursales ORDER BY nombre'
+QUERY_CATEGORIAS = 'SELECT id_categoria, nombre FROM Dim_Categorias ORDER BY nombre'
+CONSULTAS_OPCIONES = {'rango_fechas': QUERY_RANGO_FECHAS, 'sucursales': QUERY_SUCURSALES,
+                      'categorias': QUERY_CATEGORIAS}
+
+# Clientes por género (no depende de las ventas, así que no admite filtros)
+QUERY_GENEROS = '''
+    SELECT g.genero, COUNT(c.id_cliente) AS total_clientes
+    FROM Dim_Clientes c
+    JOIN Dim_Genero g ON c.id_genero = g.id_genero
+    GROUP BY g.genero
+'''
+
+
+# Filtros del tablero; None o una tupla vacía significan "sin filtro". Es inmutable y
+# comparable, así que sirve como parte de una clave de caché.
+@dataclass(frozen=True)
+class Filtros:
+    fecha_desde: object = None
+    fecha_hasta: object = None
+    anios: tuple = ()
+    trimestres: tuple = ()
+    meses: tuple = ()
+    sucursales: tuple = ()
+    categorias: tuple = ()
+
+    def activos(self):
+        return any(getattr(self, campo.name) not in (None, ()) for campo in fields(self))
+
+
+# Condiciones SQL con parámetros enlazados (%(nombre)s) sobre las claves de la tabla `alias`.
+# Las listas se envían como arrays de PostgreSQL (= ANY), así el texto de la consulta no cambia
+# con el número de valores elegidos.
+def condiciones_filtros(filtros, alias='r'):
+    condiciones, params = [], {}
+    if filtros.fecha_desde is not None:
+        condiciones.append(f'{alias}.id_fecha >= %(fecha_desde)s')
+        params['fecha_desde'] = filtros.fecha_desde
+    if filtros.fecha_hasta is not None:
+        condiciones.append(f'{alias}.id_fecha <= %(fecha_hasta)s')
+        params['fecha_hasta'] = filtros.fecha_hasta
+    # Los años elegidos acotan también id_fecha con constantes: PostgreSQL descarta al planificar
+    # las particiones mensuales de Hechos_Ventas fuera de ese rango (con la subconsulta sola no puede)
+    if filtros.anios:
+        condiciones.append(f'{alias}.id_fecha >= %(anio_desde)s AND {alias}.id_fecha < %(anio_hasta)s')
+        params['anio_desde'] = date(min(filtros.anios), 1, 1)
+        params['anio_hasta'] = date(max(filtros.anios) + 1, 1, 1)
+    # Año, trimestre y mes se resuelven a fechas en Dim_Fecha y se aplican sobre id_fecha
+    calendario = []
+    for campo, columna in (('anios', 'anio'), ('trimestres', 'trimestre'), ('meses', 'mes')):
+        if getattr(filtros, campo):
+            calendario.append(f'{columna} = ANY(%({campo})s)')
+            params[campo] = list(getattr(filtros, campo))
+    if calendario:
+        condiciones.append(f"{alias}.id_fecha IN (SELECT id_fecha FROM Dim_Fecha WHERE {' AND '.join(calendario)})")
+    if filtros.sucursales:
+        condiciones.append(f'{alias}.id_sucursal = ANY(%(sucursales)s)')
+        params['sucursales'] = list(filtros.sucursales)
+    # La categoría se traduce a los productos que contiene
+    if filtros.categorias:
+        condiciones.append(f'''{alias}.id_producto IN (
+            SELECT fp.id_producto FROM Dim_Productos fp
+            JOIN Dim_Subcategorias fsc ON fp.id_subcategoria = fsc.id_subcategoria
+            WHERE fsc.id_categoria = ANY(%(categorias)s))''')
+        params['categorias'] = list(filtros.categorias)
+    return condiciones, params
+
+
+# Texto SQL y parámetros de una plantilla con {donde}. Sin filtros los parámetros son None
+# y la consulta queda igual que sin filtrar (misma entrada de caché).
+def construir_consulta(plantilla, filtros=None, alias='r'):
+    condiciones, params = condiciones_filtros(filtros or Filtros(), alias)
+    donde = 'WHERE ' + '\n          AND '.join(condiciones) if condiciones else ''
+    return plantilla.format(donde=donde), params or None
+
+
+def consulta_reporte(nombre, filtros=None):
+    return construir_consulta(REPORTES[nombre], filtros)
+
+
+def consulta_hechos(filtros=None):
+    return construir_consulta(QUERY_HECHOS, filtros, alias='h')
+
+
+# Reporte filtrado en PostgreSQL; la caché de acceso_datos guarda un resultado por
+# combinación de filtros (texto normalizado + parámetros)
+def obtener_reporte(nombre, filtros=None):
+    query, params = consulta_reporte(nombre, filtros)
+    return obtener_datos(query, params)
+
+
+# Todo lo que muestra el tablero sin filtros: los reportes, los géneros y las opciones de la
+# barra de filtros, como {nombre: (sql, params)}
+def consultas_sin_filtros():
+    consultas = {nombre: consulta_reporte(nombre) for nombre in REPORTES}
+    consultas['generos'] = (QUERY_GENEROS, None)
+    consultas.update({nombre: (query, None) for nombre, query in CONSULTAS_OPCIONES.items()})
+    return consultas
+
+
+# Catálogo para otros consumidores (API de reportes): cada consulta y si admite Filtros
+def catalogo():
+    return [{'nombre': nombre, 'filtrable': nombre in REPORTES} for nombre in consultas_sin_filtros()]
+
+
+# Valores de la barra de filtros: fechas extremas del resumen (como date) y dimensiones. `datos`
+# puede traer ya los resultados de CONSULTAS_OPCIONES (por ejemplo de una instantánea).
+def opciones_filtros(datos=None):
+    datos = datos or {nombre: obtener_datos(query) for nombre, query in CONSULTAS_OPCIONES.items()}
+    rango = datos['rango_fechas']
+    desde, hasta = rango['desde'].iloc[0], rango['hasta'].iloc[0]
+    return {
+        'desde': None if pd.isna(desde) else pd.Timestamp(desde).date(),
+        'hasta': None if pd.isna(hasta) else pd.Timestamp(hasta).date(),
+        'sucursales': datos['sucursales'],
+        'categorias': datos['categorias'],
+    }
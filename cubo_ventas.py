@@ -0,0 +1,107 @@
+import threading
+
+import pandas as pd
+
+from acceso_datos import cache_consultas, obtener_datos, verificar_cambios
+from instrumentacion import tramo
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+# Extracto único por refresco: el resumen diario con las etiquetas de cada dimensión
+QUERY_EXTRACTO = '''
+    SELECT f.mes, f.dia_semana,
+           s.nombre AS sucursal,
+           p.nombre AS nombre_producto,
+           c.nombre AS categoria,
+           sc.nombre_subcategoria,
+           mp.metodo_pago,
+           r.num_ventas, r.suma_cantidad, r.suma_total
+    FROM Resumen_Ventas_Diario r
+    JOIN Dim_Fecha f ON r.id_fecha = f.id_fecha
+    JOIN Dim_Sucursales s ON r.id_sucursal = s.id_sucursal
+    JOIN Dim_Productos p ON r.id_producto = p.id_producto
+    JOIN Dim_Subcategorias sc ON p.id_subcategoria = sc.id_subcategoria
+    JOIN Dim_Categorias c ON sc.id_categoria = c.id_categoria
+    JOIN Dim_Metodos_Pago mp ON r.id_metodo_pago = mp.id_metodo_pago
+'''
+
+COLUMNAS_DIMENSION = ['sucursal', 'nombre_producto', 'categoria', 'nombre_subcategoria', 'metodo_pago']
+
+
+# Convierte el extracto a columnas compactas: dimensiones categóricas y medidas numéricas
+def compactar_extracto(df):
+    df = df.copy()
+    for columna in COLUMNAS_DIMENSION:
+        df[columna] = df[columna].astype('category')
+    extras = sorted(set(df['dia_semana'].dropna()) - set(DIAS_SEMANA))
+    df['dia_semana'] = pd.Categorical(df['dia_semana'], categories=DIAS_SEMANA + extras, ordered=True)
+    df['mes'] = df['mes'].astype('int8')
+    df['num_ventas'] = df['num_ventas'].astype('int64')
+    df['suma_cantidad'] = df['suma_cantidad'].astype('int64')
+    df['suma_total'] = df['suma_total'].astype('float64')
+    return df
+
+
+# Cubo de ventas en memoria: todos los reportes del tablero con groupby vectorizados
+class CuboVentas:
+    def __init__(self, extracto):
+        self.datos = compactar_extracto(extracto)
+
+    def _agregar(self, dimensiones, medidas):
+        resultado = self.datos.groupby(dimensiones, observed=True, sort=True)[medidas].sum().reset_index()
+        # Los reportes esperan etiquetas simples, igual que las consultas SQL
+        for columna in dimensiones:
+            if isinstance(resultado[columna].dtype, pd.CategoricalDtype):
+                resultado[columna] = resultado[columna].astype(str)
+        return resultado
+
+    def ventas_dia_semana_producto(self):
+        df = self._agregar(['dia_semana', 'nombre_producto'], ['suma_cantidad', 'num_ventas', 'suma_total'])
+        df['promedio_cantidad_vendida'] = df['suma_cantidad'] / df['num_ventas']
+        df = df.rename(columns={'suma_total': 'total_ventas_dia'})
+        return df[['dia_semana', 'nombre_producto', 'promedio_cantidad_vendida', 'total_ventas_dia']]
+
+    def ventas_mes(self):
+        df = self._agregar(['mes'], ['suma_total'])
+        return df.rename(columns={'suma_total': 'total_ventas'})
+
+    def ventas_sucursal(self):
+        df = self._agregar(['sucursal'], ['num_ventas'])
+        return df.rename(columns={'sucursal': 'nombre', 'num_ventas': 'total_ventas'})
+
+    def ventas_categoria_subcategoria(self):
+        df = self._agregar(['categoria', 'nombre_subcategoria'], ['num_ventas'])
+        df = df.rename(columns={'num_ventas': 'total_ventas'})
+        return df.sort_values('total_ventas', ascending=False, ignore_index=True)
+
+    def ventas_metodo_pago(self):
+        df = self._agregar(['metodo_pago'], ['num_ventas'])
+        return df.rename(columns={'num_ventas': 'total_ventas'})
+
+    def ventas_sucursal_dia_semana(self):
+        df = self._agregar(['sucursal', 'dia_semana'], ['suma_total'])
+        df = df.rename(columns={'suma_total': 'total_ventas'})
+        return df.sort_values('total_ventas', ascending=False, ignore_index=True)
+
+    def ventas_categoria_sucursal(self):
+        df = self._agregar(['categoria', 'sucursal'], ['num_ventas'])
+        return df.rename(columns={'num_ventas': 'total_ventas'})
+
+
+_cubo = None
+_clave_cubo = None
+_candado_cubo = threading.Lock()
+
+
+# Cubo compartido por todas las sesiones; se reconstruye solo cuando cambian los datos
+def obtener_cubo():
+    global _cubo, _clave_cubo
+    version = verificar_cambios()
+    with _candado_cubo:
+        clave = (version, cache_consultas.generacion)
+        if _cubo is None or clave != _clave_cubo:
+            with tramo("cubo:construccion", "transformacion") as atributos:
+                _cubo = CuboVentas(obtener_datos(QUERY_EXTRACTO))
+                atributos["filas"] = len(_cubo.datos)
+            _clave_cubo = (version, cache_consultas.generacion)
+        return _cubo
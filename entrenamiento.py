@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from threadpoolctl import threadpool_limits
+
+from instrumentacion import contar, instrumentar, registrar_tramo
+from registro_modelos import buscar, clave_modelo, entrenar_y_evaluar, huella_datos, registrar
+
+try:
+    import resource
+except ImportError:  # Windows no tiene el módulo resource
+    resource = None
+
+# Procesos simultáneos como máximo (por defecto, uno por núcleo)
+MAX_PROCESOS = int(os.environ.get("PANCHITA_MAX_PROCESOS", os.cpu_count() or 1))
+
+# Nombres con los que cada librería expone su número de hilos
+PARAMETROS_HILOS = ("n_jobs", "nthread")
+
+
+# Reparto de núcleos: cada modelo recibe un presupuesto fijo de hilos para no sobresuscribir la CPU
+def hilos_por_modelo(num_modelos, num_procesos=None):
+    num_procesos = num_procesos or min(num_modelos, MAX_PROCESOS)
+    return max(1, (os.cpu_count() or 1) // max(1, num_procesos))
+
+
+def fijar_hilos(modelo, hilos):
+    params = modelo.get_params()
+    for parametro in PARAMETROS_HILOS:
+        if parametro in params:
+            modelo.set_params(**{parametro: hilos})
+    return modelo
+
+
+# Memoria pico del proceso en MB (RSS del sistema operativo si está disponible)
+def _memoria_pico_mb():
+    if resource is None:
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return pico / 2 ** 20 if os.uname().sysname == "Darwin" else pico / 2 ** 10
+
+
+# Se ejecuta en un proceso hijo: entrena un modelo con su presupuesto de hilos
+def _entrenar_en_proceso(modelo, hilos, X_train, X_test, y_train, y_test):
+    if resource is None:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    with threadpool_limits(limits=hilos):
+        modelo, predicciones, metricas = entrenar_y_evaluar(fijar_hilos(modelo, hilos), X_train, X_test, y_train, y_test)
+    metricas["segundos_pared"] = time.perf_counter() - inicio
+    metricas["memoria_pico_mb"] = _memoria_pico_mb()
+    metricas["hilos"] = hilos
+    return modelo, predicciones, metricas
+
+
+# Entrena en paralelo los modelos que no estén en el registro y devuelve {nombre: resultado}
+@instrumentar("entrenar_modelos", "modelo")
+def entrenar_modelos(modelos, X_train, X_test, y_train, y_test, max_procesos=None):
+    huella = huella_datos(X_train, X_test, y_train, y_test)
+    resultados = {}
+    pendientes = {}
+    for nombre, modelo in modelos.items():
+        clave = clave_modelo(nombre, modelo, huella)
+        resultado = buscar(nombre, clave)
+        contar("registro_modelos:" + ("fallo" if resultado is None else "acierto"))
+        if resultado is None:
+            pendientes[nombre] = (clave, modelo)
+        else:
+            resultados[nombre] = resultado
+
+    if pendientes:
+        num_procesos = min(len(pendientes), max_procesos or MAX_PROCESOS)
+        hilos = hilos_por_modelo(len(pendientes), num_procesos)
+        # Un proceso nuevo por modelo: así la memoria pico medida es la de ese modelo.
+        # Se usa "spawn" porque bifurcar el servidor de Streamlit (con hilos) no es seguro.
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=num_procesos, mp_context=contexto, max_tasks_per_child=1) as ejecutor:
+            futuros = {
+                nombre: ejecutor.submit(_entrenar_en_proceso, modelo, hilos, X_train, X_test, y_train, y_test)
+                for nombre, (clave, modelo) in pendientes.items()
+            }
+            for nombre, futuro in futuros.items():
+                clave = pendientes[nombre][0]
+                resultados[nombre] = registrar(nombre, clave, *futuro.result())
+                # El entrenamiento ocurrió en otro proceso: se registra con la duración que midió
+                registrar_tramo(f"fit:{nombre}", "modelo", resultados[nombre]["segundos_pared"],
+                                hilo=f"proceso {nombre}", filas=len(X_train),
+                                memoria_pico_mb=resultados[nombre]["memoria_pico_mb"])
+
+    # Mismo orden que el diccionario de entrada
+    return {nombre: resultados[nombre] for nombre in modelos}
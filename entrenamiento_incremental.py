@@ -0,0 +1,260 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from xgboost import XGBRegressor
+
+from acceso_datos import conexion, horizonte_ventas
+from carga_masiva import TIPOS_HECHOS, cargar_copy
+from compactacion import compactar
+from registro_modelos import DIRECTORIO_MODELOS
+
+# Rondas de boosting que se añaden a XGBoost en cada actualización
+RONDAS_INCREMENTALES = 20
+
+# Árboles que se añaden al Random Forest en cada actualización (y tope antes de un reentrenamiento)
+ARBOLES_INCREMENTALES = 10
+MAX_ARBOLES = 500
+
+# Reentrenamiento completo programado (para los modelos sin actualización incremental)
+INTERVALO_REENTRENAMIENTO_DIAS = 7
+
+# Pausa antes de volver a pedir el horizonte seguro en un entrenamiento completo
+ESPERA_HORIZONTE_SEGUNDOS = 1
+
+# Consulta de las ventas entre la marca de agua y el horizonte seguro (acceso_datos.horizonte_ventas)
+QUERY_CANTIDAD = """
+    SELECT id_venta, id_sucursal, id_producto, cantidad, id_fecha AS fecha
+    FROM Hechos_Ventas
+    WHERE id_venta > %(desde)s AND id_venta <= %(hasta)s
+    ORDER BY id_venta
+"""
+
+COLUMNAS_CANTIDAD = ['id_sucursal', 'id_producto', 'año', 'mes', 'día', 'día_semana']
+
+
+# Regresión lineal por mínimos cuadrados que acumula X'X y X'y: partial_fit con lotes nuevos
+# da exactamente los mismos coeficientes que ajustar sobre todo el histórico
+class RegresionLinealIncremental(RegressorMixin, BaseEstimator):
+    def fit(self, X, y):
+        for atributo in ('xtx_', 'xty_', 'n_'):
+            if hasattr(self, atributo):
+                delattr(self, atributo)
+        return self.partial_fit(X, y)
+
+    def partial_fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ampliada = np.column_stack([np.ones(len(X)), X])
+        if not hasattr(self, 'xtx_'):
+            self.xtx_ = np.zeros((ampliada.shape[1], ampliada.shape[1]))
+            self.xty_ = np.zeros(ampliada.shape[1])
+            self.n_ = 0
+        self.xtx_ += ampliada.T @ ampliada
+        self.xty_ += ampliada.T @ y
+        self.n_ += len(X)
+        solucion = np.linalg.lstsq(self.xtx_, self.xty_, rcond=None)[0]
+        self.intercept_, self.coef_ = solucion[0], solucion[1:]
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+
+# Modelos del conjunto de cantidad vendida (misma configuración que la página)
+def modelos_cantidad():
+    return {
+        "Regresión Lineal": RegresionLinealIncremental(),
+        "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
+        "Gradient Boosting": GradientBoostingRegressor(random_state=42),
+        "XGBoost": XGBRegressor(random_state=42),
+    }
+
+
+# Características de calendario para el conjunto de cantidad
+def preparar_cantidad(datos):
+    datos = datos.copy()
+    datos['año'] = datos['fecha'].dt.year
+    datos['mes'] = datos['fecha'].dt.month
+    datos['día'] = datos['fecha'].dt.day
+    datos['día_semana'] = datos['fecha'].dt.weekday
+    datos, _ = compactar(datos)
+    return datos[COLUMNAS_CANTIDAD], datos['cantidad']
+
+
+def _directorio(nombre_conjunto):
+    return DIRECTORIO_MODELOS / "incremental" / nombre_conjunto
+
+
+# Se resuelve el enlace una sola vez para leer estado y modelos de la misma versión
+def cargar_estado(nombre_conjunto):
+    directorio = _directorio(nombre_conjunto).resolve()
+    if not (directorio / "estado.json").exists():
+        return None, None
+    estado = json.loads((directorio / "estado.json").read_text())
+    modelos = joblib.load(directorio / "modelos.joblib")
+    return modelos, estado
+
+
+# Cada guardado escribe en su propia carpeta de versión y cambia de una vez el enlace
+# <conjunto> para que apunte a ella: quien lee ve siempre el estado anterior o el nuevo, nunca
+# una mezcla ni un hueco. Se conserva la versión anterior por si alguien la está leyendo.
+def _guardar_estado(nombre_conjunto, modelos, estado):
+    directorio = _directorio(nombre_conjunto)
+    directorio.parent.mkdir(parents=True, exist_ok=True)
+    version = Path(tempfile.mkdtemp(prefix=directorio.name + ".", dir=directorio.parent))
+    try:
+        joblib.dump(modelos, version / "modelos.joblib")
+        (version / "estado.json").write_text(json.dumps(estado, indent=2))
+        anterior = directorio.resolve() if directorio.is_symlink() else None
+        if directorio.exists() and anterior is None:
+            # Estado guardado como carpeta normal por versiones anteriores
+            shutil.rmtree(directorio)
+        enlace = directorio.with_name(version.name + ".enlace")
+        enlace.symlink_to(version.name)
+        os.replace(enlace, directorio)
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+    for antigua in directorio.parent.glob(directorio.name + ".*"):
+        if antigua.is_dir() and not antigua.is_symlink() and antigua not in (version, anterior):
+            shutil.rmtree(antigua, ignore_errors=True)
+
+
+# Bloqueo exclusivo por conjunto (entre procesos y entre hilos): dos actualizaciones simultáneas
+# leerían la misma marca de agua y la última en guardar descartaría las filas de la otra
+@contextmanager
+def _bloqueo(nombre_conjunto):
+    ruta = _directorio(nombre_conjunto).with_name(nombre_conjunto + ".lock")
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, "a") as archivo:
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+# Actualiza un modelo solo con las filas nuevas; devuelve False si el modelo no lo admite
+def _actualizar_modelo(modelo, X, y):
+    if isinstance(modelo, RegresionLinealIncremental):
+        modelo.partial_fit(X, y)
+    elif isinstance(modelo, XGBRegressor):
+        # Se continúa el booster existente añadiendo rondas entrenadas con los datos nuevos
+        booster = modelo.get_booster()
+        modelo.set_params(n_estimators=RONDAS_INCREMENTALES)
+        modelo.fit(X, y, xgb_model=booster)
+    elif isinstance(modelo, RandomForestRegressor):
+        if modelo.n_estimators + ARBOLES_INCREMENTALES > MAX_ARBOLES:
+            return False
+        modelo.set_params(warm_start=True, n_estimators=modelo.n_estimators + ARBOLES_INCREMENTALES)
+        modelo.fit(X, y)
+    else:
+        return False
+    return True
+
+
+def _reentrenar(modelo_inicial, X, y):
+    modelo = clone(modelo_inicial)
+    modelo.fit(X, y)
+    return modelo
+
+
+# Horizonte seguro de id_venta y candidato siguiente (se guarda en el estado como lista)
+def _horizonte(pendiente):
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            hasta, pendiente = horizonte_ventas(cur, tuple(pendiente) if pendiente else None)
+    return hasta, list(pendiente) if pendiente else None
+
+
+def _dias_desde(fecha_texto):
+    return (datetime.now() - datetime.fromisoformat(fecha_texto)).total_seconds() / 86400
+
+
+# Trae solo las ventas con id_venta posterior a la marca de agua (sin pasar del horizonte seguro,
+# para no saltarse ventas de transacciones que confirman más tarde) y actualiza los modelos:
+# incrementalmente los que lo permiten y con reentrenamiento completo el resto cuando toca.
+# Devuelve los modelos, el estado (marca de agua) y un informe por modelo.
+def actualizar_modelos(nombre_conjunto="cantidad", query=QUERY_CANTIDAD, preparar=preparar_cantidad,
+                       modelos_iniciales=None, forzar_completo=False):
+    with _bloqueo(nombre_conjunto):
+        return _actualizar_modelos(nombre_conjunto, query, preparar, modelos_iniciales, forzar_completo)
+
+
+def _actualizar_modelos(nombre_conjunto, query, preparar, modelos_iniciales, forzar_completo):
+    modelos_iniciales = modelos_iniciales or modelos_cantidad()
+    modelos, estado = cargar_estado(nombre_conjunto)
+    completo = forzar_completo or modelos is None or set(modelos) != set(modelos_iniciales)
+    desde = 0 if completo else estado["ultimo_id_venta"]
+    anterior = None if completo else estado.get("pendiente")
+    hasta, pendiente = _horizonte(anterior)
+    while completo and hasta is None:
+        time.sleep(ESPERA_HORIZONTE_SEGUNDOS)
+        hasta, pendiente = _horizonte(pendiente)
+    hasta = desde if hasta is None else max(hasta, desde)
+
+    nuevos = cargar_copy(query, TIPOS_HECHOS, params={"desde": desde, "hasta": hasta})
+    informe = {}
+    if nuevos.empty:
+        if completo:
+            raise ValueError("No hay ventas en Hechos_Ventas para entrenar los modelos")
+        if hasta != desde or pendiente != anterior:
+            estado = {**estado, "ultimo_id_venta": hasta, "pendiente": pendiente}
+            _guardar_estado(nombre_conjunto, modelos, estado)
+        return modelos, estado, {nombre: {"accion": "sin cambios", "filas": 0, "segundos": 0.0} for nombre in modelos}
+
+    X_nuevos, y_nuevos = preparar(nuevos)
+    vencido = not completo and _dias_desde(estado["ultimo_reentrenamiento"]) >= INTERVALO_REENTRENAMIENTO_DIAS
+    historico = None
+    if completo:
+        modelos = {}
+
+    for nombre, modelo_inicial in modelos_iniciales.items():
+        inicio = time.perf_counter()
+        if completo:
+            modelos[nombre] = _reentrenar(modelo_inicial, X_nuevos, y_nuevos)
+            accion, filas = "completo", len(X_nuevos)
+        elif _actualizar_modelo(modelos[nombre], X_nuevos, y_nuevos):
+            accion, filas = "incremental", len(X_nuevos)
+        elif vencido or isinstance(modelos[nombre], RandomForestRegressor):
+            # Reentrenamiento programado (o el bosque llegó a su tope de árboles)
+            if historico is None:
+                historico = preparar(cargar_copy(query, TIPOS_HECHOS, params={"desde": 0, "hasta": hasta}))
+            modelos[nombre] = _reentrenar(modelo_inicial, *historico)
+            accion, filas = "completo", len(historico[0])
+        else:
+            accion, filas = "pendiente de reentrenamiento", 0
+        informe[nombre] = {"accion": accion, "filas": filas, "segundos": time.perf_counter() - inicio}
+
+    ahora = datetime.now().isoformat(timespec="seconds")
+    estado = {
+        "ultimo_id_venta": int(hasta),
+        "pendiente": pendiente,
+        "ultimo_id_fecha": pd.Timestamp(nuevos['fecha'].max()).date().isoformat(),
+        "filas_acumuladas": (0 if completo else estado["filas_acumuladas"]) + len(nuevos),
+        "ultimo_reentrenamiento": ahora if completo or vencido else estado["ultimo_reentrenamiento"],
+        "ultima_actualizacion": ahora,
+    }
+    _guardar_estado(nombre_conjunto, modelos, estado)
+    return modelos, estado, informe
+
+
+if __name__ == "__main__":
+    # Pensado para ejecutarse tras la carga diaria: python entrenamiento_incremental.py [--completo]
+    import sys
+
+    _, estado_final, informe_final = actualizar_modelos(forzar_completo="--completo" in sys.argv)
+    print(json.dumps({"estado": estado_final, "modelos": informe_final}, indent=2, ensure_ascii=False))
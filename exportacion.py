@@ -0,0 +1,115 @@
+import io
+import shutil
+import tempfile
+import zipfile
+
+import pandas as pd
+
+from acceso_datos import conexion
+
+# Tamaño de los bloques copiados hacia la entrada del ZIP
+TAMANO_BLOQUE_BYTES = 1024 * 1024
+
+# Filas por lote al leer con cursor del lado del servidor o al escribir un DataFrame
+TAMANO_LOTE_FILAS = 50_000
+
+# Por encima de este tamaño los archivos temporales pasan de memoria a disco
+MAX_BYTES_EN_MEMORIA = 16 * 1024 * 1024
+
+FORMATOS = ['CSV', 'Parquet']
+
+
+# CSV de una consulta con COPY ... TO STDOUT: PostgreSQL envía los datos ya formateados
+# y psycopg2 los escribe bloque a bloque en la entrada del ZIP
+def _csv_desde_consulta(destino, query, params=None):
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            sql = cur.mogrify(query.strip().rstrip(';'), params).decode()
+            cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER)", destino, size=TAMANO_BLOQUE_BYTES)
+
+
+# CSV de un DataFrame escrito por lotes de filas, sin generar el texto completo en memoria
+def _csv_desde_dataframe(destino, df):
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline='', write_through=True)
+    try:
+        for desde in range(0, max(len(df), 1), TAMANO_LOTE_FILAS):
+            df.iloc[desde:desde + TAMANO_LOTE_FILAS].to_csv(texto, index=False, header=(desde == 0))
+    finally:
+        texto.detach()
+
+
+# Lotes de una consulta leídos con un cursor con nombre (del lado del servidor)
+def _lotes_desde_consulta(query, params=None):
+    with conexion() as conn:
+        with conn.cursor(name='exportacion') as cur:
+            cur.itersize = TAMANO_LOTE_FILAS
+            cur.execute(query, params)
+            columnas = None
+            vacia = True
+            while True:
+                filas = cur.fetchmany(TAMANO_LOTE_FILAS)
+                if columnas is None:
+                    columnas = [d[0] for d in cur.description]
+                if not filas:
+                    break
+                yield pd.DataFrame.from_records(filas, columns=columnas)
+                vacia = False
+            if vacia:
+                # Como con un DataFrame vacío: un lote sin filas con las columnas de la consulta
+                yield pd.DataFrame(columns=columnas)
+
+
+def _lotes_desde_dataframe(df):
+    for desde in range(0, max(len(df), 1), TAMANO_LOTE_FILAS):
+        yield df.iloc[desde:desde + TAMANO_LOTE_FILAS]
+
+
+# Parquet escrito por grupos de filas en un archivo temporal y luego copiado al ZIP
+def _parquet(destino, lotes):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with tempfile.SpooledTemporaryFile(max_size=MAX_BYTES_EN_MEMORIA) as temporal:
+        escritor = None
+        esquema = None
+        for lote in lotes:
+            tabla = pa.Table.from_pandas(lote, schema=esquema, preserve_index=False)
+            if escritor is None:
+                esquema = tabla.schema
+                escritor = pq.ParquetWriter(temporal, esquema, compression='snappy')
+            escritor.write_table(tabla)
+        if escritor is None:
+            # Sin lotes: una tabla vacía, para que la entrada siga siendo un Parquet válido
+            pq.write_table(pa.table({}), temporal)
+        else:
+            escritor.close()
+        temporal.seek(0)
+        shutil.copyfileobj(temporal, destino, TAMANO_BLOQUE_BYTES)
+
+
+# Crea un ZIP con una entrada por fuente. Cada fuente puede ser un DataFrame, una consulta SQL
+# (texto) o una tupla (consulta, parámetros); las consultas se transmiten desde el servidor por
+# bloques y el ZIP se arma en un archivo temporal en disco.
+# Devuelve los bytes del ZIP: st.download_button no acepta archivos temporales y de todos modos
+# carga el contenido completo en memoria para enviarlo.
+def crear_zip(fuentes, nombres_archivos, formato='CSV'):
+    with tempfile.TemporaryFile() as salida:
+        _escribir_zip(salida, fuentes, nombres_archivos, formato)
+        salida.seek(0)
+        return salida.read()
+
+
+def _escribir_zip(salida, fuentes, nombres_archivos, formato):
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for fuente, nombre in zip(fuentes, nombres_archivos):
+            extension = 'parquet' if formato == 'Parquet' else 'csv'
+            with zip_file.open(f"{nombre}.{extension}", 'w', force_zip64=True) as destino:
+                es_consulta = isinstance(fuente, (str, tuple))
+                if isinstance(fuente, str):
+                    fuente = (fuente, None)
+                if formato == 'Parquet':
+                    _parquet(destino, _lotes_desde_consulta(*fuente) if es_consulta else _lotes_desde_dataframe(fuente))
+                elif es_consulta:
+                    _csv_desde_consulta(destino, *fuente)
+                else:
+                    _csv_desde_dataframe(destino, fuente)
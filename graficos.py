@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from instrumentacion import instrumentar, tramo
+
+# Plotly se importa dentro de cada función que construye una figura: las páginas que importan
+# este módulo no pagan su carga antes de dibujar el primer contenido
+
+# Hasta este número de puntos se dibujan todos (con WebGL)
+UMBRAL_PUNTOS = 20_000
+
+# Por encima de este número los gráficos de dispersión se agregan en un mapa de densidad
+UMBRAL_DENSIDAD = 200_000
+
+# Celdas por eje del mapa de densidad
+BINS_DENSIDAD = 100
+
+# Tamaño máximo del JSON enviado al navegador por figura
+MAX_BYTES_FIGURA = 2 * 1024 * 1024
+
+# Menor número de puntos al reducir una figura para respetar MAX_BYTES_FIGURA
+MIN_PUNTOS = 500
+
+
+# Largest-Triangle-Three-Buckets: conserva la forma de una serie ordenada con n_salida puntos.
+# Devuelve los índices elegidos.
+def lttb(x, y, n_salida):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+    bordes = np.linspace(1, n - 1, n_salida - 1).astype(np.int64)
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_salida - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Promedio del cubo siguiente como tercer vértice del triángulo
+        sig_inicio, sig_fin = fin, bordes[i + 2] if i + 2 < len(bordes) else n
+        x_medio = x[sig_inicio:sig_fin].mean() if sig_fin > sig_inicio else x[-1]
+        y_medio = y[sig_inicio:sig_fin].mean() if sig_fin > sig_inicio else y[-1]
+        areas = np.abs((x[anterior] - x_medio) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (y_medio - y[anterior]))
+        anterior = inicio + int(np.nanargmax(areas)) if len(areas) else inicio
+        indices[i + 1] = anterior
+    return indices
+
+
+# Muestra estratificada: cada grupo conserva su proporción en la muestra
+def muestreo_estratificado(df, n, columna_grupo=None, semilla=0):
+    if len(df) <= n:
+        return df
+    if columna_grupo is None or columna_grupo not in df.columns:
+        return df.sample(n=n, random_state=semilla)
+    return df.groupby(columna_grupo, observed=True).sample(frac=n / len(df), random_state=semilla)
+
+
+def _bytes_figura(fig):
+    return len(fig.to_json())
+
+
+def _texto_resumen(total, dibujados, metodo):
+    if metodo == 'todos':
+        return f"Se muestran los {total:,} puntos."
+    return f"Se muestran {dibujados:,} de {total:,} puntos ({metodo})."
+
+
+# Construye la figura con n puntos y la reduce a la mitad hasta que su JSON quepa en MAX_BYTES_FIGURA
+def _con_tope_bytes(construir, total, n_inicial, metodo):
+    with tramo("grafico:construccion", "grafico", filas=total) as atributos:
+        n = n_inicial
+        fig, dibujados = construir(n)
+        tamano = _bytes_figura(fig)
+        while tamano > MAX_BYTES_FIGURA and n > MIN_PUNTOS:
+            n = max(MIN_PUNTOS, n // 2)
+            fig, dibujados = construir(n)
+            tamano = _bytes_figura(fig)
+            metodo = metodo if metodo != 'todos' else 'muestra estratificada'
+        atributos.update(bytes=tamano, puntos=dibujados, metodo=metodo)
+    return fig, _texto_resumen(total, dibujados, metodo)
+
+
+# Mapa de densidad calculado en el servidor: solo viajan BINS x BINS celdas
+@instrumentar("grafico:densidad", "grafico")
+def _densidad(df, x, y, titulo, etiquetas):
+    import plotly.graph_objects as go
+
+    datos = df[[x, y]].apply(pd.to_numeric, errors='coerce').dropna()
+    conteos, bordes_x, bordes_y = np.histogram2d(datos[x], datos[y], bins=BINS_DENSIDAD)
+    centros_x = (bordes_x[:-1] + bordes_x[1:]) / 2
+    centros_y = (bordes_y[:-1] + bordes_y[1:]) / 2
+    fig = go.Figure(go.Heatmap(x=centros_x, y=centros_y, z=np.where(conteos.T > 0, conteos.T, np.nan),
+                               colorscale='Viridis', colorbar={'title': 'Puntos'}))
+    fig.update_layout(title=titulo, xaxis_title=etiquetas.get(x, x), yaxis_title=etiquetas.get(y, y))
+    return fig, f"{len(datos):,} puntos agregados en una rejilla de {BINS_DENSIDAD}x{BINS_DENSIDAD} celdas."
+
+
+# Dispersión 2D: WebGL con todos los puntos, muestra estratificada por color o mapa de densidad.
+# Devuelve la figura y un texto con cuántos puntos se resumieron.
+def dispersion(df, x, y, color=None, titulo=None, etiquetas=None, **opciones):
+    etiquetas = etiquetas or {}
+    total = len(df)
+    if total > UMBRAL_DENSIDAD:
+        return _densidad(df, x, y, titulo, etiquetas)
+
+    def construir(n):
+        import plotly.express as px
+
+        muestra = muestreo_estratificado(df, n, color)
+        fig = px.scatter(muestra, x=x, y=y, color=color, title=titulo, labels=etiquetas,
+                         render_mode='webgl', **opciones)
+        return fig, len(muestra)
+
+    metodo = 'todos' if total <= UMBRAL_PUNTOS else 'muestra estratificada'
+    return _con_tope_bytes(construir, total, min(total, UMBRAL_PUNTOS), metodo)
+
+
+# Dispersión 3D (ya usa WebGL): por encima del umbral se dibuja una muestra estratificada
+def dispersion_3d(df, x, y, z, color=None, titulo=None, etiquetas=None, **opciones):
+    total = len(df)
+
+    def construir(n):
+        import plotly.express as px
+
+        muestra = muestreo_estratificado(df, n, color)
+        fig = px.scatter_3d(muestra, x=x, y=y, z=z, color=color, title=titulo, labels=etiquetas or {}, **opciones)
+        return fig, len(muestra)
+
+    metodo = 'todos' if total <= UMBRAL_PUNTOS else 'muestra estratificada'
+    return _con_tope_bytes(construir, total, min(total, UMBRAL_PUNTOS), metodo)
+
+
+# Varias series sobre el mismo eje X (por ejemplo valores reales y predicciones por índice).
+# Cada serie se reduce con LTTB, que conserva picos y valles, y se dibuja con Scattergl.
+def series(df, columnas, titulo=None, modo='markers', etiqueta_x='Índice', etiqueta_y=None,
+           colores=None, template=None):
+    total = len(df)
+    x = np.arange(total)
+    colores = colores or {}
+
+    def construir(n):
+        import plotly.graph_objects as go
+
+        fig = go.Figure()
+        dibujados = 0
+        for columna in columnas:
+            indices = lttb(x, df[columna].to_numpy(), n)
+            dibujados = max(dibujados, len(indices))
+            fig.add_trace(go.Scattergl(x=x[indices], y=df[columna].to_numpy()[indices], mode=modo, name=columna,
+                                       marker={'color': colores[columna]} if columna in colores else None))
+        fig.update_layout(title=titulo, xaxis_title=etiqueta_x, yaxis_title=etiqueta_y, template=template)
+        return fig, dibujados
+
+    metodo = 'todos' if total <= UMBRAL_PUNTOS else 'LTTB por serie'
+    return _con_tope_bytes(construir, total, min(total, UMBRAL_PUNTOS), metodo)
+
+
+# Versión para matplotlib (página de EDA): hexbin por encima del umbral, si no, dispersión
+def dispersion_matplotlib(ax, df, x, y):
+    datos = df[[x, y]]
+    numericos = all(pd.api.types.is_numeric_dtype(datos[c]) for c in (x, y))
+    total = len(datos)
+    if total > UMBRAL_PUNTOS and numericos:
+        datos = datos.dropna()
+        malla = ax.hexbin(datos[x], datos[y], gridsize=BINS_DENSIDAD // 2, mincnt=1, cmap='viridis')
+        ax.figure.colorbar(malla, ax=ax, label='Puntos')
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+        return f"{len(datos):,} puntos agregados en celdas hexagonales."
+    muestra = muestreo_estratificado(datos, UMBRAL_PUNTOS)
+    ax.scatter(muestra[x], muestra[y], s=8)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    return _texto_resumen(total, len(muestra), 'todos' if total <= UMBRAL_PUNTOS else 'muestra aleatoria')
@@ -0,0 +1,363 @@
+import argparse
+import io
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acceso_datos import conexion
+from instrumentacion import contar, iniciar_ejecucion, tramo
+from particiones import asegurar_particiones, es_particionada, indices_incompletos
+
+# Filas por lote: cada lote se resuelve y codifica mientras el anterior se envía con COPY
+FILAS_POR_LOTE = 500_000
+
+# Tamaño de los bloques que psycopg2 envía por el COPY
+TAMANO_BLOQUE_COPY = 8 * 1024 * 1024
+
+# Con cargas de al menos este número de filas (y una fracción apreciable de la tabla) los índices
+# secundarios y las claves foráneas de Hechos_Ventas se quitan y se reconstruyen al final
+MIN_FILAS_SIN_INDICES = 1_000_000
+FRACCION_SIN_INDICES = 0.2
+
+# Memoria para reconstruir índices y validar claves foráneas al terminar la carga
+MEMORIA_MANTENIMIENTO = '512MB'
+
+DIAS_SEMANA_SQL = "(ARRAY['Lunes','Martes','Miércoles','Jueves','Viernes','Sábado','Domingo'])[EXTRACT(ISODOW FROM d)::int]"
+
+# Fechas nuevas de las ventas: Dim_Fecha se extiende antes de copiar el lote que las usa
+QUERY_EXTENDER_FECHAS = f'''
+    INSERT INTO Dim_Fecha (id_fecha, dia, mes, anio, dia_semana, trimestre)
+    SELECT d, EXTRACT(DAY FROM d), EXTRACT(MONTH FROM d), EXTRACT(YEAR FROM d),
+           {DIAS_SEMANA_SQL}, EXTRACT(QUARTER FROM d)
+    FROM unnest(%(fechas)s::date[]) AS d
+    ON CONFLICT (id_fecha) DO NOTHING
+'''
+
+# Claves naturales de cada dimensión en los archivos de ventas y su clave sustituta
+DIMENSIONES = {
+    'sucursal': ('SELECT nombre, id_sucursal FROM Dim_Sucursales', 'id_sucursal'),
+    'producto': ('SELECT nombre, id_producto FROM Dim_Productos', 'id_producto'),
+    'cliente': ('SELECT email, id_cliente FROM Dim_Clientes WHERE email IS NOT NULL ORDER BY id_cliente',
+                'id_cliente'),
+    'metodo_pago': ('SELECT metodo_pago, id_metodo_pago FROM Dim_Metodos_Pago', 'id_metodo_pago'),
+}
+
+# Columnas de entrada (total es opcional: si falta se calcula con el precio del producto)
+COLUMNAS_ENTRADA = ['fecha', 'sucursal', 'producto', 'cliente', 'metodo_pago', 'cantidad', 'total']
+
+COLUMNAS_HECHOS = ['id_sucursal', 'id_producto', 'id_cliente', 'id_fecha', 'id_metodo_pago', 'cantidad', 'total']
+
+# Índices secundarios y claves foráneas de la tabla de hechos (la clave primaria no se toca)
+QUERY_INDICES_HECHOS = '''
+    SELECT i.indexname, i.indexdef
+    FROM pg_indexes i
+    WHERE i.tablename = 'hechos_ventas'
+      AND i.indexname NOT IN (SELECT conname FROM pg_constraint WHERE contype IN ('p', 'u'))
+'''
+QUERY_CLAVES_FORANEAS_HECHOS = '''
+    SELECT conname, pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE conrelid = 'hechos_ventas'::regclass AND contype = 'f'
+'''
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    MOTOR_CSV = 'pyarrow'
+except ImportError:
+    MOTOR_CSV = 'pandas'
+
+
+# Búsqueda de claves sustitutas en memoria: se lee cada dimensión una sola vez y cada lote
+# se resuelve con factorize (un acceso al diccionario por valor distinto, no por fila)
+class CacheDimensiones:
+    def __init__(self):
+        self.claves = {}
+        self.precios = {}
+        self.fechas = np.array([], dtype='datetime64[D]')
+
+    def cargar(self):
+        with conexion() as conn:
+            with conn.cursor() as cur:
+                for dimension, (query, _) in DIMENSIONES.items():
+                    cur.execute(query)
+                    mapa = {}
+                    for natural, sustituta in cur.fetchall():
+                        mapa.setdefault(natural, sustituta)
+                    self.claves[dimension] = mapa
+                cur.execute('SELECT id_producto, precio FROM Dim_Productos')
+                self.precios = {id_producto: float(precio) for id_producto, precio in cur.fetchall()}
+                cur.execute('SELECT id_fecha FROM Dim_Fecha')
+                self.fechas = np.sort(np.array([f for (f,) in cur.fetchall()], dtype='datetime64[D]'))
+        return self
+
+    @staticmethod
+    def _resolver_columna(valores, mapa, tipo=np.int64, faltante=-1):
+        codigos, unicos = pd.factorize(valores)
+        resueltos = np.fromiter((mapa.get(v, faltante) for v in unicos), dtype=tipo, count=len(unicos))
+        return np.where(codigos >= 0, resueltos[codigos], faltante)
+
+    # Devuelve las columnas de Hechos_Ventas, las filas rechazadas (clave desconocida o dato
+    # faltante) y las fechas que aún no están en Dim_Fecha
+    def resolver(self, lote):
+        ids = {columna: self._resolver_columna(lote[dimension], self.claves[dimension])
+               for dimension, (_, columna) in DIMENSIONES.items()}
+        fechas = pd.to_datetime(lote['fecha'], errors='coerce').to_numpy().astype('datetime64[D]')
+        cantidad = pd.to_numeric(lote['cantidad'], errors='coerce').to_numpy()
+        if 'total' in lote:
+            total = pd.to_numeric(lote['total'], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            precio = self._resolver_columna(ids['id_producto'], self.precios, np.float64, np.nan)
+            total = np.round(cantidad * precio, 2)
+        validas = ~np.isnat(fechas) & ~np.isnan(cantidad) & ~np.isnan(total)
+        for columna in ids.values():
+            validas &= columna >= 0
+
+        hechos = {columna: valores[validas].astype(np.int32) for columna, valores in ids.items()}
+        hechos.update(id_fecha=fechas[validas], cantidad=cantidad[validas].astype(np.int32), total=total[validas])
+        nuevas = np.setdiff1d(np.unique(hechos['id_fecha']), self.fechas, assume_unique=True)
+        return {c: hechos[c] for c in COLUMNAS_HECHOS}, lote[~validas], nuevas
+
+    def agregar_fechas(self, fechas):
+        self.fechas = np.union1d(self.fechas, fechas)
+
+
+# Texto CSV para COPY: con pyarrow las columnas se escriben directamente desde NumPy
+def codificar(hechos):
+    salida = io.BytesIO()
+    if MOTOR_CSV == 'pyarrow':
+        tabla = pa.table({c: pa.array(v) for c, v in hechos.items()})
+        pa_csv.write_csv(tabla, salida, pa_csv.WriteOptions(include_header=False))
+    else:
+        pd.DataFrame(hechos).to_csv(salida, index=False, header=False, date_format='%Y-%m-%d')
+    salida.seek(0)
+    return salida
+
+
+def extender_dim_fecha(cur, fechas):
+    if len(fechas):
+        cur.execute(QUERY_EXTENDER_FECHAS, {'fechas': [pd.Timestamp(f).date() for f in fechas]})
+
+
+def copiar_hechos(cur, texto):
+    columnas = ', '.join(COLUMNAS_HECHOS)
+    cur.copy_expert(f'COPY Hechos_Ventas ({columnas}) FROM STDIN WITH (FORMAT CSV)', texto, size=TAMANO_BLOQUE_COPY)
+
+
+# Quita los índices secundarios y las claves foráneas; devuelve sus definiciones para recrearlos
+def quitar_indices():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute(QUERY_INDICES_HECHOS)
+            indices = cur.fetchall()
+            cur.execute(QUERY_CLAVES_FORANEAS_HECHOS)
+            claves = cur.fetchall()
+            for nombre, _ in claves:
+                cur.execute(f'ALTER TABLE Hechos_Ventas DROP CONSTRAINT {nombre}')
+            for nombre, _ in indices:
+                cur.execute(f'DROP INDEX {nombre}')
+    return indices, claves
+
+
+# Recrea los índices y vuelve a añadir las claves foráneas como NOT VALID + VALIDATE: la
+# validación es un solo recorrido con join en lugar de una comprobación por fila insertada.
+# En la tabla particionada pg_indexes describe los índices como "ON ONLY hechos_ventas" (solo la
+# tabla padre, inválidos hasta adjuntar uno por partición): sin ONLY, PostgreSQL los crea en cada
+# partición. Las claves foráneas se validan al añadirlas (no se admite NOT VALID ahí).
+def recrear_indices(indices, claves):
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SET maintenance_work_mem = '{MEMORIA_MANTENIMIENTO}'")
+            for nombre, definicion in indices:
+                with tramo(f'ingesta:indice:{nombre}', 'db'):
+                    cur.execute(re.sub(r'\bON ONLY\b', 'ON', definicion, count=1))
+            if es_particionada(cur):
+                incompletos = indices_incompletos(cur)
+                if incompletos:
+                    raise RuntimeError(f"Índices sin crear en todas las particiones: {', '.join(incompletos)}")
+                for nombre, definicion in claves:
+                    with tramo(f'ingesta:validar:{nombre}', 'db'):
+                        cur.execute(f'ALTER TABLE Hechos_Ventas ADD CONSTRAINT {nombre} {definicion}')
+                return
+            for nombre, definicion in claves:
+                cur.execute(f'ALTER TABLE Hechos_Ventas ADD CONSTRAINT {nombre} {definicion} NOT VALID')
+            for nombre, _ in claves:
+                with tramo(f'ingesta:validar:{nombre}', 'db'):
+                    cur.execute(f'ALTER TABLE Hechos_Ventas VALIDATE CONSTRAINT {nombre}')
+
+
+def filas_hechos_estimadas():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            # Suma de las particiones (la tabla particionada no guarda filas propias)
+            cur.execute('''
+                SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+                FROM pg_partition_tree('hechos_ventas') t
+                JOIN pg_class c ON c.oid = t.relid
+            ''')
+            fila = cur.fetchone()
+            return fila[0] if fila else 0
+
+
+def conviene_quitar_indices(filas):
+    return filas is not None and filas >= max(MIN_FILAS_SIN_INDICES, FRACCION_SIN_INDICES * filas_hechos_estimadas())
+
+
+# Lotes de un archivo de ventas (CSV o Parquet) con las columnas de COLUMNAS_ENTRADA
+def leer_lotes(ruta, filas_por_lote=FILAS_POR_LOTE):
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == '.parquet':
+        import pyarrow.parquet as pq
+
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=filas_por_lote):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(ruta, chunksize=filas_por_lote, dtype={'cliente': str})
+
+
+def contar_filas(ruta):
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == '.parquet':
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(ruta).metadata.num_rows
+    with open(ruta, 'rb') as archivo:
+        return sum(bloque.count(b'\n') for bloque in iter(lambda: archivo.read(1 << 24), b'')) - 1
+
+
+# Ventas sintéticas con claves naturales válidas (para pruebas de carga y el banco de pruebas)
+def generar_ventas(cache, filas, inicio='2024-01-01', dias=365, semilla=0, filas_por_lote=FILAS_POR_LOTE):
+    rng = np.random.default_rng(semilla)
+    naturales = {dimension: np.array(list(cache.claves[dimension]), dtype=object) for dimension in DIMENSIONES}
+    for desde in range(0, filas, filas_por_lote):
+        n = min(filas_por_lote, filas - desde)
+        lote = pd.DataFrame({dimension: valores[rng.integers(0, len(valores), n)]
+                             for dimension, valores in naturales.items()})
+        lote['fecha'] = np.datetime64(inicio) + rng.integers(0, dias, n).astype('timedelta64[D]')
+        lote['cantidad'] = rng.integers(1, 11, n)
+        yield lote
+
+
+# Carga por lotes: mientras un lote viaja con COPY, un hilo resuelve las claves y codifica el
+# siguiente. Cada lote se confirma por separado; si la carga falla, los índices se recrean igual.
+# `progreso(informe, segundos)` se llama tras cada lote confirmado.
+def ingerir(lotes, cache=None, quitar=None, filas_estimadas=None, refrescar_resumen=True, progreso=None):
+    cache = cache or CacheDimensiones().cargar()
+    quitar = conviene_quitar_indices(filas_estimadas) if quitar is None else quitar
+    informe = {'filas': 0, 'rechazadas': 0, 'fechas_nuevas': 0, 'lotes': 0, 'particiones_nuevas': 0,
+               'indices_reconstruidos': quitar}
+    rechazos = []
+    inicio = time.perf_counter()
+
+    def preparar(lote):
+        with tramo('ingesta:resolver', 'transformacion', filas=len(lote)):
+            hechos, rechazadas, nuevas = cache.resolver(lote)
+        with tramo('ingesta:codificar', 'codificacion', motor=MOTOR_CSV) as atributos:
+            texto = codificar(hechos)
+            atributos['bytes'] = texto.getbuffer().nbytes
+        return len(hechos['cantidad']), texto, rechazadas, nuevas, np.unique(hechos['id_fecha'])
+
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            particionada = es_particionada(cur)
+    definiciones = quitar_indices() if quitar else None
+    try:
+        lotes = iter(lotes)
+        with ThreadPoolExecutor(max_workers=1) as ejecutor:
+            siguiente = next(lotes, None)
+            futuro = ejecutor.submit(preparar, siguiente) if siguiente is not None else None
+            while futuro is not None:
+                filas, texto, rechazadas, nuevas, fechas = futuro.result()
+                siguiente = next(lotes, None)
+                futuro = ejecutor.submit(preparar, siguiente) if siguiente is not None else None
+                with tramo('ingesta:copy', 'db', filas=filas, bytes=texto.getbuffer().nbytes):
+                    with conexion() as conn:
+                        with conn.cursor() as cur:
+                            extender_dim_fecha(cur, nuevas)
+                            # Los meses nuevos reciben su partición antes del COPY (no la por defecto)
+                            if particionada:
+                                informe['particiones_nuevas'] += len(asegurar_particiones(cur, fechas))
+                            copiar_hechos(cur, texto)
+                cache.agregar_fechas(nuevas)
+                informe['filas'] += filas
+                informe['rechazadas'] += len(rechazadas)
+                informe['fechas_nuevas'] += len(nuevas)
+                informe['lotes'] += 1
+                contar('ingesta:filas', filas)
+                if len(rechazadas):
+                    rechazos.append(rechazadas)
+                if progreso is not None:
+                    progreso(informe, time.perf_counter() - inicio)
+    finally:
+        if definiciones is not None:
+            with tramo('ingesta:recrear_indices', 'db'):
+                recrear_indices(*definiciones)
+    informe['segundos_carga'] = time.perf_counter() - inicio
+
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute('ANALYZE Hechos_Ventas')
+            cur.execute('ANALYZE Dim_Fecha')
+    if refrescar_resumen:
+        from rollups import crear_rollups, refrescar_rollups
+
+        with tramo('ingesta:resumen', 'db'):
+            crear_rollups()
+            refrescar_rollups()
+    informe['segundos'] = time.perf_counter() - inicio
+    informe['filas_por_segundo'] = informe['filas'] / informe['segundos_carga'] if informe['segundos_carga'] else 0.0
+    return informe, pd.concat(rechazos, ignore_index=True) if rechazos else pd.DataFrame(columns=COLUMNAS_ENTRADA)
+
+
+def mostrar_progreso(informe, segundos):
+    print(f"  lote {informe['lotes']}: {informe['filas']:,} filas ({informe['filas'] / segundos:,.0f} filas/s)")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Carga masiva de ventas en Hechos_Ventas con COPY")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--archivo", help="CSV o Parquet con las columnas " + ", ".join(COLUMNAS_ENTRADA))
+    origen.add_argument("--generar", type=int, help="Número de ventas sintéticas a generar y cargar")
+    parser.add_argument("--desde", default="2024-01-01", help="Primera fecha de las ventas sintéticas")
+    parser.add_argument("--dias", type=int, default=365, help="Días cubiertos por las ventas sintéticas")
+    parser.add_argument("--filas-por-lote", type=int, default=FILAS_POR_LOTE)
+    indices = parser.add_mutually_exclusive_group()
+    indices.add_argument("--quitar-indices", action="store_true", default=None, dest="quitar",
+                         help="Quitar y reconstruir índices y claves foráneas (por defecto según el tamaño)")
+    indices.add_argument("--mantener-indices", action="store_false", dest="quitar")
+    parser.add_argument("--rechazos", help="CSV donde guardar las filas con claves desconocidas")
+    parser.add_argument("--sin-resumen", action="store_true", help="No actualizar Resumen_Ventas_Diario")
+    args = parser.parse_args(argumentos)
+
+    ejecucion = iniciar_ejecucion("ingesta")
+    cache = CacheDimensiones().cargar()
+    if args.generar:
+        lotes = generar_ventas(cache, args.generar, args.desde, args.dias, filas_por_lote=args.filas_por_lote)
+        filas = args.generar
+    else:
+        lotes = leer_lotes(args.archivo, args.filas_por_lote)
+        filas = contar_filas(args.archivo)
+    print(f"Cargando {filas:,} ventas ({MOTOR_CSV} para codificar)...")
+    informe, rechazadas = ingerir(lotes, cache, args.quitar, filas, refrescar_resumen=not args.sin_resumen,
+                                  progreso=mostrar_progreso)
+    ejecucion.cerrar()
+
+    print(f"{informe['filas']:,} filas en {informe['segundos_carga']:.2f} s "
+          f"({informe['filas_por_segundo']:,.0f} filas/s), {informe['rechazadas']:,} rechazadas, "
+          f"{informe['fechas_nuevas']} fechas nuevas en Dim_Fecha, {informe['particiones_nuevas']} particiones nuevas, "
+          f"índices {'reconstruidos' if informe['indices_reconstruidos'] else 'mantenidos'}")
+    print(ejecucion.resumen().round(1).to_string(index=False))
+    if len(rechazadas) and args.rechazos:
+        rechazadas.to_csv(args.rechazos, index=False)
+        print(f"Filas rechazadas guardadas en {args.rechazos}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Uso: python ingesta.py --archivo ventas_2025.csv   |   python ingesta.py --generar 5000000
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Carpeta de las trazas exportadas (formato Chrome trace, se abren en chrome://tracing o Perfetto)
+DIRECTORIO_TRAZAS = Path(os.environ.get("PANCHITA_DIR_TRAZAS", Path(__file__).resolve().parent / "trazas"))
+
+# Con PANCHITA_EXPORTAR_TRAZAS=1 cada ejecución de una página guarda su traza al terminar
+EXPORTAR_SIEMPRE = os.environ.get("PANCHITA_EXPORTAR_TRAZAS", "") not in ("", "0")
+
+# Atributos que se suman en el resumen del panel
+ATRIBUTOS_NUMERICOS = ("filas", "bytes")
+
+_ejecucion_actual = contextvars.ContextVar("ejecucion_actual", default=None)
+
+# Primera vez que el proceso pasó por cada marca (perf_counter_ns), p. ej. el primer pintado
+# tras un arranque en frío; medir_arranque.py la compara con el inicio del proceso
+MARCAS = {}
+
+
+# Tramos y contadores de una ejecución (un rerun de Streamlit o una corrida de un script)
+class Ejecucion:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.inicio_ns = time.perf_counter_ns()
+        self.fin_ns = None
+        self.fecha = datetime.now()
+        self.tramos = []
+        self.marcas = {}
+        self.contadores = Counter()
+        self._candado = threading.Lock()
+
+    def agregar(self, nombre, categoria, inicio_ns, fin_ns, atributos, hilo=None):
+        with self._candado:
+            self.tramos.append({
+                "nombre": nombre,
+                "categoria": categoria,
+                "inicio_ns": inicio_ns,
+                "fin_ns": fin_ns,
+                "hilo": hilo if hilo is not None else threading.get_ident(),
+                "atributos": atributos,
+            })
+
+    def contar(self, nombre, valor=1):
+        with self._candado:
+            self.contadores[nombre] += valor
+
+    def marcar(self, nombre, instante_ns):
+        with self._candado:
+            self.marcas.setdefault(nombre, instante_ns)
+
+    # Milisegundos desde el inicio de la ejecución hasta cada marca
+    def marcas_ms(self):
+        return {nombre: (instante - self.inicio_ns) / 1e6 for nombre, instante in self.marcas.items()}
+
+    def cerrar(self):
+        if self.fin_ns is None:
+            self.fin_ns = time.perf_counter_ns()
+
+    @property
+    def duracion_ms(self):
+        return ((self.fin_ns or time.perf_counter_ns()) - self.inicio_ns) / 1e6
+
+    # Tabla por nombre de tramo: llamadas, tiempo total y máximo, filas y bytes acumulados
+    def resumen(self):
+        if not self.tramos:
+            return pd.DataFrame(columns=["tramo", "categoria", "llamadas", "total_ms", "max_ms", *ATRIBUTOS_NUMERICOS])
+        tabla = pd.DataFrame({
+            "tramo": [t["nombre"] for t in self.tramos],
+            "categoria": [t["categoria"] for t in self.tramos],
+            "ms": [(t["fin_ns"] - t["inicio_ns"]) / 1e6 for t in self.tramos],
+            **{a: [t["atributos"].get(a, 0) or 0 for t in self.tramos] for a in ATRIBUTOS_NUMERICOS},
+        })
+        return (tabla.groupby(["tramo", "categoria"], as_index=False)
+                .agg(llamadas=("ms", "size"), total_ms=("ms", "sum"), max_ms=("ms", "max"),
+                     **{a: (a, "sum") for a in ATRIBUTOS_NUMERICOS})
+                .sort_values("total_ms", ascending=False, ignore_index=True))
+
+    # Eventos en formato Chrome trace: "X" (duración completa) por tramo y "C" por contador
+    def a_chrome(self):
+        pid = os.getpid()
+        eventos = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.nombre}}]
+        # Los hilos con nombre (p. ej. procesos hijo) reciben un identificador numérico propio
+        hilos = {}
+        for t in self.tramos:
+            if not isinstance(t["hilo"], int) and t["hilo"] not in hilos:
+                hilos[t["hilo"]] = -(len(hilos) + 1)
+                eventos.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": hilos[t["hilo"]],
+                                "args": {"name": t["hilo"]}})
+        for t in self.tramos:
+            eventos.append({
+                "name": t["nombre"],
+                "cat": t["categoria"],
+                "ph": "X",
+                "ts": (t["inicio_ns"] - self.inicio_ns) / 1e3,
+                "dur": (t["fin_ns"] - t["inicio_ns"]) / 1e3,
+                "pid": pid,
+                "tid": hilos.get(t["hilo"], t["hilo"]),
+                "args": {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                         for k, v in t["atributos"].items()},
+            })
+        for nombre, instante in self.marcas.items():
+            eventos.append({"name": nombre, "cat": "marca", "ph": "i", "s": "p", "pid": pid,
+                            "ts": (instante - self.inicio_ns) / 1e3})
+        fin = ((self.fin_ns or time.perf_counter_ns()) - self.inicio_ns) / 1e3
+        for nombre, valor in self.contadores.items():
+            eventos.append({"name": nombre, "ph": "C", "ts": fin, "pid": pid, "args": {"valor": valor}})
+        return {"traceEvents": eventos, "displayTimeUnit": "ms",
+                "otherData": {"ejecucion": self.nombre, "fecha": self.fecha.isoformat(timespec="seconds")}}
+
+    def exportar(self, ruta=None):
+        DIRECTORIO_TRAZAS.mkdir(parents=True, exist_ok=True)
+        seguro = "".join(c if c.isalnum() else "_" for c in self.nombre)
+        ruta = Path(ruta) if ruta else DIRECTORIO_TRAZAS / f"{seguro}_{self.fecha:%Y%m%d_%H%M%S_%f}.json"
+        ruta.write_text(json.dumps(self.a_chrome(), ensure_ascii=False))
+        return ruta
+
+
+# Empieza a registrar una ejecución nueva en el contexto actual (al inicio de cada página)
+def iniciar_ejecucion(nombre):
+    ejecucion = Ejecucion(nombre)
+    _ejecucion_actual.set(ejecucion)
+    return ejecucion
+
+
+def ejecucion_actual():
+    return _ejecucion_actual.get()
+
+
+# Mide un bloque de código. Devuelve el diccionario de atributos para que el bloque añada
+# filas, bytes, acierto de caché, etc. Sin ejecución activa no registra nada.
+@contextmanager
+def tramo(nombre, categoria="general", **atributos):
+    ejecucion = _ejecucion_actual.get()
+    if ejecucion is None:
+        yield atributos
+        return
+    inicio = time.perf_counter_ns()
+    try:
+        yield atributos
+    finally:
+        ejecucion.agregar(nombre, categoria, inicio, time.perf_counter_ns(), atributos)
+
+
+# Decorador equivalente a envolver la función completa en un tramo
+def instrumentar(nombre=None, categoria="general"):
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with tramo(nombre or funcion.__qualname__, categoria):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# Tramo medido fuera de este proceso (por ejemplo un entrenamiento en un proceso hijo):
+# se registra terminando ahora, con la duración informada
+def registrar_tramo(nombre, categoria, segundos, hilo=None, **atributos):
+    ejecucion = _ejecucion_actual.get()
+    if ejecucion is None:
+        return
+    fin = time.perf_counter_ns()
+    ejecucion.agregar(nombre, categoria, fin - int(segundos * 1e9), fin, atributos, hilo)
+
+
+def contar(nombre, valor=1):
+    ejecucion = _ejecucion_actual.get()
+    if ejecucion is not None:
+        ejecucion.contar(nombre, valor)
+
+
+# Marca un instante de la ejecución (por ejemplo "primer_pintado" justo después del título de
+# una página). La primera vez en el proceso también queda en MARCAS.
+def marcar(nombre):
+    instante = time.perf_counter_ns()
+    MARCAS.setdefault(nombre, instante)
+    ejecucion = _ejecucion_actual.get()
+    if ejecucion is not None:
+        ejecucion.marcar(nombre, instante)
+
+
+# Al final de cada página: cierra la ejecución, la exporta si está configurado y
+# muestra el panel de perfilado en la barra lateral si el usuario lo activa
+def finalizar_ejecucion():
+    import streamlit as st
+
+    ejecucion = _ejecucion_actual.get()
+    if ejecucion is None:
+        return None
+    ejecucion.cerrar()
+    if EXPORTAR_SIEMPRE:
+        ejecucion.exportar()
+    if st.sidebar.checkbox("Mostrar perfilado de la ejecución", key="perfilado_ejecucion"):
+        st.sidebar.subheader("Perfilado")
+        st.sidebar.write(f"Ejecución completa: {ejecucion.duracion_ms:.0f} ms")
+        for nombre, ms in ejecucion.marcas_ms().items():
+            st.sidebar.write(f"{nombre.replace('_', ' ').capitalize()}: {ms:.0f} ms")
+        st.sidebar.dataframe(ejecucion.resumen().round(2), hide_index=True)
+        if ejecucion.contadores:
+            st.sidebar.write(dict(ejecucion.contadores))
+        if st.sidebar.button("Exportar traza (Chrome)", key="exportar_traza"):
+            st.sidebar.success(f"Traza guardada en {ejecucion.exportar()}")
+    return ejecucion
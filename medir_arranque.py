@@ -0,0 +1,147 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent
+DIRECTORIO_RESULTADOS = RAIZ / "benchmarks" / "resultados"
+
+# Tablero principal y objetivo de primer pintado en frío
+PAGINA_PRINCIPAL = "visualizador"
+OBJETIVO_PRIMER_PINTADO_MS = 1000
+
+# Módulos propios cuya importación debe seguir siendo barata (las dependencias pesadas se
+# cargan dentro de las funciones que las usan)
+MODULOS = [
+    "instrumentacion", "acceso_datos", "rollups", "cubo_ventas", "exportacion", "carga_masiva", "compactacion",
+    "graficos", "registro_modelos", "entrenamiento", "busqueda_hiperparametros", "pronostico_lote",
+    "pronostico_series", "perfil_eda", "pca_incremental", "cache_columnar", "particiones", "refresco_tablero",
+    "cache_figuras", "api_reportes",
+]
+
+# Proceso hijo de una página: ejecuta el script completo con AppTest (el mismo motor que
+# `streamlit run`, sin servidor ni navegador) y devuelve los instantes de perf_counter_ns,
+# que en Linux y macOS es un reloj del sistema comparable con el del proceso padre
+_SCRIPT_PAGINA = r"""
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+from streamlit.testing.v1 import AppTest
+streamlit_ns = time.perf_counter_ns()
+prueba = AppTest.from_file({pagina!r}, default_timeout={espera})
+errores = []
+try:
+    prueba.run()
+except Exception as e:
+    errores.append(repr(e))
+fin_ns = time.perf_counter_ns()
+errores += [str(e.value) for e in prueba.exception]
+marcas = sys.modules["instrumentacion"].MARCAS if "instrumentacion" in sys.modules else {{}}
+print(json.dumps({{"streamlit_ns": streamlit_ns, "fin_ns": fin_ns, "marcas": marcas, "errores": errores}}))
+"""
+
+_SCRIPT_MODULO = r"""
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter_ns()
+import {modulo}
+print(json.dumps({{"ms": (time.perf_counter_ns() - inicio) / 1e6, "cargados": sorted(
+    m for m in ("sklearn", "xgboost", "plotly", "matplotlib", "seaborn", "joblib", "psycopg2")
+    if m in sys.modules)}}))
+"""
+
+
+def paginas():
+    return {PAGINA_PRINCIPAL: RAIZ / f"{PAGINA_PRINCIPAL}.py",
+            **{ruta.stem: ruta for ruta in sorted((RAIZ / "pages").glob("*.py"))}}
+
+
+def _ejecutar(codigo, espera):
+    lanzamiento = time.perf_counter_ns()
+    proceso = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True,
+                             timeout=espera + 30)
+    if proceso.returncode != 0 or not proceso.stdout.strip():
+        return lanzamiento, None, (proceso.stderr.strip().splitlines() or ["sin salida"])[-1]
+    return lanzamiento, json.loads(proceso.stdout.strip().splitlines()[-1]), None
+
+
+# Arranque en frío de una página: todo se mide desde el lanzamiento del intérprete
+def medir_pagina(ruta, espera=120):
+    codigo = _SCRIPT_PAGINA.format(raiz=str(RAIZ), pagina=str(ruta), espera=espera)
+    lanzamiento, datos, error = _ejecutar(codigo, espera)
+    if datos is None:
+        return {"error": error}
+    pintado = datos["marcas"].get("primer_pintado")
+    return {
+        "importar_streamlit_ms": (datos["streamlit_ns"] - lanzamiento) / 1e6,
+        "primer_pintado_ms": (pintado - lanzamiento) / 1e6 if pintado else None,
+        "ejecucion_completa_ms": (datos["fin_ns"] - lanzamiento) / 1e6,
+        "error": "; ".join(datos["errores"]) or None,
+    }
+
+
+# Costo de importar cada módulo propio en un intérprete nuevo y qué dependencias pesadas arrastra
+def medir_modulos(modulos=MODULOS):
+    resultados = {}
+    for modulo in modulos:
+        _, datos, error = _ejecutar(_SCRIPT_MODULO.format(raiz=str(RAIZ), modulo=modulo), 60)
+        resultados[modulo] = datos or {"error": error}
+    return resultados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío y primer pintado por página")
+    parser.add_argument("--paginas", nargs="+", help="Nombres de página (por defecto todas)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--espera", type=int, default=120, help="Segundos máximos por ejecución de página")
+    parser.add_argument("--sin-paginas", action="store_true", help="Medir solo la importación de módulos")
+    args = parser.parse_args(argumentos)
+
+    print("Importación de módulos (intérprete nuevo):")
+    modulos = medir_modulos()
+    for modulo, datos in modulos.items():
+        if "error" in datos:
+            print(f"  {modulo:<26} error: {datos['error']}")
+        else:
+            print(f"  {modulo:<26} {datos['ms']:8.1f} ms  {', '.join(datos['cargados'])}")
+
+    resultados_paginas = {}
+    if not args.sin_paginas:
+        seleccion = {n: r for n, r in paginas().items() if not args.paginas or n in args.paginas}
+        print("\nPáginas (mediana de las repeticiones, desde el lanzamiento del proceso):")
+        for nombre, ruta in seleccion.items():
+            medidas = [medir_pagina(ruta, args.espera) for _ in range(args.repeticiones)]
+            validas = [m for m in medidas if m.get("primer_pintado_ms") is not None]
+            resultado = {"repeticiones": medidas}
+            if validas:
+                for clave in ("importar_streamlit_ms", "primer_pintado_ms", "ejecucion_completa_ms"):
+                    valores = sorted(m[clave] for m in validas)
+                    resultado[clave] = valores[len(valores) // 2]
+                print(f"  {nombre:<20} streamlit {resultado['importar_streamlit_ms']:7.0f} ms  "
+                      f"primer pintado {resultado['primer_pintado_ms']:7.0f} ms  "
+                      f"completa {resultado['ejecucion_completa_ms']:8.0f} ms")
+            else:
+                print(f"  {nombre:<20} sin primer pintado: {medidas[-1].get('error')}")
+            resultados_paginas[nombre] = resultado
+
+    salida = {"fecha": datetime.now().isoformat(timespec="seconds"), "modulos": modulos,
+              "paginas": resultados_paginas, "objetivo_primer_pintado_ms": OBJETIVO_PRIMER_PINTADO_MS}
+    DIRECTORIO_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    archivo = DIRECTORIO_RESULTADOS / f"arranque_{datetime.now():%Y%m%d_%H%M%S}.json"
+    archivo.write_text(json.dumps(salida, indent=2, ensure_ascii=False))
+    print(f"\nResultados guardados en {archivo}")
+
+    # Código de salida distinto de cero si el tablero principal no cumple el objetivo
+    principal = resultados_paginas.get(PAGINA_PRINCIPAL, {}).get("primer_pintado_ms")
+    if principal is not None and principal > OBJETIVO_PRIMER_PINTADO_MS:
+        print(f"El primer pintado de {PAGINA_PRINCIPAL} ({principal:.0f} ms) supera el objetivo de "
+              f"{OBJETIVO_PRIMER_PINTADO_MS} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Uso: python medir_arranque.py [--paginas visualizador EDA] [--repeticiones 5]
+    sys.exit(main())
@@ -1,32 +1,44 @@
 import streamlit as st
 import pandas as pd
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-import plotly.express as px
 import numpy as np
 
+from graficos import dispersion, dispersion_3d
+from instrumentacion import finalizar_ejecucion, iniciar_ejecucion, marcar
+from pca_incremental import ajustar_pca, leer_encabezado
+
+# Tramos de tiempo de esta ejecución (panel de perfilado en la barra lateral)
+iniciar_ejecucion("ACP")
+
 # Configurar la página
 st.set_page_config(layout="wide")
 
 # Título de la aplicación
 st.title("Análisis de Componentes Principales (PCA) con Streamlit y Plotly")
+marcar("primer_pintado")
 
 # Cargar el dataset externo
 st.header("1. Cargar dataset")
 
 # Subida de archivo
-uploaded_file = st.file_uploader("Sube tu archivo Excel", type=["xls", "xlsx"])
+uploaded_file = st.file_uploader("Sube tu archivo Excel (o CSV para datasets muy grandes)", type=["xls", "xlsx", "csv"])
 
 if uploaded_file is not None:
+    # Plotly solo hace falta cuando hay un archivo que graficar
+    import plotly.express as px
+
+    # El archivo se recorre por bloques; aquí solo se leen las primeras filas
+    @st.cache_data
+    def load_head(file):
+        return leer_encabezado(file)
+
+    # Una sola descomposición por archivo y selección de columnas: mover el deslizador no recalcula nada
     @st.cache_data
-    def load_data(file):
-        # Lee el archivo Excel
-        df = pd.read_excel(file)
-        return df
+    def fit_pca(file, columns):
+        return ajustar_pca(file, list(columns))
 
-    df = load_data(uploaded_file)
+    df = load_head(uploaded_file)
     st.write("### Dataset original:")
-    st.dataframe(df.head())
+    st.dataframe(df)
 
     # Seleccionar las variables para PCA (variables numéricas)
     st.header("2. Selección de variables para PCA")
@@ -35,39 +47,36 @@ if uploaded_file is not None:
 
     # Continuar con el análisis
     if selected_columns:
+        resultado_pca = fit_pca(uploaded_file, tuple(selected_columns))
+
         # Estandarización de los datos
         st.header("3. Estandarización de los datos")
         st.write("El PCA requiere que las variables estén estandarizadas para que todas tengan la misma importancia.")
-        scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(df[selected_columns])
-
-        st.write("### Datos escalados (primeras 5 filas):")
-        st.dataframe(pd.DataFrame(scaled_data, columns=selected_columns).head())
+        st.write(f"### Datos escalados (primeras 5 filas de {resultado_pca.n}):")
+        st.dataframe(resultado_pca.escalados_muestra)
 
         # Calcular la matriz de covarianza
         st.header("4. Matriz de Covarianza")
-        cov_matrix = np.cov(scaled_data, rowvar=False)
+        cov_matrix = resultado_pca.covarianza_escalada
         st.write("### Matriz de Covarianza:")
         st.dataframe(pd.DataFrame(cov_matrix, columns=selected_columns, index=selected_columns))
 
         # Aplicar PCA
         st.header("5. Aplicación de PCA")
         n_components = st.slider("Número de componentes", min_value=1, max_value=len(selected_columns), value=2)
-        pca = PCA(n_components=n_components)
-        pca_result = pca.fit_transform(scaled_data)
 
         # Obtener los vectores propios
         st.header("6. Vectores propios (Eigenvectors)")
-        eigenvectors = pca.components_
+        eigenvectors = resultado_pca.componentes(n_components)
         st.dataframe(pd.DataFrame(eigenvectors, columns=selected_columns, index=[f'PC{i+1}' for i in range(n_components)]))
 
-        # Crear un DataFrame con los resultados del PCA
-        pca_df = pd.DataFrame(pca_result, columns=[f'PC{i+1}' for i in range(n_components)])
+        # Crear un DataFrame con los resultados del PCA (se guardan hasta tres componentes para los gráficos)
+        pca_df = resultado_pca.puntuaciones_df(n_components)
         st.write(f"### Resultado del PCA con {n_components} componentes principales:")
-        st.dataframe(pca_df.head())
+        st.dataframe(resultado_pca.muestra_puntuaciones(n_components))
 
         # Explicación de la varianza acumulada
-        explained_variance = pca.explained_variance_ratio_
+        explained_variance = resultado_pca.varianza_explicada_ratio(n_components)
         
         # Gráfico de barras de varianza explicada
         st.header("8. Varianza Explicada por cada Componente")
@@ -87,32 +96,37 @@ if uploaded_file is not None:
         # Visualización de los Componentes Principales
         st.header("7. Visualización de los Componentes Principales")
         if 'Categoría' not in pca_df.columns:
-            pca_df['Categoría'] = np.random.choice(['Grupo A', 'Grupo B', 'Grupo C'], size=len(pca_df))
+            pca_df['Categoría'] = np.random.default_rng(0).choice(['Grupo A', 'Grupo B', 'Grupo C'], size=len(pca_df))
 
         if n_components < 3:
             st.write("Gráfico interactivo de los dos primeros componentes principales.")
-            fig = px.scatter(
+            fig, resumen_puntos = dispersion(
                 pca_df, x='PC1', y='PC2', color='Categoría',
-                title="Gráfico de los dos primeros Componentes Principales",
+                titulo="Gráfico de los dos primeros Componentes Principales",
                 color_discrete_sequence=px.colors.qualitative.Bold,
-                labels={
+                etiquetas={
                     'PC1': f'PC1 ({explained_variance[0]:.2%} varianza explicada)',
                     'PC2': f'PC2 ({explained_variance[1]:.2%} varianza explicada)'
                 }
             )
             st.plotly_chart(fig)
+            st.caption(resumen_puntos)
         elif n_components >= 3:
             st.write("Gráfico interactivo 3D de los tres primeros componentes principales.")
-            fig_3d = px.scatter_3d(
+            fig_3d, resumen_puntos = dispersion_3d(
                 pca_df, x='PC1', y='PC2', z='PC3', color='Categoría',
-                title="Gráfico 3D de los tres primeros Componentes Principales",
+                titulo="Gráfico 3D de los tres primeros Componentes Principales",
                 color_discrete_sequence=px.colors.qualitative.Vivid,
-                labels={
+                etiquetas={
                     'PC1': f'PC1 ({explained_variance[0]:.2%} varianza explicada)',
                     'PC2': f'PC2 ({explained_variance[1]:.2%} varianza explicada)',
                     'PC3': f'PC3 ({explained_variance[2]:.2%} varianza explicada)'
                 }
             )
             st.plotly_chart(fig_3d)
+            st.caption(resumen_puntos)
 else:
-    st.write("Por favor, sube un archivo para continuar.")
\ No newline at end of file
+    st.write("Por favor, sube un archivo para continuar.")
+
+# Panel de perfilado (opcional) con los tiempos de esta ejecución
+finalizar_ejecucion()
@@ -1,50 +1,48 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-import xgboost as xgb
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import plotly.express as px
 import random
 
-# Conexión a PostgreSQL sin usar caché
-def conectar_base_datos():
-    try:
-        conn = psycopg2.connect(
-            dbname="dpanchita2",
-            user="postgres",
-            password="123456",
-            host="localhost",
-            port="5432"
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Error al conectar a la base de datos: {e}")
-        return None
-
-# Cargar datos de PostgreSQL
-def cargar_datos():
-    conn = conectar_base_datos()
-    if conn is None:
-        return pd.DataFrame()  # Si la conexión falla, devolver un DataFrame vacío
+from carga_masiva import cargar_hechos, rango_fechas_hechos
+from compactacion import compactar, resumen_memoria
+from busqueda_hiperparametros import buscar_hiperparametros
+from entrenamiento import entrenar_modelos
+from pronostico_lote import generar_rejilla, pronosticar_lote
+from graficos import series
+from instrumentacion import finalizar_ejecucion, iniciar_ejecucion, marcar, tramo
+
+# Tramos de tiempo de esta ejecución (panel de perfilado en la barra lateral)
+iniciar_ejecucion("Cantidad_predicha")
+
+# Cargar datos de PostgreSQL con COPY: la fecha llega ya como datetime64 y los ids como int32.
+# La consulta va acotada por id_fecha para que PostgreSQL lea solo las particiones del periodo.
+def cargar_datos(desde, hasta):
     try:
         query = """
-        SELECT id_sucursal, id_producto, id_fecha, cantidad, id_fecha::date as fecha 
-        FROM Hechos_Ventas;
+        SELECT id_sucursal, id_producto, cantidad, id_fecha AS fecha
+        FROM Hechos_Ventas
+        WHERE id_fecha BETWEEN %(desde)s AND %(hasta)s;
         """
-        datos = pd.read_sql(query, conn)
-        return datos
+        return cargar_hechos(query, params={"desde": desde, "hasta": hasta})
     except Exception as e:
-        st.error(f"Error al ejecutar la consulta: {e}")
-        return pd.DataFrame()  # En caso de error en la consulta, devolver un DataFrame vacío
-    finally:
-        conn.close()  # Asegurarse de cerrar la conexión después de la consulta
+        st.error(f"Error al consultar la base de datos: {e}")
+        return pd.DataFrame()  # Si la conexión o la consulta fallan, devolver un DataFrame vacío
+
+# Periodo de ventas con el que se entrena (por defecto todo el histórico)
+def elegir_periodo():
+    try:
+        desde, hasta = rango_fechas_hechos()
+    except Exception as e:
+        st.error(f"Error al consultar la base de datos: {e}")
+        return None, None
+    if desde is None:
+        return None, None
+    periodo = st.sidebar.date_input("Periodo de las ventas", value=(desde, hasta), min_value=desde, max_value=hasta)
+    return (periodo[0], periodo[-1]) if len(periodo) == 2 else (periodo[0], hasta)
 
 # Mostrar los datos
 st.title("Predicción de Cantidad de Productos Vendidos")
-datos = cargar_datos()
+marcar("primer_pintado")
+datos = cargar_datos(*elegir_periodo())
 if datos.empty:
     st.warning("No se pudieron cargar los datos.")
 else:
@@ -52,18 +50,27 @@ else:
 
 # Preprocesamiento de los datos
 st.subheader("Preparación de los Datos")
-# Convertir la fecha a formato datetime
-datos['fecha'] = pd.to_datetime(datos['fecha'])
 # Extraer características útiles de la fecha
 datos['año'] = datos['fecha'].dt.year
 datos['mes'] = datos['fecha'].dt.month
 datos['día'] = datos['fecha'].dt.day
 datos['día_semana'] = datos['fecha'].dt.weekday  # Lunes=0, Domingo=6
 
+# Compactar tipos según el esquema (enteros mínimos, DECIMAL a float32)
+datos, informe_memoria = compactar(datos)
+st.caption(resumen_memoria("Memoria de los datos", informe_memoria))
+
 # Selección de características (X) y variable objetivo (y)
 X = datos[['id_sucursal', 'id_producto', 'año', 'mes', 'día', 'día_semana']]
 y = datos['cantidad']
 
+# scikit-learn y XGBoost se cargan aquí, con el título y la vista previa ya en pantalla
+with tramo("importar:modelos", "arranque"):
+    from sklearn.model_selection import train_test_split
+    from sklearn.linear_model import LinearRegression
+    from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+    import xgboost as xgb
+
 # Dividir los datos en conjunto de entrenamiento y prueba (80%-20%)
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
@@ -78,21 +85,18 @@ modelos = {
     "XGBoost": xgb.XGBRegressor(random_state=42)
 }
 
-# Entrenar todos los modelos
-resultados_modelos = {}
-for nombre, modelo in modelos.items():
-    modelo.fit(X_train, y_train)
-    predicciones = modelo.predict(X_test)
-    mae = mean_absolute_error(y_test, predicciones)
-    mse = mean_squared_error(y_test, predicciones)
-    r2 = r2_score(y_test, predicciones)
-    resultados_modelos[nombre] = {
-        "modelo": modelo,
-        "predicciones": predicciones,
-        "mae": mae,
-        "mse": mse,
-        "r2": r2
-    }
+# Modo de ajuste: successive halving sobre los cuatro modelos (XGBoost con parada temprana).
+# La búsqueda solo usa el conjunto de entrenamiento; el de prueba queda para la comparación final.
+if st.sidebar.checkbox("Ajustar hiperparámetros (successive halving)"):
+    with st.spinner("Buscando hiperparámetros..."):
+        busqueda = buscar_hiperparametros(X_train, y_train, nombres=list(modelos))
+    modelos = busqueda.mejores
+    st.write(f"Búsqueda de hiperparámetros: {len(busqueda.ensayos)} ensayos en {busqueda.segundos:.2f} s "
+             f"(tabla guardada en {busqueda.archivo})")
+    st.dataframe(busqueda.ensayos, hide_index=True)
+
+# Entrenar todos los modelos en paralelo (o cargarlos del registro si los datos y la configuración no cambiaron)
+resultados_modelos = entrenar_modelos(modelos, X_train, X_test, y_train, y_test)
 
 # Mostrar resultados de todos los modelos
 st.subheader("Resultados de los Modelos")
@@ -101,6 +105,10 @@ for nombre, resultado in resultados_modelos.items():
     st.write(f"MAE: {resultado['mae']:.2f}")
     st.write(f"MSE: {resultado['mse']:.2f}")
     st.write(f"R²: {resultado['r2']:.2f}")
+    st.write(f"Origen: {resultado['origen']}")
+    if "segundos_pared" in resultado:
+        st.write(f"Tiempo de entrenamiento: {resultado['segundos_pared']:.2f} s "
+                 f"({resultado['hilos']} hilos, memoria pico {resultado['memoria_pico_mb']:.0f} MB)")
     st.write("---")
 
 # Selección de modelos a comparar
@@ -124,24 +132,18 @@ for modelo_seleccionado in modelos_seleccionados:
 colores = ["blue", "red", "green", "purple", "orange", "brown", "pink", "cyan"]
 colores_modelos = {modelo: random.choice(colores) for modelo in modelos_seleccionados}
 
-# Gráfico interactivo de puntos (scatter plot)
-fig = px.scatter(comparacion, 
-                 x=comparacion.index, 
-                 y="Valores Reales", 
-                 labels={"index": "Índice", "Valores Reales": "Cantidad"},
-                 title="Comparación de Cantidades Reales vs Predicciones", 
-                 template="plotly_dark")
-
-# Agregar las predicciones al gráfico con colores únicos
-for modelo_seleccionado in modelos_seleccionados:
-    fig.add_scatter(x=comparacion.index, 
-                    y=comparacion[modelo_seleccionado], 
-                    mode="markers", 
-                    name=f"Predicciones {modelo_seleccionado}", 
-                    marker=dict(color=colores_modelos[modelo_seleccionado]))
+# Gráfico interactivo de puntos (Scattergl; con muchas filas cada serie se reduce con LTTB)
+comparacion = comparacion.rename(columns={m: f"Predicciones {m}" for m in modelos_seleccionados})
+fig, resumen_puntos = series(comparacion,
+                             columnas=list(comparacion.columns),
+                             titulo="Comparación de Cantidades Reales vs Predicciones",
+                             etiqueta_y="Cantidad",
+                             colores={f"Predicciones {m}": c for m, c in colores_modelos.items()},
+                             template="plotly_dark")
 
 # Mostrar gráfico
 st.plotly_chart(fig)
+st.caption(resumen_puntos)
 
 # Predicción interactiva
 st.subheader("Predicción Interactiva")
@@ -171,5 +173,58 @@ for nombre, resultado in resultados_modelos.items():
     prediccion_cantidad = resultado["modelo"].predict(entrada)
     st.write(f"Predicción con {nombre}: {prediccion_cantidad[0]:.2f}")
 
+# Actualización incremental: solo se leen las ventas posteriores a la última marca de agua
+st.subheader("Actualización Incremental de Modelos")
+from entrenamiento_incremental import actualizar_modelos, cargar_estado
+_, estado_incremental = cargar_estado("cantidad")
+if estado_incremental:
+    st.write(f"Última venta incorporada: id_venta {estado_incremental['ultimo_id_venta']} "
+             f"(fecha {estado_incremental['ultimo_id_fecha']}), "
+             f"último reentrenamiento completo: {estado_incremental['ultimo_reentrenamiento']}")
+col_incremental, col_completo = st.columns(2)
+actualizar = col_incremental.button("Incorporar ventas nuevas")
+reentrenar = col_completo.button("Reentrenar todo el histórico")
+if actualizar or reentrenar:
+    try:
+        modelos_incrementales, estado_incremental, informe_incremental = actualizar_modelos(forzar_completo=reentrenar)
+    except ValueError as e:
+        # Entrenamiento completo sin ventas en Hechos_Ventas
+        st.warning(str(e))
+    else:
+        st.write("Resultado de la actualización:", pd.DataFrame(informe_incremental).T)
+        for nombre, modelo in modelos_incrementales.items():
+            st.write(f"Predicción actualizada con {nombre}: {modelo.predict(entrada)[0]:.2f}")
+
+# Pronóstico por lote: todas las sucursales y productos para los próximos días
+st.subheader("Pronóstico por Lote (todas las sucursales y productos)")
+fecha_inicio_lote = st.date_input("Fecha inicial del pronóstico", value=pd.to_datetime("2024-12-01"), key="fecha_inicio_lote")
+dias_lote = st.number_input("Número de días a pronosticar", min_value=1, max_value=366, value=28)
+modelos_lote = st.multiselect(
+    "Modelos para el pronóstico por lote",
+    options=list(resultados_modelos.keys()),
+    default=list(resultados_modelos.keys())
+)
 
-
+if st.button("Generar pronóstico por lote") and modelos_lote:
+    rejilla = generar_rejilla(
+        sorted(datos['id_sucursal'].unique()),
+        sorted(datos['id_producto'].unique()),
+        fecha_inicio_lote,
+        int(dias_lote)
+    )
+    pronosticos, tiempos_lote = pronosticar_lote(
+        {nombre: resultados_modelos[nombre]["modelo"] for nombre in modelos_lote}, rejilla
+    )
+    st.write(f"Filas pronosticadas: {len(pronosticos)} "
+             f"({len(rejilla['fecha'])} combinaciones x {len(modelos_lote)} modelos)")
+    st.write("Tiempo de puntuación por modelo (s):", pd.Series(tiempos_lote))
+    st.dataframe(pronosticos.head(1000))
+    st.download_button(
+        "Descargar pronóstico (CSV)",
+        data=pronosticos.to_csv(index=False).encode("utf-8"),
+        file_name="pronostico_lote.csv",
+        mime="text/csv"
+    )
+
+# Panel de perfilado (opcional) con los tiempos de esta ejecución
+finalizar_ejecucion()
@@ -1,51 +1,74 @@
+import os
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
-# Cargar los datos
-@st.cache
-def load_data(file_path):
-    return pd.read_excel(file_path)
+from graficos import dispersion_matplotlib
+from instrumentacion import finalizar_ejecucion, iniciar_ejecucion, marcar, tramo
+from perfil_eda import obtener_perfil
+
+# Tramos de tiempo de esta ejecución (panel de perfilado en la barra lateral)
+iniciar_ejecucion("EDA")
 
 # Título de la aplicación
 st.title("EDA para Doña Panchita")
+marcar("primer_pintado")
+
+# Cargar el archivo de Excel (ruta configurable con PANCHITA_ARCHIVO_EDA)
+file_path = os.environ.get(
+    "PANCHITA_ARCHIVO_EDA",
+    str(Path(__file__).resolve().parent.parent / "data_tabla_hechos.xls")
+)
 
-# Cargar el archivo de Excel
-file_path = "C:/Users/Marco/Documents/UNIVERSIDAD/4 SEMESTRE/PROYECTO INTEGRADOR/VISUALIADOR_PROYECTO/data_tabla_hechos.xls"
-df = load_data(file_path)
+# Perfil del dataset (resumen, histogramas, KDE y correlaciones) calculado una sola vez por contenido
+# del archivo: los widgets solo leen del perfil y no vuelven a recorrer las filas
+perfil = obtener_perfil(file_path)
 
 # Mostrar los primeros registros
 st.subheader("Primeros registros del dataset")
-st.write(df.head())
+st.write(perfil.primeras_filas)
 
 # Mostrar información básica
 st.subheader("Información del dataset")
-st.write(df.info())
+st.write(f"{perfil.filas:,} filas y {len(perfil.columnas)} columnas")
+st.dataframe(perfil.informacion, hide_index=True)
 
 # Mostrar estadísticas descriptivas
 st.subheader("Estadísticas descriptivas")
-st.write(df.describe())
+st.write(perfil.descripcion)
 
 # Visualización de gráficos
 st.subheader("Visualizaciones")
 
-# Histograma
+# Histograma (matplotlib se carga aquí, con las tablas ya en pantalla)
+with tramo("importar:matplotlib", "arranque"):
+    import matplotlib.pyplot as plt
 st.write("Histograma de una columna seleccionada")
-column = st.selectbox("Selecciona una columna para el histograma", df.select_dtypes(include=['float64', 'int64']).columns)
+column = st.selectbox("Selecciona una columna para el histograma", perfil.numericas)
 fig, ax = plt.subplots()
-sns.histplot(df[column], kde=True, ax=ax)
+conteos, bordes = perfil.histogramas[column]
+ax.stairs(conteos, bordes, fill=True, alpha=0.5)
+if perfil.kde[column] is not None:
+    # La densidad se escala a conteos por intervalo, como histplot(kde=True)
+    x_kde, densidad = perfil.kde[column]
+    ax.plot(x_kde, densidad * conteos.sum() * (bordes[1] - bordes[0]))
+ax.set_xlabel(column)
+ax.set_ylabel("Count")
 st.pyplot(fig)
 
 # Mapa de calor de correlación
 st.subheader("Mapa de calor de correlación (Selecciona columnas)")
 selected_columns = st.multiselect(
     "Selecciona las columnas para el mapa de calor",
-    df.select_dtypes(include=['float64', 'int64']).columns
+    perfil.numericas
 )
 
 if selected_columns:
-    corr = df[selected_columns].corr()
+    # seaborn solo se importa si se pide el mapa de calor
+    with tramo("importar:seaborn", "arranque"):
+        import seaborn as sns
+    corr = perfil.correlacion_de(selected_columns)
     fig, ax = plt.subplots()
     sns.heatmap(corr, annot=True, cmap="coolwarm", ax=ax)
     st.pyplot(fig)
@@ -55,9 +78,16 @@ else:
 # Gráfico de dispersión
 st.subheader("Gráfico de dispersión")
 col1, col2 = st.columns(2)
-x_axis = col1.selectbox("Selecciona el eje X", df.columns)
-y_axis = col2.selectbox("Selecciona el eje Y", df.columns)
+x_axis = col1.selectbox("Selecciona el eje X", perfil.columnas)
+y_axis = col2.selectbox("Selecciona el eje Y", perfil.columnas)
 
+# Con muchas filas se dibuja un hexbin (conteo por celda) en lugar de cada punto
 fig, ax = plt.subplots()
-sns.scatterplot(data=df, x=x_axis, y=y_axis, ax=ax)
-st.pyplot(fig)
\ No newline at end of file
+resumen_puntos = dispersion_matplotlib(ax, perfil.muestra, x_axis, y_axis)
+st.pyplot(fig)
+if len(perfil.muestra) < perfil.filas:
+    resumen_puntos += f" Muestra aleatoria de {len(perfil.muestra):,} de {perfil.filas:,} filas."
+st.caption(resumen_puntos)
+
+# Panel de perfilado (opcional) con los tiempos de esta ejecución
+finalizar_ejecucion()
@@ -1,85 +1,99 @@
+import time
+
 import streamlit as st
 import pandas as pd
-import psycopg2
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from xgboost import XGBRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-
-# Conexión a PostgreSQL
-@st.cache_resource
-def conectar_base_datos():
-    return psycopg2.connect(
-        dbname="dpanchita2",
-        user="postgres",
-        password="123456",
-        host="localhost",
-        port="5432"
-    )
-
-# Cargar datos de PostgreSQL
-@st.cache_data
-def cargar_datos():
-    conn = conectar_base_datos()
-    query = "SELECT id_sucursal, id_producto, id_cliente, cantidad, total FROM Hechos_Ventas;"
-    datos = pd.read_sql(query, conn)
-    conn.close()
-    return datos
+
+from carga_masiva import cargar_hechos, rango_fechas_hechos
+from compactacion import compactar, resumen_memoria
+from busqueda_hiperparametros import buscar_hiperparametros
+from entrenamiento import entrenar_modelos
+from graficos import series
+from instrumentacion import finalizar_ejecucion, iniciar_ejecucion, marcar, tramo
+
+# Tramos de tiempo de esta ejecución (panel de perfilado en la barra lateral)
+iniciar_ejecucion("Predicciones")
+
+# Cargar datos de PostgreSQL con COPY (columnas int32/float32, caché compartida que se invalida al cambiar Hechos_Ventas).
+# La consulta va acotada por id_fecha para que PostgreSQL lea solo las particiones del periodo.
+def cargar_datos(desde, hasta):
+    query = ("SELECT id_sucursal, id_producto, id_cliente, cantidad, total FROM Hechos_Ventas "
+             "WHERE id_fecha BETWEEN %(desde)s AND %(hasta)s;")
+    return cargar_hechos(query, params={"desde": desde, "hasta": hasta})
+
+# Periodo de ventas con el que se entrena (por defecto todo el histórico)
+def elegir_periodo():
+    desde, hasta = rango_fechas_hechos()
+    if desde is None:
+        return None, None
+    periodo = st.sidebar.date_input("Periodo de las ventas", value=(desde, hasta), min_value=desde, max_value=hasta)
+    return (periodo[0], periodo[-1]) if len(periodo) == 2 else (periodo[0], hasta)
 
 # Mostrar los datos
 st.title("Comparación de Modelos Predictivos")
-datos = cargar_datos()
+marcar("primer_pintado")
+datos, informe_memoria = compactar(cargar_datos(*elegir_periodo()))
 st.write("Vista previa de los datos:", datos.head())
+st.caption(resumen_memoria("Memoria de los datos", informe_memoria))
 
 # Preparación de datos
 st.subheader("Preparación de Datos")
 X = datos[['id_sucursal', 'id_producto', 'id_cliente', 'cantidad']]
 y = datos['total']
 
+# scikit-learn y XGBoost se cargan aquí, con el título y la vista previa ya en pantalla
+with tramo("importar:modelos", "arranque"):
+    from sklearn.model_selection import train_test_split
+    from sklearn.linear_model import LinearRegression
+    from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+    from xgboost import XGBRegressor
+
 # Dividir datos en entrenamiento y prueba (80%-20%)
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
 st.write(f"Datos de entrenamiento: {X_train.shape[0]} filas")
 st.write(f"Datos de prueba: {X_test.shape[0]} filas")
 
-# Función para evaluar modelos
-def evaluar_modelo(nombre, modelo, X_train, X_test, y_train, y_test):
-    modelo.fit(X_train, y_train)
-    predicciones = modelo.predict(X_test)
-    mae = mean_absolute_error(y_test, predicciones)
-    mse = mean_squared_error(y_test, predicciones)
-    r2 = r2_score(y_test, predicciones)
+# Función para resumir el resultado de un modelo en una fila de la tabla comparativa
+def resumir_resultado(nombre, resultado):
     return {
         "Modelo": nombre,
-        "MAE": mae,
-        "MSE": mse,
-        "R²": r2
-    }, predicciones
+        "MAE": resultado["mae"],
+        "MSE": resultado["mse"],
+        "R²": resultado["r2"],
+        "Origen": resultado["origen"],
+        "Tiempo (s)": resultado.get("segundos_pared", resultado.get("segundos_entrenamiento")),
+        "Memoria pico (MB)": resultado.get("memoria_pico_mb")
+    }
 
 # Entrenar y evaluar modelos
 st.subheader("Resultados de los Modelos")
-resultados = []
-
-# Modelo 1: Regresión Lineal
-modelo_lr = LinearRegression()
-resultado_lr, predicciones_lr = evaluar_modelo("Regresión Lineal", modelo_lr, X_train, X_test, y_train, y_test)
-resultados.append(resultado_lr)
 
-# Modelo 2: Random Forest
-modelo_rf = RandomForestRegressor(n_estimators=100, random_state=42)
-resultado_rf, predicciones_rf = evaluar_modelo("Random Forest", modelo_rf, X_train, X_test, y_train, y_test)
-resultados.append(resultado_rf)
-
-# Modelo 3: Gradient Boosting
-modelo_gb = GradientBoostingRegressor(n_estimators=100, random_state=42)
-resultado_gb, predicciones_gb = evaluar_modelo("Gradient Boosting", modelo_gb, X_train, X_test, y_train, y_test)
-resultados.append(resultado_gb)
-
-# Modelo 4: XGBoost
-modelo_xgb = XGBRegressor(n_estimators=100, random_state=42)
-resultado_xgb, predicciones_xgb = evaluar_modelo("XGBoost", modelo_xgb, X_train, X_test, y_train, y_test)
-resultados.append(resultado_xgb)
+# Los modelos que no están en el registro se entrenan en paralelo, uno por proceso
+modelos = {
+    "Regresión Lineal": LinearRegression(),
+    "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
+    "Gradient Boosting": GradientBoostingRegressor(n_estimators=100, random_state=42),
+    "XGBoost": XGBRegressor(n_estimators=100, random_state=42)
+}
+
+# Modo de ajuste: successive halving sobre los cuatro modelos (XGBoost con parada temprana).
+# La búsqueda solo usa el conjunto de entrenamiento; el de prueba queda para la comparación final.
+if st.sidebar.checkbox("Ajustar hiperparámetros (successive halving)"):
+    with st.spinner("Buscando hiperparámetros..."):
+        busqueda = buscar_hiperparametros(X_train, y_train, nombres=list(modelos))
+    modelos = busqueda.mejores
+    st.write(f"Búsqueda de hiperparámetros: {len(busqueda.ensayos)} ensayos en {busqueda.segundos:.2f} s "
+             f"(tabla guardada en {busqueda.archivo})")
+    st.dataframe(busqueda.ensayos, hide_index=True)
+inicio_entrenamiento = time.perf_counter()
+resultados_modelos = entrenar_modelos(modelos, X_train, X_test, y_train, y_test)
+st.write(f"Tiempo total de entrenamiento y evaluación: {time.perf_counter() - inicio_entrenamiento:.2f} s")
+
+resultados = [resumir_resultado(nombre, resultado) for nombre, resultado in resultados_modelos.items()]
+predicciones_lr = resultados_modelos["Regresión Lineal"]["predicciones"]
+predicciones_rf = resultados_modelos["Random Forest"]["predicciones"]
+predicciones_gb = resultados_modelos["Gradient Boosting"]["predicciones"]
+predicciones_xgb = resultados_modelos["XGBoost"]["predicciones"]
 
 # Mostrar resultados en tabla
 df_resultados = pd.DataFrame(resultados)
@@ -118,5 +132,11 @@ if "XGBoost" in modelos_seleccionados:
 # Mostrar la comparación en tabla
 st.write(grafico_comparativo)
 
-# Gráfico comparativo
-st.line_chart(grafico_comparativo)
+# Gráfico comparativo (Scattergl; con muchas filas cada serie se reduce con LTTB)
+fig, resumen_puntos = series(grafico_comparativo.reset_index(drop=True), list(grafico_comparativo.columns),
+                             modo='lines', etiqueta_y='Total')
+st.plotly_chart(fig)
+st.caption(resumen_puntos)
+
+# Panel de perfilado (opcional) con los tiempos de esta ejecución
+finalizar_ejecucion()
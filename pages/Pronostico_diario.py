@@ -0,0 +1,88 @@
+import time
+
+import streamlit as st
+import pandas as pd
+
+from compactacion import compactar, resumen_memoria
+from instrumentacion import finalizar_ejecucion, iniciar_ejecucion, marcar, tramo
+from pronostico_series import (HORIZONTE, PARTICIONES, agregar_caracteristicas, cargar_diaria, completar_dias,
+                               entrenar_final, pronosticar, validar)
+
+# Tramos de tiempo de esta ejecución (panel de perfilado en la barra lateral)
+iniciar_ejecucion("Pronostico_diario")
+
+st.title("Pronóstico Diario de Cantidad por Sucursal y Producto")
+marcar("primer_pintado")
+
+# Cargar las ventas ya agregadas por día, sucursal y producto
+try:
+    diaria = cargar_diaria()
+except Exception as e:
+    st.error(f"Error al consultar la base de datos: {e}")
+    diaria = pd.DataFrame()
+
+if diaria.empty:
+    st.warning("No se pudieron cargar los datos.")
+    st.stop()
+
+# Preparación: días sin ventas en 0, rezagos y medias móviles por serie
+st.subheader("Preparación de los Datos")
+inicio = time.perf_counter()
+completa = completar_dias(diaria)
+datos, informe_memoria = compactar(agregar_caracteristicas(completa))
+num_series = completa[['id_sucursal', 'id_producto']].drop_duplicates().shape[0]
+st.write(f"{num_series} series (sucursal × producto), {len(datos):,} días-serie con características "
+         f"({time.perf_counter() - inicio:.2f} s)")
+st.caption(resumen_memoria("Memoria de las características", informe_memoria))
+st.write("Vista previa de las características:", datos.head())
+
+# Modelos disponibles (scikit-learn y XGBoost se cargan aquí, con las características ya en pantalla)
+with tramo("importar:modelos", "arranque"):
+    from sklearn.linear_model import LinearRegression
+    from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+    from xgboost import XGBRegressor
+
+modelos = {
+    "Regresión Lineal": LinearRegression(),
+    "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
+    "Gradient Boosting": GradientBoostingRegressor(random_state=42),
+    "XGBoost": XGBRegressor(random_state=42),
+}
+seleccion = st.multiselect("Modelos a evaluar", options=list(modelos), default=["Regresión Lineal", "XGBoost"])
+modelos = {nombre: modelos[nombre] for nombre in seleccion}
+if not modelos:
+    st.write("Selecciona al menos un modelo.")
+    st.stop()
+
+# Validación con origen móvil: nunca se entrena con días posteriores a los de prueba
+st.subheader("Validación Temporal (origen móvil)")
+col1, col2 = st.columns(2)
+particiones = col1.number_input("Número de cortes", min_value=1, max_value=12, value=PARTICIONES)
+horizonte = col2.number_input("Días de prueba por corte", min_value=1, max_value=60, value=HORIZONTE)
+inicio = time.perf_counter()
+validacion = validar(modelos, datos, particiones=int(particiones), horizonte=int(horizonte))
+st.write(f"Validación completada en {time.perf_counter() - inicio:.2f} s")
+st.dataframe(validacion, hide_index=True)
+st.write("Promedio por modelo:")
+st.write(validacion.groupby('modelo')[['mae', 'mse', 'r2']].mean())
+
+# Pronóstico de todas las series con el modelo elegido
+st.subheader("Pronóstico")
+modelo_elegido = st.selectbox("Modelo para pronosticar", options=list(modelos))
+dias = st.number_input("Días a pronosticar", min_value=1, max_value=90, value=14)
+if st.button("Generar pronóstico"):
+    modelo = entrenar_final(modelos[modelo_elegido], datos)
+    pronostico, segundos = pronosticar(modelo, completa, int(dias))
+    st.write(f"{len(pronostico):,} pronósticos para {num_series} series en {segundos:.2f} s "
+             f"(una llamada a predict por día para todas las series)")
+    st.write(pronostico.head(100))
+    st.line_chart(pronostico.groupby('fecha')['cantidad_predicha'].sum())
+    st.download_button(
+        label="Descargar pronóstico (CSV)",
+        data=pronostico.to_csv(index=False).encode('utf-8'),
+        file_name=f"pronostico_diario_{modelo_elegido.replace(' ', '_').lower()}.csv",
+        mime="text/csv",
+    )
+
+# Panel de perfilado (opcional) con los tiempos de esta ejecución
+finalizar_ejecucion()
@@ -0,0 +1,304 @@
+import argparse
+import gzip
+import re
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from acceso_datos import conexion
+
+RAIZ = Path(__file__).resolve().parent
+
+# Particiones mensuales que se crean por adelantado después del último mes con ventas
+MESES_ADELANTADOS = 3
+
+# Las particiones rotadas se mueven a este esquema (siguen consultables fuera de la tabla activa)
+# o se exportan a CSV comprimido en DIRECTORIO_ARCHIVO y se borran
+ESQUEMA_ARCHIVO = 'archivo'
+DIRECTORIO_ARCHIVO = RAIZ / 'archivo'
+
+PARTICION_DEFAULT = 'hechos_ventas_p_default'
+
+# Tabla de hechos particionada por rango mensual de id_fecha. La clave primaria debe incluir la
+# columna de partición; id_venta sigue saliendo de la secuencia de la tabla original.
+DDL_HECHOS_PARTICIONADA = '''
+    CREATE TABLE Hechos_Ventas (
+        id_venta INT NOT NULL DEFAULT nextval('hechos_ventas_id_venta_seq'),
+        id_sucursal INT NOT NULL,
+        id_producto INT NOT NULL,
+        id_cliente INT NOT NULL,
+        id_fecha DATE NOT NULL,
+        id_metodo_pago INT NOT NULL,
+        cantidad INT NOT NULL,
+        total DECIMAL(10, 2) NOT NULL,
+        PRIMARY KEY (id_venta, id_fecha),
+        FOREIGN KEY (id_sucursal) REFERENCES Dim_Sucursales(id_sucursal),
+        FOREIGN KEY (id_producto) REFERENCES Dim_Productos(id_producto),
+        FOREIGN KEY (id_cliente) REFERENCES Dim_Clientes(id_cliente),
+        FOREIGN KEY (id_fecha) REFERENCES Dim_Fecha(id_fecha),
+        FOREIGN KEY (id_metodo_pago) REFERENCES Dim_Metodos_Pago(id_metodo_pago)
+    ) PARTITION BY RANGE (id_fecha);
+    CREATE TABLE hechos_ventas_p_default PARTITION OF Hechos_Ventas DEFAULT;
+    ALTER SEQUENCE hechos_ventas_id_venta_seq OWNED BY Hechos_Ventas.id_venta;
+'''
+
+# Índices definidos en la tabla particionada: PostgreSQL crea uno igual en cada partición
+# (también en las que se creen después). Las ventas llegan casi en orden de fecha, así que un
+# BRIN sobre id_fecha resume cada partición con muy pocas páginas.
+DDL_INDICES_PARTICIONES = '''
+    CREATE INDEX IF NOT EXISTS idx_hechos_ventas_fecha_brin ON Hechos_Ventas USING brin (id_fecha);
+'''
+
+QUERY_ES_PARTICIONADA = "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('hechos_ventas')"
+
+# Particiones de la tabla de hechos con su límite ("FOR VALUES FROM ('2024-01-01') TO ('2024-02-01')" o DEFAULT)
+QUERY_PARTICIONES = '''
+    SELECT c.relname AS nombre, pg_get_expr(c.relpartbound, c.oid) AS limite,
+           GREATEST(c.reltuples, 0)::bigint AS filas_estimadas,
+           pg_total_relation_size(c.oid) AS bytes
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'hechos_ventas'::regclass
+    ORDER BY c.relname
+'''
+
+# Índices de Hechos_Ventas que no cubren todas sus particiones: inválidos (creados con ON ONLY)
+# o con menos índices hijos que particiones hoja
+QUERY_INDICES_INCOMPLETOS = '''
+    SELECT i.indexrelid::regclass::text AS indice
+    FROM pg_index i
+    WHERE i.indrelid = 'hechos_ventas'::regclass
+      AND (NOT i.indisvalid
+           OR (SELECT count(*) FROM pg_partition_tree(i.indexrelid) WHERE isleaf)
+              < (SELECT count(*) FROM pg_partition_tree('hechos_ventas') WHERE isleaf))
+    ORDER BY 1
+'''
+
+_PATRON_LIMITE = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def inicio_mes(fecha):
+    fecha = pd.Timestamp(fecha)
+    return date(fecha.year, fecha.month, 1)
+
+
+# Primer día del mes desplazado `meses` meses (negativo hacia atrás)
+def sumar_meses(mes, meses):
+    indice = mes.year * 12 + mes.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+# Primeros días de cada mes entre dos fechas (ambos meses incluidos)
+def meses_entre(desde, hasta):
+    mes, ultimo = inicio_mes(desde), inicio_mes(hasta)
+    meses = []
+    while mes <= ultimo:
+        meses.append(mes)
+        mes = sumar_meses(mes, 1)
+    return meses
+
+
+def nombre_particion(mes):
+    return f'hechos_ventas_p{mes:%Y_%m}'
+
+
+def es_particionada(cur):
+    cur.execute(QUERY_ES_PARTICIONADA)
+    fila = cur.fetchone()
+    return bool(fila and fila[0])
+
+
+def indices_incompletos(cur):
+    cur.execute(QUERY_INDICES_INCOMPLETOS)
+    return [fila[0] for fila in cur.fetchall()]
+
+
+# Particiones actuales con su rango [desde, hasta); la partición por defecto tiene desde = None
+def listar_particiones(cur):
+    cur.execute(QUERY_PARTICIONES)
+    particiones = pd.DataFrame(cur.fetchall(), columns=['nombre', 'limite', 'filas_estimadas', 'bytes'])
+    rangos = particiones['limite'].str.extract(_PATRON_LIMITE)
+    particiones['desde'] = pd.to_datetime(rangos[0]).dt.date
+    particiones['hasta'] = pd.to_datetime(rangos[1]).dt.date
+    return particiones.drop(columns='limite').sort_values('desde', na_position='last', ignore_index=True)
+
+
+# Crea la partición de un mes. Si la partición por defecto ya tiene ventas de ese mes, se
+# separa, se mueven sus filas a la partición nueva y se vuelve a adjuntar (todo en la transacción).
+def crear_particion(cur, mes):
+    nombre, desde, hasta = nombre_particion(mes), mes, sumar_meses(mes, 1)
+    rango = {'desde': desde, 'hasta': hasta}
+    cur.execute(f'SELECT EXISTS (SELECT 1 FROM {PARTICION_DEFAULT} WHERE id_fecha >= %(desde)s '
+                f'AND id_fecha < %(hasta)s)', rango)
+    if not cur.fetchone()[0]:
+        cur.execute(f'CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF Hechos_Ventas '
+                    f'FOR VALUES FROM (%(desde)s) TO (%(hasta)s)', rango)
+        return nombre
+    cur.execute(f'ALTER TABLE Hechos_Ventas DETACH PARTITION {PARTICION_DEFAULT}')
+    cur.execute(f'CREATE TABLE {nombre} PARTITION OF Hechos_Ventas FOR VALUES FROM (%(desde)s) TO (%(hasta)s)', rango)
+    cur.execute(f'''
+        WITH movidas AS (
+            DELETE FROM {PARTICION_DEFAULT} WHERE id_fecha >= %(desde)s AND id_fecha < %(hasta)s RETURNING *
+        )
+        INSERT INTO {nombre} SELECT * FROM movidas
+    ''', rango)
+    cur.execute(f'ALTER TABLE Hechos_Ventas ATTACH PARTITION {PARTICION_DEFAULT} DEFAULT')
+    return nombre
+
+
+# Asegura una partición por cada mes de `fechas` (ingesta) y devuelve las creadas
+def asegurar_particiones(cur, fechas):
+    if len(fechas) == 0:
+        return []
+    existentes = set(listar_particiones(cur)['desde'].dropna())
+    meses = [inicio_mes(mes) for mes in np.unique(np.asarray(fechas, dtype='datetime64[M]'))]
+    return [crear_particion(cur, mes) for mes in meses if mes not in existentes]
+
+
+# Crea por adelantado las particiones hasta `meses` meses después del último mes con ventas (o de hoy)
+def crear_particiones_futuras(meses=MESES_ADELANTADOS):
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT MAX(id_fecha) FROM Hechos_Ventas')
+            ultimo = inicio_mes(cur.fetchone()[0] or date.today())
+            return asegurar_particiones(cur, meses_entre(ultimo, sumar_meses(ultimo, meses)))
+
+
+# Migración de la tabla de hechos normal a la particionada, en una sola transacción: la tabla
+# original se renombra, se crean las particiones de todos los meses con ventas (más las de
+# los meses siguientes), se copian las filas y luego se construyen los índices
+def migrar(conservar_anterior=False, meses_adelantados=MESES_ADELANTADOS):
+    from refresco_tablero import DDL_AVISO
+    from rollups import DDL_AJUSTES_RESUMEN, DDL_INDICES_HECHOS
+
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            if es_particionada(cur):
+                return None
+            cur.execute('SELECT MIN(id_fecha), MAX(id_fecha), COUNT(*) FROM Hechos_Ventas')
+            primera, ultima, filas = cur.fetchone()
+            cur.execute('ALTER TABLE Hechos_Ventas RENAME TO Hechos_Ventas_Anterior')
+            cur.execute('ALTER INDEX hechos_ventas_pkey RENAME TO hechos_ventas_anterior_pkey')
+            # Los índices secundarios se quitan de la tabla anterior para liberar sus nombres
+            cur.execute('''
+                SELECT indexname FROM pg_indexes
+                WHERE tablename = 'hechos_ventas_anterior' AND indexname <> 'hechos_ventas_anterior_pkey'
+            ''')
+            for (indice,) in cur.fetchall():
+                cur.execute(f'DROP INDEX {indice}')
+            cur.execute(DDL_HECHOS_PARTICIONADA)
+
+            ultimo_mes = inicio_mes(ultima or date.today())
+            meses = meses_entre(primera or ultimo_mes, sumar_meses(ultimo_mes, meses_adelantados))
+            for mes in meses:
+                crear_particion(cur, mes)
+
+            cur.execute('INSERT INTO Hechos_Ventas SELECT * FROM Hechos_Ventas_Anterior')
+            cur.execute("SET LOCAL maintenance_work_mem = '512MB'")
+            cur.execute(DDL_INDICES_HECHOS)
+            cur.execute(DDL_INDICES_PARTICIONES)
+            # Los disparadores del resumen siguen a la tabla renombrada: se pasan a la nueva
+            cur.execute("SELECT to_regclass('control_rollups') IS NOT NULL")
+            if cur.fetchone()[0]:
+                for sufijo in ('upd', 'del', 'trunc'):
+                    cur.execute(f'DROP TRIGGER IF EXISTS trg_hechos_ventas_resumen_{sufijo} ON Hechos_Ventas_Anterior')
+                cur.execute(DDL_AJUSTES_RESUMEN)
+            # Igual con el aviso de cambios del refresco del tablero: si no, quien escucha el canal
+            # deja de recibir avisos hasta que vuelve a conectarse
+            cur.execute("SELECT to_regprocedure('avisar_cambio_hechos()') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute('DROP TRIGGER IF EXISTS trg_hechos_ventas_aviso ON Hechos_Ventas_Anterior')
+                cur.execute(DDL_AVISO)
+            if not conservar_anterior:
+                cur.execute('DROP TABLE Hechos_Ventas_Anterior')
+            cur.execute('ANALYZE Hechos_Ventas')
+    return {'filas': filas, 'particiones': len(meses), 'desde': meses[0], 'hasta': meses[-1]}
+
+
+# Separa las particiones con ventas anteriores a `retener_meses` meses antes del mes actual.
+# Cada una se exporta a CSV comprimido si se pide y después se borra o se mueve al esquema de
+# archivo. Resumen_Ventas_Diario conserva esos meses; reconstruir_rollups ya no los vería.
+def rotar(retener_meses, exportar=False, borrar=False, hoy=None):
+    corte = sumar_meses(inicio_mes(hoy or date.today()), -retener_meses)
+    rotadas = []
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            particiones = listar_particiones(cur)
+            viejas = particiones[particiones['hasta'].notna()]
+            viejas = viejas[viejas['hasta'] <= corte]
+            if not borrar:
+                cur.execute(f'CREATE SCHEMA IF NOT EXISTS {ESQUEMA_ARCHIVO}')
+            for nombre in viejas['nombre']:
+                cur.execute(f'ALTER TABLE Hechos_Ventas DETACH PARTITION {nombre}')
+                if exportar:
+                    DIRECTORIO_ARCHIVO.mkdir(parents=True, exist_ok=True)
+                    with gzip.open(DIRECTORIO_ARCHIVO / f'{nombre}.csv.gz', 'wb') as archivo:
+                        cur.copy_expert(f'COPY {nombre} TO STDOUT WITH (FORMAT CSV, HEADER)', archivo)
+                if borrar:
+                    cur.execute(f'DROP TABLE {nombre}')
+                else:
+                    cur.execute(f'ALTER TABLE {nombre} SET SCHEMA {ESQUEMA_ARCHIVO}')
+                rotadas.append(nombre)
+    return rotadas
+
+
+# Particiones y los índices que no llegan a todas ellas (None si la tabla no está particionada)
+def estado():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            if not es_particionada(cur):
+                return None
+            return listar_particiones(cur), indices_incompletos(cur)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Particionado mensual de Hechos_Ventas por id_fecha")
+    acciones = parser.add_subparsers(dest="accion", required=True)
+    migracion = acciones.add_parser("migrar", help="Convertir Hechos_Ventas en tabla particionada")
+    migracion.add_argument("--conservar-anterior", action="store_true",
+                           help="Dejar la tabla original como Hechos_Ventas_Anterior")
+    migracion.add_argument("--meses-adelantados", type=int, default=MESES_ADELANTADOS)
+    futuras = acciones.add_parser("crear", help="Crear las particiones de los próximos meses")
+    futuras.add_argument("--meses-adelantados", type=int, default=MESES_ADELANTADOS)
+    rotacion = acciones.add_parser("rotar", help="Separar y archivar las particiones antiguas")
+    rotacion.add_argument("--retener-meses", type=int, required=True,
+                          help="Meses completos que se mantienen en la tabla activa (además del actual)")
+    rotacion.add_argument("--exportar", action="store_true", help=f"Guardar cada partición en {DIRECTORIO_ARCHIVO}")
+    rotacion.add_argument("--borrar", action="store_true",
+                          help=f"Borrar las particiones separadas en lugar de moverlas al esquema {ESQUEMA_ARCHIVO}")
+    acciones.add_parser("estado", help="Listar las particiones y comprobar sus índices")
+    args = parser.parse_args(argumentos)
+
+    if args.accion == "migrar":
+        informe = migrar(args.conservar_anterior, args.meses_adelantados)
+        if informe is None:
+            print("Hechos_Ventas ya está particionada")
+        else:
+            print(f"{informe['filas']:,} ventas en {informe['particiones']} particiones mensuales "
+                  f"({informe['desde']:%Y-%m} a {informe['hasta']:%Y-%m})")
+    elif args.accion == "crear":
+        creadas = crear_particiones_futuras(args.meses_adelantados)
+        print(f"Particiones creadas: {', '.join(creadas) or 'ninguna'}")
+    elif args.accion == "rotar":
+        rotadas = rotar(args.retener_meses, args.exportar, args.borrar)
+        destino = "borradas" if args.borrar else f"movidas al esquema {ESQUEMA_ARCHIVO}"
+        print(f"Particiones {destino}: {', '.join(rotadas) or 'ninguna'}")
+    else:
+        resultado = estado()
+        if resultado is None:
+            print("Hechos_Ventas no está particionada (python particiones.py migrar)")
+            return 0
+        particiones, incompletos = resultado
+        print(particiones.to_string(index=False))
+        if incompletos:
+            print(f"Índices que no cubren todas las particiones: {', '.join(incompletos)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Uso: python particiones.py migrar   |   python particiones.py rotar --retener-meses 24 --exportar
+    sys.exit(main())
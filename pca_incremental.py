@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cache_columnar import leer_lotes
+
+# Filas por bloque al recorrer el archivo
+TAMANO_BLOQUE = 50_000
+
+# Componentes cuyas puntuaciones se guardan para los gráficos (2D y 3D)
+COMPONENTES_GRAFICO = 3
+
+
+# Recorre el archivo por bloques de filas sin cargarlo completo. La primera vez se convierte
+# a la caché columnar (Arrow); después los bloques se leen del archivo mapeado en memoria.
+def leer_bloques(archivo, tamano=TAMANO_BLOQUE):
+    for lote in leer_lotes(archivo):
+        for desde in range(0, len(lote), tamano):
+            yield lote.iloc[desde:desde + tamano]
+
+
+# Primeras filas del archivo (para mostrar el dataset y elegir columnas)
+def leer_encabezado(archivo, filas=5):
+    for bloque in leer_bloques(archivo, tamano=max(filas, 1000)):
+        return bloque.head(filas)
+    return pd.DataFrame()
+
+
+# Media y matriz de co-momentos acumuladas por bloques (fórmula de Welford/Chan para combinar
+# las estadísticas de cada bloque con las acumuladas): una pasada y memoria O(p²)
+class MomentosIncrementales:
+    def __init__(self, p):
+        self.n = 0
+        self.media = np.zeros(p)
+        self.comomentos = np.zeros((p, p))
+
+    def agregar(self, X):
+        n_b = len(X)
+        if n_b == 0:
+            return
+        media_b = X.mean(axis=0)
+        centrado = X - media_b
+        comomentos_b = centrado.T @ centrado
+        n = self.n + n_b
+        delta = media_b - self.media
+        self.comomentos += comomentos_b + np.outer(delta, delta) * self.n * n_b / n
+        self.media += delta * n_b / n
+        self.n = n
+
+    def covarianza(self, ddof=0):
+        return self.comomentos / max(self.n - ddof, 1)
+
+
+@dataclass
+class ResultadoPCA:
+    columnas: list
+    n: int
+    media: np.ndarray
+    desviacion: np.ndarray
+    covarianza_escalada: np.ndarray
+    valores_propios: np.ndarray
+    vectores_propios: np.ndarray
+    puntuaciones: np.ndarray
+    escalados_muestra: pd.DataFrame
+
+    # Los k primeros componentes salen de la descomposición ya calculada: no se reajusta nada
+    def componentes(self, k):
+        return self.vectores_propios[:k]
+
+    def varianza_explicada_ratio(self, k):
+        return self.valores_propios[:k] / self.valores_propios.sum()
+
+    # Puntuaciones de las filas de muestra para cualquier número de componentes
+    def muestra_puntuaciones(self, k):
+        valores = self.escalados_muestra.to_numpy() @ self.vectores_propios[:k].T
+        return pd.DataFrame(valores, columns=[f'PC{i+1}' for i in range(k)])
+
+    def puntuaciones_df(self, k):
+        k = min(k, self.puntuaciones.shape[1])
+        return pd.DataFrame(self.puntuaciones[:, :k], columns=[f'PC{i+1}' for i in range(k)])
+
+
+def _matriz(bloque, columnas):
+    return bloque[columnas].apply(pd.to_numeric, errors='coerce').dropna().to_numpy(dtype=np.float64)
+
+
+# PCA sobre datos estandarizados en dos pasadas por bloques:
+# 1) media, desviación y covarianza; 2) proyección de las filas sobre los primeros componentes
+def ajustar_pca(archivo, columnas, tamano=TAMANO_BLOQUE):
+    columnas = list(columnas)
+    momentos = MomentosIncrementales(len(columnas))
+    for bloque in leer_bloques(archivo, tamano):
+        momentos.agregar(_matriz(bloque, columnas))
+    if momentos.n == 0:
+        raise ValueError("Las columnas seleccionadas no tienen filas numéricas completas")
+
+    # Igual que StandardScaler: desviación poblacional; las columnas constantes no se escalan
+    desviacion = np.sqrt(np.diag(momentos.covarianza(ddof=0)))
+    desviacion[desviacion == 0] = 1.0
+    correlacion = momentos.covarianza(ddof=0) / np.outer(desviacion, desviacion)
+
+    # Descomposición completa una sola vez (p x p), ordenada de mayor a menor varianza
+    valores, vectores = np.linalg.eigh(correlacion)
+    orden = np.argsort(valores)[::-1]
+    valores = np.clip(valores[orden], 0, None)
+    vectores = vectores[:, orden].T
+    # Signo determinista: la mayor carga de cada componente en positivo
+    signos = np.sign(vectores[np.arange(len(vectores)), np.abs(vectores).argmax(axis=1)])
+    vectores = vectores * signos[:, None]
+    # Varianzas con ddof=1, como PCA de scikit-learn y np.cov
+    factor = momentos.n / max(momentos.n - 1, 1)
+
+    k = min(COMPONENTES_GRAFICO, len(columnas))
+    puntuaciones = np.empty((momentos.n, k), dtype=np.float32)
+    escalados_muestra = None
+    fila = 0
+    for bloque in leer_bloques(archivo, tamano):
+        escalados = (_matriz(bloque, columnas) - momentos.media) / desviacion
+        if escalados_muestra is None and len(escalados):
+            escalados_muestra = pd.DataFrame(escalados[:5], columns=columnas)
+        puntuaciones[fila:fila + len(escalados)] = escalados @ vectores[:k].T
+        fila += len(escalados)
+
+    return ResultadoPCA(
+        columnas=columnas,
+        n=momentos.n,
+        media=momentos.media,
+        desviacion=desviacion,
+        covarianza_escalada=correlacion * factor,
+        valores_propios=valores * factor,
+        vectores_propios=vectores,
+        puntuaciones=puntuaciones,
+        escalados_muestra=escalados_muestra,
+    )
@@ -0,0 +1,156 @@
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cache_columnar import cargar, huella_archivo
+
+# Intervalos del histograma de cada columna numérica
+BINS_HISTOGRAMA = 30
+
+# Rejilla fina sobre la que se calcula la KDE agrupada (binned KDE)
+BINS_KDE = 512
+
+# Filas de muestra guardadas en el perfil para el gráfico de dispersión
+FILAS_MUESTRA = 100_000
+
+# Perfiles que se mantienen en memoria del proceso
+MAX_PERFILES = 8
+
+_perfiles = OrderedDict()
+_candado = threading.Lock()
+
+
+@dataclass
+class PerfilDataset:
+    huella: str
+    filas: int
+    columnas: list
+    numericas: list
+    primeras_filas: pd.DataFrame
+    informacion: pd.DataFrame
+    descripcion: pd.DataFrame
+    histogramas: dict
+    kde: dict
+    correlacion: pd.DataFrame
+    muestra: pd.DataFrame
+
+    # Submatriz de correlación ya calculada: no se vuelve a recorrer el dataset
+    def correlacion_de(self, columnas):
+        return self.correlacion.loc[columnas, columnas]
+
+
+# Conteos por intervalo de todas las columnas con una sola llamada a bincount
+def _conteos_por_intervalo(X, minimos, maximos, bins):
+    n, p = X.shape
+    ancho = np.where(maximos > minimos, maximos - minimos, 1.0)
+    posicion = np.floor((X - minimos) / ancho * bins)
+    validos = ~np.isnan(posicion)
+    indices = np.clip(np.nan_to_num(posicion, nan=0), 0, bins - 1).astype(np.int64) + np.arange(p) * bins
+    conteos = np.bincount(indices[validos], minlength=p * bins).reshape(p, bins)
+    bordes = minimos[:, None] + (ancho / bins)[:, None] * np.arange(bins + 1)
+    return conteos, bordes
+
+
+# Correlación de Pearson con observaciones completas por pareja (igual que DataFrame.corr)
+# mediante productos de matrices sobre los datos centrados y la máscara de valores presentes
+def _correlacion(X, medias):
+    presentes = (~np.isnan(X)).astype(np.float64)
+    centrados = np.nan_to_num(X - medias)
+    n = presentes.T @ presentes
+    suma = centrados.T @ presentes
+    suma_cuadrados = (centrados ** 2).T @ presentes
+    productos = centrados.T @ centrados
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covarianza = productos - suma * suma.T / n
+        varianza_i = suma_cuadrados - suma ** 2 / n
+        varianza_j = varianza_i.T
+        correlacion = covarianza / np.sqrt(varianza_i * varianza_j)
+    correlacion[n < 2] = np.nan
+    return np.clip(correlacion, -1, 1)
+
+
+# KDE gaussiana agrupada: histograma fino suavizado por convolución (ancho de banda de Scott)
+def _kde_agrupada(conteos, bordes, desviacion, n):
+    if n < 2 or not desviacion > 0:
+        return None
+    paso = bordes[1] - bordes[0]
+    ancho_banda = desviacion * n ** (-1 / 5)
+    radio = int(np.ceil(4 * ancho_banda / paso))
+    desplazamientos = np.arange(-radio, radio + 1) * paso
+    nucleo = np.exp(-0.5 * (desplazamientos / ancho_banda) ** 2)
+    nucleo /= nucleo.sum()
+    suavizado = np.convolve(conteos, nucleo, mode='full')
+    # Se extiende la rejilla a ambos lados para no recortar las colas
+    centros = bordes[0] + paso * (np.arange(len(suavizado)) - radio + 0.5)
+    return centros, suavizado / (n * paso)
+
+
+# Perfil completo en una pasada vectorizada sobre la matriz numérica
+def calcular_perfil(df, huella=None):
+    numericas = [c for c in df.columns
+                 if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    X = df[numericas].to_numpy(dtype=np.float64, na_value=np.nan)
+    no_nulos = (~np.isnan(X)).sum(axis=0)
+
+    # Las columnas sin valores dan NaN (como describe) sin advertencias
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        medias = np.nanmean(X, axis=0) if len(X) else np.full(len(numericas), np.nan)
+        desviaciones = np.nanstd(X, axis=0, ddof=1) if len(X) else np.full(len(numericas), np.nan)
+        minimos = np.nanmin(X, axis=0) if len(X) else np.full(len(numericas), np.nan)
+        maximos = np.nanmax(X, axis=0) if len(X) else np.full(len(numericas), np.nan)
+        cuartiles = np.nanpercentile(X, [25, 50, 75], axis=0) if len(X) else np.full((3, len(numericas)), np.nan)
+
+    descripcion = pd.DataFrame(
+        [no_nulos, medias, desviaciones, minimos, *cuartiles, maximos],
+        index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+        columns=numericas,
+    )
+
+    limites_min = np.nan_to_num(minimos, nan=0.0)
+    limites_max = np.nan_to_num(maximos, nan=0.0)
+    conteos, bordes = _conteos_por_intervalo(X, limites_min, limites_max, BINS_HISTOGRAMA)
+    conteos_finos, bordes_finos = _conteos_por_intervalo(X, limites_min, limites_max, BINS_KDE)
+    histogramas = {c: (conteos[i], bordes[i]) for i, c in enumerate(numericas)}
+    kde = {c: _kde_agrupada(conteos_finos[i], bordes_finos[i], desviaciones[i], no_nulos[i])
+           for i, c in enumerate(numericas)}
+
+    informacion = pd.DataFrame({
+        'columna': [str(c) for c in df.columns],
+        'no_nulos': df.notna().sum().to_numpy(),
+        'tipo': [str(t) for t in df.dtypes],
+        'memoria_kb': (df.memory_usage(deep=True, index=False) / 1024).round(1).to_numpy(),
+    })
+
+    return PerfilDataset(
+        huella=huella,
+        filas=len(df),
+        columnas=list(df.columns),
+        numericas=numericas,
+        primeras_filas=df.head(),
+        informacion=informacion,
+        descripcion=descripcion,
+        histogramas=histogramas,
+        kde=kde,
+        correlacion=pd.DataFrame(_correlacion(X, medias), index=numericas, columns=numericas),
+        muestra=df.sample(n=FILAS_MUESTRA, random_state=0) if len(df) > FILAS_MUESTRA else df,
+    )
+
+
+# Perfil del archivo, calculado una vez por contenido (huella) y reutilizado en cada interacción
+def obtener_perfil(archivo):
+    huella = huella_archivo(archivo)
+    with _candado:
+        if huella in _perfiles:
+            _perfiles.move_to_end(huella)
+            return _perfiles[huella]
+    perfil = calcular_perfil(cargar(archivo), huella)
+    with _candado:
+        _perfiles[huella] = perfil
+        while len(_perfiles) > MAX_PERFILES:
+            _perfiles.popitem(last=False)
+    return perfil
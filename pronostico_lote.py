@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columnas con las que se entrenan los modelos de cantidad (mismo orden que en la página)
+COLUMNAS_CARACTERISTICAS = ['id_sucursal', 'id_producto', 'año', 'mes', 'día', 'día_semana']
+
+# Filas que se puntúan por bloque en cada llamada a predict
+TAMANO_BLOQUE = 100_000
+
+
+# Características de calendario calculadas directamente sobre datetime64[D]
+def caracteristicas_fecha(fechas):
+    fechas = np.asarray(fechas, dtype='datetime64[D]')
+    meses = fechas.astype('datetime64[M]')
+    años = fechas.astype('datetime64[Y]').astype(np.int64) + 1970
+    mes = meses.astype(np.int64) % 12 + 1
+    dia = (fechas - meses.astype('datetime64[D]')).astype(np.int64) + 1
+    # El 1970-01-01 fue jueves: desplazar 3 días deja Lunes=0, Domingo=6 como dt.weekday
+    dia_semana = (fechas.astype(np.int64) + 3) % 7
+    return años, mes, dia, dia_semana
+
+
+# Rejilla completa sucursal x producto x fecha como columnas NumPy (sin bucles en Python)
+def generar_rejilla(sucursales, productos, fecha_inicio, dias):
+    sucursales = np.asarray(sucursales, dtype=np.int64)
+    productos = np.asarray(productos, dtype=np.int64)
+    fechas = np.datetime64(pd.Timestamp(fecha_inicio).date(), 'D') + np.arange(dias)
+
+    n_suc, n_prod, n_fech = len(sucursales), len(productos), len(fechas)
+    # Orden de la rejilla: fecha, luego sucursal, luego producto
+    rejilla = {
+        'fecha': np.repeat(fechas, n_suc * n_prod),
+        'id_sucursal': np.tile(np.repeat(sucursales, n_prod), n_fech),
+        'id_producto': np.tile(productos, n_suc * n_fech),
+    }
+    años, mes, dia, dia_semana = caracteristicas_fecha(rejilla['fecha'])
+    rejilla.update({'año': años, 'mes': mes, 'día': dia, 'día_semana': dia_semana})
+    return rejilla
+
+
+# Puntúa la rejilla por bloques con cada modelo y devuelve la tabla larga de pronósticos
+def pronosticar_lote(modelos, rejilla, tamano_bloque=TAMANO_BLOQUE):
+    n = len(rejilla['fecha'])
+    matriz = np.column_stack([rejilla[c] for c in COLUMNAS_CARACTERISTICAS])
+    nombres = list(modelos)
+    tiempos = {}
+    tablas = []
+    for i, (nombre, modelo) in enumerate(modelos.items()):
+        inicio = time.perf_counter()
+        predicciones = np.empty(n, dtype=np.float32)
+        for desde in range(0, n, tamano_bloque):
+            hasta = min(desde + tamano_bloque, n)
+            # Un DataFrame por bloque para conservar los nombres de columna del entrenamiento
+            bloque = pd.DataFrame(matriz[desde:hasta], columns=COLUMNAS_CARACTERISTICAS, copy=False)
+            predicciones[desde:hasta] = modelo.predict(bloque)
+        tiempos[nombre] = time.perf_counter() - inicio
+        tablas.append(pd.DataFrame({
+            'fecha': rejilla['fecha'],
+            'id_sucursal': rejilla['id_sucursal'],
+            'id_producto': rejilla['id_producto'],
+            'modelo': pd.Categorical.from_codes(np.full(n, i, dtype=np.int8), nombres),
+            'cantidad_predicha': predicciones,
+        }))
+    pronosticos = pd.concat(tablas, ignore_index=True) if tablas else pd.DataFrame()
+    return pronosticos, tiempos
@@ -0,0 +1,170 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from carga_masiva import cargar_hechos
+from entrenamiento import entrenar_modelos
+from pronostico_lote import caracteristicas_fecha
+
+# Ventas diarias por sucursal y producto desde el resumen diario (ya agregado por método de pago)
+QUERY_DIARIA = """
+    SELECT id_fecha AS fecha, id_sucursal, id_producto, SUM(suma_cantidad)::bigint AS cantidad
+    FROM Resumen_Ventas_Diario
+    GROUP BY id_fecha, id_sucursal, id_producto
+    ORDER BY id_sucursal, id_producto, id_fecha
+"""
+
+TIPOS_DIARIA = {'fecha': 'datetime64[ns]', 'id_sucursal': 'int32', 'id_producto': 'int32', 'cantidad': 'float32'}
+
+CLAVES_SERIE = ['id_sucursal', 'id_producto']
+
+# Rezagos (en días) y ventanas móviles de las características
+REZAGOS = (1, 7, 14, 28)
+VENTANAS = (7, 28)
+
+# Validación con origen móvil: número de cortes y días de prueba después de cada corte
+PARTICIONES = 3
+HORIZONTE = 7
+
+COLUMNAS_CALENDARIO = ['mes', 'día', 'día_semana']
+
+
+def columnas_caracteristicas(rezagos=REZAGOS, ventanas=VENTANAS):
+    return (CLAVES_SERIE + COLUMNAS_CALENDARIO + [f'rezago_{k}' for k in rezagos]
+            + [f'media_{w}' for w in ventanas])
+
+
+# Días que necesita cada serie hacia atrás para calcular todas las características
+def historia_necesaria(rezagos=REZAGOS, ventanas=VENTANAS):
+    return max(max(rezagos), max(ventanas))
+
+
+def cargar_diaria(query=QUERY_DIARIA):
+    return cargar_hechos(query, tipos=TIPOS_DIARIA)
+
+
+# Completa los días sin ventas con 0 desde la primera venta de cada serie hasta la última fecha
+def completar_dias(diaria):
+    diaria = diaria.groupby(CLAVES_SERIE + ['fecha'], as_index=False, observed=True)['cantidad'].sum()
+    series = diaria.groupby(CLAVES_SERIE, as_index=False, observed=True)['fecha'].min()
+    fechas = np.arange(diaria['fecha'].min().to_datetime64().astype('datetime64[D]'),
+                       diaria['fecha'].max().to_datetime64().astype('datetime64[D]') + 1)
+    dias = len(fechas)
+    completa = pd.DataFrame({
+        'id_sucursal': np.repeat(series['id_sucursal'].to_numpy(), dias),
+        'id_producto': np.repeat(series['id_producto'].to_numpy(), dias),
+        'fecha': np.tile(fechas, len(series)).astype('datetime64[ns]'),
+    })
+    inicio = np.repeat(series['fecha'].to_numpy(), dias)
+    completa = completa[completa['fecha'].to_numpy() >= inicio]
+    completa = completa.merge(diaria, on=CLAVES_SERIE + ['fecha'], how='left')
+    completa['cantidad'] = completa['cantidad'].fillna(0).astype('float32')
+    return completa.sort_values(CLAVES_SERIE + ['fecha'], ignore_index=True)
+
+
+# Rezagos y medias móviles con desplazamientos por grupo (sin bucles por serie). Las medias usan
+# la suma acumulada: media_w(t) = (S(t-1) - S(t-1-w)) / w, solo con días anteriores a t.
+def agregar_caracteristicas(completa, rezagos=REZAGOS, ventanas=VENTANAS):
+    datos = completa.copy()
+    grupos = datos.groupby(CLAVES_SERIE, sort=False, observed=True)
+    for k in rezagos:
+        datos[f'rezago_{k}'] = grupos['cantidad'].shift(k)
+    datos['_acumulada'] = grupos['cantidad'].cumsum()
+    acumulada = datos.groupby(CLAVES_SERIE, sort=False, observed=True)['_acumulada']
+    anterior = acumulada.shift(1)
+    for w in ventanas:
+        datos[f'media_{w}'] = (anterior - acumulada.shift(w + 1).fillna(0)) / w
+        # Sin w días de historia la media no está definida
+        datos.loc[acumulada.cumcount() < w, f'media_{w}'] = np.nan
+    _, mes, dia, dia_semana = caracteristicas_fecha(datos['fecha'].to_numpy())
+    datos['mes'], datos['día'], datos['día_semana'] = mes, dia, dia_semana
+    datos = datos.drop(columns='_acumulada')
+    return datos.dropna(subset=columnas_caracteristicas(rezagos, ventanas)).reset_index(drop=True)
+
+
+# Particiones con origen móvil: se entrena hasta cada corte y se prueba en los días siguientes
+def particiones_temporales(fechas, particiones=PARTICIONES, horizonte=HORIZONTE):
+    ultima = pd.Timestamp(fechas.max())
+    cortes = [ultima - pd.Timedelta(days=horizonte * i) for i in range(particiones, 0, -1)]
+    for corte in cortes:
+        entrenamiento = fechas <= corte
+        prueba = (fechas > corte) & (fechas <= corte + pd.Timedelta(days=horizonte))
+        if entrenamiento.any() and prueba.any():
+            yield corte, entrenamiento.to_numpy(), prueba.to_numpy()
+
+
+# Entrena y evalúa cada modelo en cada partición (en paralelo y con el registro de modelos).
+# Devuelve una tabla con las métricas por partición y modelo.
+def validar(modelos, datos, particiones=PARTICIONES, horizonte=HORIZONTE, rezagos=REZAGOS, ventanas=VENTANAS):
+    columnas = columnas_caracteristicas(rezagos, ventanas)
+    X, y = datos[columnas], datos['cantidad']
+    filas = []
+    for corte, entrenamiento, prueba in particiones_temporales(datos['fecha'], particiones, horizonte):
+        resultados = entrenar_modelos(modelos, X[entrenamiento], X[prueba], y[entrenamiento], y[prueba])
+        for nombre, resultado in resultados.items():
+            filas.append({
+                'corte': corte.date(),
+                'modelo': nombre,
+                'filas_entrenamiento': int(entrenamiento.sum()),
+                'filas_prueba': int(prueba.sum()),
+                'mae': resultado['mae'],
+                'mse': resultado['mse'],
+                'r2': resultado['r2'],
+                'origen': resultado['origen'],
+            })
+    return pd.DataFrame(filas)
+
+
+# Modelo final entrenado con todo el histórico de características
+def entrenar_final(modelo, datos, rezagos=REZAGOS, ventanas=VENTANAS):
+    from sklearn.base import clone
+
+    columnas = columnas_caracteristicas(rezagos, ventanas)
+    modelo = clone(modelo)
+    modelo.fit(datos[columnas], datos['cantidad'])
+    return modelo
+
+
+# Pronóstico recursivo de todas las series a la vez: en cada día del horizonte se arma la
+# matriz de características de todas las series con su historia reciente y se hace una sola
+# llamada a predict; la predicción pasa a ser historia del día siguiente.
+def pronosticar(modelo, completa, dias, rezagos=REZAGOS, ventanas=VENTANAS):
+    inicio = time.perf_counter()
+    largo = historia_necesaria(rezagos, ventanas)
+    ultima = completa['fecha'].max().to_datetime64().astype('datetime64[D]')
+    series = completa[CLAVES_SERIE].drop_duplicates().reset_index(drop=True)
+
+    # Matriz series x días con los últimos `largo` días (0 antes de la primera venta)
+    fechas = ultima - np.arange(largo)[::-1]
+    tabla = completa[completa['fecha'] >= pd.Timestamp(fechas[0])]
+    tabla = tabla.pivot_table(index=CLAVES_SERIE, columns='fecha', values='cantidad', aggfunc='sum', fill_value=0)
+    tabla = tabla.reindex(pd.MultiIndex.from_frame(series)).reindex(columns=pd.DatetimeIndex(fechas), fill_value=0)
+    historia = np.zeros((len(series), largo + dias), dtype=np.float64)
+    historia[:, :largo] = tabla.fillna(0).to_numpy()
+
+    columnas = columnas_caracteristicas(rezagos, ventanas)
+    nuevas_fechas = ultima + 1 + np.arange(dias)
+    meses, dias_mes, dias_semana = caracteristicas_fecha(nuevas_fechas)[1:]
+    for d in range(dias):
+        t = largo + d
+        caracteristicas = {
+            'id_sucursal': series['id_sucursal'].to_numpy(),
+            'id_producto': series['id_producto'].to_numpy(),
+            'mes': np.full(len(series), meses[d]),
+            'día': np.full(len(series), dias_mes[d]),
+            'día_semana': np.full(len(series), dias_semana[d]),
+        }
+        for k in rezagos:
+            caracteristicas[f'rezago_{k}'] = historia[:, t - k]
+        for w in ventanas:
+            caracteristicas[f'media_{w}'] = historia[:, t - w:t].mean(axis=1)
+        historia[:, t] = np.clip(modelo.predict(pd.DataFrame(caracteristicas)[columnas]), 0, None)
+
+    pronostico = pd.DataFrame({
+        'fecha': np.tile(nuevas_fechas, len(series)).astype('datetime64[ns]'),
+        'id_sucursal': np.repeat(series['id_sucursal'].to_numpy(), dias),
+        'id_producto': np.repeat(series['id_producto'].to_numpy(), dias),
+        'cantidad_predicha': historia[:, largo:].ravel().astype(np.float32),
+    })
+    return pronostico, time.perf_counter() - inicio
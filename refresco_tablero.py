@@ -0,0 +1,232 @@
+import os
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from acceso_datos import (INTERVALO_VERIFICACION_SEGUNDOS, MAX_CONEXIONES, PARAMETROS_CONEXION, QUERY_VERSION_HECHOS,
+                          TTL_CACHE_SEGUNDOS, conexion, ejecutar_consulta, verificar_cambios)
+from consultas_tablero import consultas_sin_filtros
+from rollups import AVISO_SIN_RESUMEN, INTERVALO_REFRESCO_SEGUNDOS, refrescar_si_necesario
+
+# Con PANCHITA_REFRESCO_FONDO=0 el tablero vuelve a consultar de forma síncrona en cada ejecución
+ACTIVO = os.environ.get("PANCHITA_REFRESCO_FONDO", "1") not in ("", "0")
+
+# Consultas simultáneas por refresco (cada una en su conexión del pool, más la que coordina).
+# Con un cuarto del pool el refresco no deja sin conexiones a las consultas filtradas, las
+# cargas de las páginas de modelos ni la API de reportes.
+HILOS_REFRESCO = max(1, min(4, MAX_CONEXIONES // 4))
+
+# Tras una notificación se espera un poco más para agrupar ráfagas (la ingesta confirma por lotes)
+DEMORA_NOTIFICACION_SEGUNDOS = 1.0
+
+# Una lectura de la interfaz pide revalidar si la última comprobación es más antigua que esto
+EDAD_REVALIDAR_SEGUNDOS = INTERVALO_VERIFICACION_SEGUNDOS
+
+# Espera máxima de la primera ejecución del tablero por la primera instantánea
+ESPERA_PRIMERA_SEGUNDOS = 60
+
+ESPERA_REINTENTO_SEGUNDOS = 10
+PASO_ESPERA_SEGUNDOS = 0.5
+
+# Cada sentencia que modifica Hechos_Ventas (también COPY, TRUNCATE y las particiones) avisa por
+# NOTIFY; varias en una transacción llegan como un solo aviso al confirmar
+CANAL_CAMBIOS = 'hechos_ventas_cambios'
+QUERY_EXISTE_AVISO = '''
+    SELECT EXISTS (SELECT 1 FROM pg_trigger
+                   WHERE tgname = 'trg_hechos_ventas_aviso' AND tgrelid = 'hechos_ventas'::regclass)
+'''
+DDL_AVISO = f'''
+    CREATE OR REPLACE FUNCTION avisar_cambio_hechos() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{CANAL_CAMBIOS}', TG_OP);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    DROP TRIGGER IF EXISTS trg_hechos_ventas_aviso ON Hechos_Ventas;
+    CREATE TRIGGER trg_hechos_ventas_aviso
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Hechos_Ventas
+        FOR EACH STATEMENT EXECUTE FUNCTION avisar_cambio_hechos();
+'''
+
+
+# Resultados del tablero sin filtros en un mismo instante de la base de datos. No se modifica
+# después de publicarse: las sesiones leen la vigente mientras el hilo prepara la siguiente.
+@dataclass(frozen=True)
+class Instantanea:
+    numero: int
+    version_hechos: tuple
+    creada: float
+    segundos: float
+    datos: MappingProxyType
+
+    # Copia para que la página pueda modificar su DataFrame sin alterar la instantánea
+    def reporte(self, nombre):
+        return self.datos[nombre].copy()
+
+    @property
+    def edad(self):
+        return time.time() - self.creada
+
+
+# Hilo de fondo que mantiene la instantánea al día: despierta con NOTIFY, con cada intervalo
+# programado o cuando una sesión encuentra la instantánea sin revalidar (stale-while-revalidate)
+class RefrescadorTablero:
+    def __init__(self, intervalo=INTERVALO_REFRESCO_SEGUNDOS, hilos=HILOS_REFRESCO):
+        self.intervalo = intervalo
+        self.hilos = hilos
+        self.refrescando = False
+        self.escuchando = False
+        self.ultimo_error = None
+        self._instantanea = None
+        self._validada = 0.0
+        self._lista = threading.Event()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name='refresco_tablero', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, espera=5):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(espera)
+
+    # Lectura para la interfaz: devuelve enseguida la instantánea vigente aunque esté vencida y,
+    # si hace falta, pide al hilo que revalide. Solo la primera vez se espera (hasta `espera` s).
+    def instantanea(self, espera=0):
+        if self._instantanea is None and espera:
+            self._lista.wait(espera)
+        actual = self._instantanea
+        if actual is None or time.monotonic() - self._validada > EDAD_REVALIDAR_SEGUNDOS:
+            self._despertar.set()
+        return actual
+
+    # Acumula las ventas nuevas en el resumen y, si la tabla de hechos cambió (o la instantánea
+    # superó el TTL de la caché, por cambios en las dimensiones), publica una instantánea nueva
+    def refrescar(self):
+        if not refrescar_si_necesario(forzar=True):
+            raise RuntimeError(AVISO_SIN_RESUMEN)
+        version = verificar_cambios(forzar=True)
+        self._validada = time.monotonic()
+        actual = self._instantanea
+        if actual is not None and actual.version_hechos == version and actual.edad < TTL_CACHE_SEGUNDOS:
+            return actual
+        self.refrescando = True
+        try:
+            inicio = time.perf_counter()
+            datos, version = self._consultar()
+            nueva = Instantanea(numero=actual.numero + 1 if actual else 1, version_hechos=version,
+                                creada=time.time(), segundos=time.perf_counter() - inicio,
+                                datos=MappingProxyType(datos))
+        finally:
+            self.refrescando = False
+        # Publicar es reemplazar una referencia: quien ya leyó la anterior la sigue usando entera
+        self._instantanea = nueva
+        self._lista.set()
+        return nueva
+
+    # Todas las consultas en paralelo sobre la misma foto de la base de datos: la conexión
+    # coordinadora exporta su snapshot y cada consulta lo adopta en su propia conexión
+    def _consultar(self):
+        consultas = consultas_sin_filtros()
+        with conexion() as conn:
+            with conn.cursor() as cur:
+                cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+                cur.execute('SELECT pg_export_snapshot()')
+                snapshot = cur.fetchone()[0]
+                cur.execute(QUERY_VERSION_HECHOS)
+                version = tuple(cur.fetchone())
+                with ThreadPoolExecutor(max_workers=self.hilos) as ejecutor:
+                    futuros = {nombre: ejecutor.submit(ejecutar_consulta, query, params, snapshot)
+                               for nombre, (query, params) in consultas.items()}
+                    datos = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+        return datos, version
+
+    # Conexión dedicada en autocommit que escucha el canal de avisos (crea el disparador si falta)
+    def _escuchar(self):
+        import psycopg2
+
+        conn = psycopg2.connect(**PARAMETROS_CONEXION)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(QUERY_EXISTE_AVISO)
+            if not cur.fetchone()[0]:
+                try:
+                    cur.execute(DDL_AVISO)
+                except psycopg2.Error:
+                    # Sin permisos para crear el disparador queda el refresco programado
+                    pass
+            cur.execute(f'LISTEN {CANAL_CAMBIOS}')
+        self.escuchando = True
+        return conn
+
+    def _cerrar(self, escucha):
+        self.escuchando = False
+        if escucha is not None and not escucha.closed:
+            escucha.close()
+        return None
+
+    # Espera hasta un aviso, una petición de revalidar, el intervalo o la orden de detenerse
+    def _esperar(self, escucha, segundos):
+        limite = time.monotonic() + segundos
+        while not self._detener.is_set() and not self._despertar.is_set():
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            if escucha is None:
+                self._despertar.wait(restante)
+                continue
+            listo, _, _ = select.select([escucha], [], [], min(restante, PASO_ESPERA_SEGUNDOS))
+            if listo:
+                escucha.poll()
+                if escucha.notifies:
+                    self._detener.wait(DEMORA_NOTIFICACION_SEGUNDOS)
+                    escucha.poll()
+                    escucha.notifies.clear()
+                    break
+        self._despertar.clear()
+
+    def _bucle(self):
+        escucha = None
+        while not self._detener.is_set():
+            espera = self.intervalo
+            try:
+                if escucha is None:
+                    escucha = self._escuchar()
+                self.refrescar()
+                self.ultimo_error = None
+            except Exception as e:
+                # Se conserva la última instantánea; la conexión de escucha se rehace al reintentar
+                self.ultimo_error = e
+                escucha = self._cerrar(escucha)
+                espera = ESPERA_REINTENTO_SEGUNDOS
+            try:
+                self._esperar(escucha, espera)
+            except Exception as e:
+                self.ultimo_error = e
+                escucha = self._cerrar(escucha)
+        self._cerrar(escucha)
+
+
+_refrescador = None
+_pid_refrescador = None
+_candado_refrescador = threading.Lock()
+
+
+# Refrescador compartido por todas las sesiones del proceso (se recrea si el proceso fue bifurcado)
+def obtener_refrescador():
+    global _refrescador, _pid_refrescador
+    with _candado_refrescador:
+        if _refrescador is None or _pid_refrescador != os.getpid():
+            _refrescador = RefrescadorTablero()
+            _pid_refrescador = os.getpid()
+        return _refrescador.iniciar()
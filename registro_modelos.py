@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Carpeta donde se guardan los modelos entrenados y sus métricas
+DIRECTORIO_MODELOS = Path(os.environ.get("PANCHITA_DIR_MODELOS", Path(__file__).resolve().parent / "modelos_guardados"))
+
+# Versiones que se conservan en disco por cada modelo (se borran las más antiguas)
+MAX_VERSIONES_POR_MODELO = 3
+
+# Modelos que se mantienen cargados en memoria del proceso
+MAX_MODELOS_EN_MEMORIA = 16
+
+_memoria = {}
+_candado = threading.Lock()
+
+
+# Huella de los datos de entrenamiento y prueba: columnas, tipos y contenido
+def huella_datos(*partes):
+    h = hashlib.sha256()
+    for parte in partes:
+        if isinstance(parte, pd.DataFrame):
+            h.update(repr(list(zip(parte.columns, map(str, parte.dtypes)))).encode())
+        h.update(pd.util.hash_pandas_object(parte, index=True).values.tobytes())
+    return h.hexdigest()
+
+
+# Parámetros que solo afectan a la ejecución (hilos, mensajes) y no al modelo resultante
+PARAMETROS_DE_EJECUCION = {"n_jobs", "nthread", "verbose", "verbosity"}
+
+
+# Huella de la configuración: clase e hiperparámetros del modelo
+def huella_configuracion(modelo):
+    params = sorted((k, repr(v)) for k, v in modelo.get_params().items() if k not in PARAMETROS_DE_EJECUCION)
+    texto = f"{type(modelo).__module__}.{type(modelo).__name__}:{params}"
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _directorio_entrada(nombre, clave):
+    seguro = "".join(c if c.isalnum() else "_" for c in nombre)
+    return DIRECTORIO_MODELOS / seguro / clave
+
+
+# scikit-learn y joblib se importan dentro de las funciones: importar el registro (lo hacen
+# todas las páginas de modelos) no debe retrasar el primer pintado
+def calcular_metricas(y_test, predicciones):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    return {
+        "mae": float(mean_absolute_error(y_test, predicciones)),
+        "mse": float(mean_squared_error(y_test, predicciones)),
+        "r2": float(r2_score(y_test, predicciones)),
+    }
+
+
+# Cada guardado escribe en su propia carpeta temporal y la renombra a la definitiva: otra sesión
+# nunca ve una entrada a medio escribir. Si otra sesión ya guardó la misma clave (mismos datos y
+# configuración, mismo modelo) se conserva la suya y se descarta la temporal.
+def _guardar(directorio, modelo, predicciones, metricas):
+    import joblib
+
+    directorio.parent.mkdir(parents=True, exist_ok=True)
+    temporal = Path(tempfile.mkdtemp(prefix=directorio.name + ".", suffix=".tmp", dir=directorio.parent))
+    try:
+        joblib.dump(modelo, temporal / "modelo.joblib")
+        np.save(temporal / "predicciones.npy", predicciones)
+        (temporal / "metricas.json").write_text(json.dumps(metricas, indent=2))
+        if not directorio.exists():
+            temporal.rename(directorio)
+    except OSError:
+        # rename falla si la otra sesión renombró primero
+        if not (directorio / "metricas.json").exists():
+            raise
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def _cargar(directorio):
+    import joblib
+
+    modelo = joblib.load(directorio / "modelo.joblib")
+    predicciones = np.load(directorio / "predicciones.npy")
+    metricas = json.loads((directorio / "metricas.json").read_text())
+    return modelo, predicciones, metricas
+
+
+def _podar_versiones(directorio_modelo):
+    versiones = sorted((d for d in directorio_modelo.iterdir() if d.is_dir() and not d.name.endswith(".tmp")),
+                       key=lambda d: d.stat().st_mtime, reverse=True)
+    for antigua in versiones[MAX_VERSIONES_POR_MODELO:]:
+        shutil.rmtree(antigua, ignore_errors=True)
+
+
+# Clave del registro para un modelo concreto sobre unos datos con huella dada
+def clave_modelo(nombre, modelo, huella):
+    return hashlib.sha256((nombre + huella + huella_configuracion(modelo)).encode()).hexdigest()[:20]
+
+
+# Busca un modelo ya entrenado, primero en memoria y luego en disco
+def buscar(nombre, clave):
+    with _candado:
+        if clave in _memoria:
+            return {**_memoria[clave], "origen": "memoria"}
+    directorio = _directorio_entrada(nombre, clave)
+    if not (directorio / "metricas.json").exists():
+        return None
+    modelo, predicciones, metricas = _cargar(directorio)
+    return _recordar(clave, {"modelo": modelo, "predicciones": predicciones, "origen": "disco", **metricas})
+
+
+# Guarda en disco y en memoria un modelo recién entrenado
+def registrar(nombre, clave, modelo, predicciones, metricas):
+    directorio = _directorio_entrada(nombre, clave)
+    _guardar(directorio, modelo, predicciones, metricas)
+    _podar_versiones(directorio.parent)
+    return _recordar(clave, {"modelo": modelo, "predicciones": predicciones, "origen": "entrenado", **metricas})
+
+
+def _recordar(clave, resultado):
+    with _candado:
+        _memoria[clave] = resultado
+        while len(_memoria) > MAX_MODELOS_EN_MEMORIA:
+            _memoria.pop(next(iter(_memoria)))
+    return resultado
+
+
+# Entrena el modelo y calcula sus métricas sobre el conjunto de prueba
+def entrenar_y_evaluar(modelo, X_train, X_test, y_train, y_test):
+    inicio = time.perf_counter()
+    modelo.fit(X_train, y_train)
+    predicciones = modelo.predict(X_test)
+    metricas = calcular_metricas(y_test, predicciones)
+    metricas["segundos_entrenamiento"] = time.perf_counter() - inicio
+    metricas["entrenado"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    return modelo, predicciones, metricas
+
+
+# Devuelve el modelo entrenado con sus predicciones y métricas; solo entrena si
+# cambian los datos o los hiperparámetros (si no, lo carga de memoria o de disco)
+def obtener_o_entrenar(nombre, modelo, X_train, X_test, y_train, y_test):
+    clave = clave_modelo(nombre, modelo, huella_datos(X_train, X_test, y_train, y_test))
+    resultado = buscar(nombre, clave)
+    if resultado is None:
+        resultado = registrar(nombre, clave, *entrenar_y_evaluar(modelo, X_train, X_test, y_train, y_test))
+    return resultado
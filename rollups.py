@@ -0,0 +1,320 @@
+import sys
+import threading
+import time
+
+from acceso_datos import PARAMETROS_CONEXION, cache_consultas, conexion, horizonte_ventas
+
+# Resumen diario de Hechos_Ventas al grano que necesitan todos los reportes del tablero:
+# fecha x sucursal x producto x método de pago. Las dimensiones (día de la semana, mes,
+# categoría, subcategoría) se resuelven uniendo este resumen con las tablas Dim_*.
+DDL_ROLLUPS = '''
+    CREATE TABLE IF NOT EXISTS Resumen_Ventas_Diario (
+        id_fecha DATE NOT NULL,
+        id_sucursal INT NOT NULL,
+        id_producto INT NOT NULL,
+        id_metodo_pago INT NOT NULL,
+        num_ventas BIGINT NOT NULL,
+        suma_cantidad BIGINT NOT NULL,
+        suma_total DECIMAL(16, 2) NOT NULL,
+        PRIMARY KEY (id_fecha, id_sucursal, id_producto, id_metodo_pago)
+    );
+
+    -- Filtros del tablero: la clave primaria ya empieza por id_fecha (rango de fechas); los índices
+    -- compuestos cubren sucursal o producto con rango de fechas (en bases anteriores a los filtros
+    -- reemplazan a los de una columna con `python rollups.py migrar`)
+    CREATE INDEX IF NOT EXISTS idx_resumen_diario_sucursal_fecha ON Resumen_Ventas_Diario (id_sucursal, id_fecha);
+    CREATE INDEX IF NOT EXISTS idx_resumen_diario_producto_fecha ON Resumen_Ventas_Diario (id_producto, id_fecha);
+    CREATE INDEX IF NOT EXISTS idx_resumen_diario_metodo_pago ON Resumen_Ventas_Diario (id_metodo_pago);
+
+    -- Marca de agua: último id_venta ya acumulado en cada resumen, y el candidato a marca de agua
+    -- que espera a que terminen las transacciones que estaban abiertas al anotarlo
+    CREATE TABLE IF NOT EXISTS Control_Rollups (
+        nombre VARCHAR(50) PRIMARY KEY,
+        ultimo_id_venta BIGINT NOT NULL DEFAULT 0,
+        actualizado TIMESTAMP NOT NULL DEFAULT now()
+    );
+    ALTER TABLE Control_Rollups ADD COLUMN IF NOT EXISTS pendiente_id_venta BIGINT,
+                                ADD COLUMN IF NOT EXISTS pendiente_xid BIGINT;
+
+    INSERT INTO Control_Rollups (nombre) VALUES ('Resumen_Ventas_Diario')
+    ON CONFLICT (nombre) DO NOTHING;
+'''
+
+# Migración explícita de las bases creadas antes de la barra de filtros: índices compuestos en
+# lugar de los de una columna. Se construyen con CONCURRENTLY (sin bloquear las escrituras), así
+# que cada sentencia va en su propia transacción. En una tabla particionada no se admite
+# CONCURRENTLY, pero particiones.migrar ya crea ahí los índices nuevos.
+MIGRACION_INDICES_FILTROS = [
+    ('idx_hechos_ventas_fecha_sucursal',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_hechos_ventas_fecha_sucursal ON Hechos_Ventas (id_fecha, id_sucursal)'),
+    ('idx_resumen_diario_sucursal_fecha',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_resumen_diario_sucursal_fecha '
+     'ON Resumen_Ventas_Diario (id_sucursal, id_fecha)'),
+    ('idx_resumen_diario_producto_fecha',
+     'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_resumen_diario_producto_fecha '
+     'ON Resumen_Ventas_Diario (id_producto, id_fecha)'),
+]
+INDICES_REEMPLAZADOS = ['idx_hechos_ventas_id_fecha', 'idx_resumen_diario_sucursal', 'idx_resumen_diario_producto']
+
+# Estado de un índice: None si no existe, False si quedó inválido (CONCURRENTLY interrumpido)
+QUERY_INDICE_VALIDO = 'SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)'
+
+# Modificaciones y borrados de ventas ya acumuladas (id_venta hasta la marca de agua): cada
+# sentencia resta las filas anteriores y suma las nuevas. La fila de control se bloquea para
+# esperar a un refresco en curso y ver su marca de agua ya confirmada. TRUNCATE vacía el resumen;
+# DETACH PARTITION (particiones.rotar) no dispara nada y el resumen conserva esos meses.
+DDL_AJUSTES_RESUMEN = '''
+    CREATE OR REPLACE FUNCTION ajustar_resumen_diario() RETURNS trigger AS $$
+    DECLARE
+        marca BIGINT;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            TRUNCATE Resumen_Ventas_Diario;
+            RETURN NULL;
+        END IF;
+        SELECT ultimo_id_venta INTO marca FROM Control_Rollups
+        WHERE nombre = 'Resumen_Ventas_Diario' FOR UPDATE;
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO Resumen_Ventas_Diario AS r
+                (id_fecha, id_sucursal, id_producto, id_metodo_pago, num_ventas, suma_cantidad, suma_total)
+            SELECT id_fecha, id_sucursal, id_producto, id_metodo_pago,
+                   SUM(signo), SUM(signo * cantidad), SUM(signo * total)
+            FROM (SELECT -1 AS signo, * FROM viejas UNION ALL SELECT 1, * FROM nuevas) AS d
+            WHERE id_venta <= marca
+            GROUP BY id_fecha, id_sucursal, id_producto, id_metodo_pago
+            ON CONFLICT (id_fecha, id_sucursal, id_producto, id_metodo_pago) DO UPDATE
+            SET num_ventas = r.num_ventas + EXCLUDED.num_ventas,
+                suma_cantidad = r.suma_cantidad + EXCLUDED.suma_cantidad,
+                suma_total = r.suma_total + EXCLUDED.suma_total;
+        ELSE
+            UPDATE Resumen_Ventas_Diario AS r
+            SET num_ventas = r.num_ventas - d.num_ventas,
+                suma_cantidad = r.suma_cantidad - d.suma_cantidad,
+                suma_total = r.suma_total - d.suma_total
+            FROM (SELECT id_fecha, id_sucursal, id_producto, id_metodo_pago,
+                         COUNT(*) AS num_ventas, SUM(cantidad) AS suma_cantidad, SUM(total) AS suma_total
+                  FROM viejas WHERE id_venta <= marca
+                  GROUP BY id_fecha, id_sucursal, id_producto, id_metodo_pago) AS d
+            WHERE (r.id_fecha, r.id_sucursal, r.id_producto, r.id_metodo_pago)
+                = (d.id_fecha, d.id_sucursal, d.id_producto, d.id_metodo_pago);
+        END IF;
+        -- Las combinaciones que se quedaron sin ventas desaparecen del resumen
+        DELETE FROM Resumen_Ventas_Diario AS r
+        USING (SELECT DISTINCT id_fecha, id_sucursal, id_producto, id_metodo_pago
+               FROM viejas WHERE id_venta <= marca) AS v
+        WHERE r.num_ventas <= 0
+          AND (r.id_fecha, r.id_sucursal, r.id_producto, r.id_metodo_pago)
+            = (v.id_fecha, v.id_sucursal, v.id_producto, v.id_metodo_pago);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- PostgreSQL no admite tablas de transición en disparadores de varios eventos
+    DROP TRIGGER IF EXISTS trg_hechos_ventas_resumen_upd ON Hechos_Ventas;
+    CREATE TRIGGER trg_hechos_ventas_resumen_upd
+        AFTER UPDATE ON Hechos_Ventas REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION ajustar_resumen_diario();
+    DROP TRIGGER IF EXISTS trg_hechos_ventas_resumen_del ON Hechos_Ventas;
+    CREATE TRIGGER trg_hechos_ventas_resumen_del
+        AFTER DELETE ON Hechos_Ventas REFERENCING OLD TABLE AS viejas
+        FOR EACH STATEMENT EXECUTE FUNCTION ajustar_resumen_diario();
+    DROP TRIGGER IF EXISTS trg_hechos_ventas_resumen_trunc ON Hechos_Ventas;
+    CREATE TRIGGER trg_hechos_ventas_resumen_trunc
+        AFTER TRUNCATE ON Hechos_Ventas
+        FOR EACH STATEMENT EXECUTE FUNCTION ajustar_resumen_diario();
+'''
+
+# Esquema al día: existe la tabla de control con el candidato a marca de agua
+QUERY_ESQUEMA_RESUMEN = '''
+    SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'control_rollups' AND column_name = 'pendiente_xid')
+'''
+
+# Índices sobre las claves foráneas de la tabla de hechos. (id_fecha, id_sucursal) sirve a las
+# consultas filtradas por rango de fechas y sucursal (exportación) y reemplaza al de id_fecha.
+DDL_INDICES_HECHOS = '''
+    CREATE INDEX IF NOT EXISTS idx_hechos_ventas_fecha_sucursal ON Hechos_Ventas (id_fecha, id_sucursal);
+    CREATE INDEX IF NOT EXISTS idx_hechos_ventas_id_sucursal ON Hechos_Ventas (id_sucursal);
+    CREATE INDEX IF NOT EXISTS idx_hechos_ventas_id_producto ON Hechos_Ventas (id_producto);
+    CREATE INDEX IF NOT EXISTS idx_hechos_ventas_id_cliente ON Hechos_Ventas (id_cliente);
+    CREATE INDEX IF NOT EXISTS idx_hechos_ventas_id_metodo_pago ON Hechos_Ventas (id_metodo_pago);
+'''
+
+# Acumula en el resumen solo las ventas nuevas (id_venta mayor que la marca de agua)
+QUERY_REFRESCO_INCREMENTAL = '''
+    INSERT INTO Resumen_Ventas_Diario AS r
+        (id_fecha, id_sucursal, id_producto, id_metodo_pago, num_ventas, suma_cantidad, suma_total)
+    SELECT id_fecha, id_sucursal, id_producto, id_metodo_pago,
+           COUNT(*), SUM(cantidad), SUM(total)
+    FROM Hechos_Ventas
+    WHERE id_venta > %(desde)s AND id_venta <= %(hasta)s
+    GROUP BY id_fecha, id_sucursal, id_producto, id_metodo_pago
+    ON CONFLICT (id_fecha, id_sucursal, id_producto, id_metodo_pago) DO UPDATE
+    SET num_ventas = r.num_ventas + EXCLUDED.num_ventas,
+        suma_cantidad = r.suma_cantidad + EXCLUDED.suma_cantidad,
+        suma_total = r.suma_total + EXCLUDED.suma_total
+'''
+
+# Cada cuántos segundos el tablero vuelve a mirar si hay ventas nuevas que acumular
+INTERVALO_REFRESCO_SEGUNDOS = 30
+
+# Pausa entre refrescos mientras se espera a que avance el horizonte seguro (reconstrucción)
+ESPERA_HORIZONTE_SEGUNDOS = 1
+
+# Refrescos seguidos sin avance antes de abandonar la reconstrucción (transacciones abiertas)
+MAX_ESPERAS_HORIZONTE = 300
+
+# Marca de agua guardada y mayor id_venta visible ahora, para saber si la reconstrucción terminó
+QUERY_AVANCE_RECONSTRUCCION = '''
+    SELECT ultimo_id_venta, (SELECT COALESCE(MAX(id_venta), 0) FROM Hechos_Ventas)
+    FROM Control_Rollups WHERE nombre = 'Resumen_Ventas_Diario'
+'''
+
+AVISO_SIN_RESUMEN = ('Falta Resumen_Ventas_Diario o es de una versión anterior: ejecute "python rollups.py crear" '
+                     'antes de abrir el tablero')
+
+_ultimo_refresco = 0.0
+_candado_refresco = threading.Lock()
+
+
+# Crear los resúmenes, la tabla de control, sus disparadores y los índices de la tabla de hechos
+def crear_rollups():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute(DDL_INDICES_HECHOS)
+            cur.execute(DDL_ROLLUPS)
+            cur.execute(DDL_AJUSTES_RESUMEN)
+
+
+# Aplica MIGRACION_INDICES_FILTROS en una conexión en autocommit; devuelve los índices creados
+# y los quitados. Un índice inválido de un intento anterior se borra y se vuelve a construir.
+def migrar_indices():
+    import psycopg2
+
+    from particiones import es_particionada
+
+    creados, quitados = [], []
+    conn = psycopg2.connect(**PARAMETROS_CONEXION)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            particionada = es_particionada(cur)
+            for indice, sentencia in MIGRACION_INDICES_FILTROS:
+                if particionada and indice.startswith('idx_hechos_ventas'):
+                    continue
+                cur.execute(QUERY_INDICE_VALIDO, (indice,))
+                fila = cur.fetchone()
+                if fila is not None and fila[0]:
+                    continue
+                if fila is not None:
+                    cur.execute(f'DROP INDEX CONCURRENTLY {indice}')
+                cur.execute(sentencia)
+                creados.append(indice)
+            for indice in INDICES_REEMPLAZADOS:
+                cur.execute(QUERY_INDICE_VALIDO, (indice,))
+                if cur.fetchone() is not None:
+                    cur.execute(f'DROP INDEX CONCURRENTLY {indice}')
+                    quitados.append(indice)
+    finally:
+        conn.close()
+    return creados, quitados
+
+
+# Acumular las ventas nuevas hasta el horizonte seguro; devuelve cuántos id_venta nuevos se cubrieron
+def refrescar_rollups():
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            # El bloqueo de la fila de control evita dos refrescos simultáneos
+            cur.execute('''
+                SELECT ultimo_id_venta, pendiente_id_venta, pendiente_xid FROM Control_Rollups
+                WHERE nombre = 'Resumen_Ventas_Diario' FOR UPDATE
+            ''')
+            desde, pendiente_id, pendiente_xid = cur.fetchone()
+            anterior = None if pendiente_id is None else (pendiente_id, pendiente_xid)
+            hasta, pendiente = horizonte_ventas(cur, anterior)
+            hasta = desde if hasta is None else max(hasta, desde)
+            if hasta == desde and pendiente == anterior:
+                return 0
+            if hasta > desde:
+                cur.execute(QUERY_REFRESCO_INCREMENTAL, {"desde": desde, "hasta": hasta})
+            cur.execute('''
+                UPDATE Control_Rollups
+                SET ultimo_id_venta = %(hasta)s, pendiente_id_venta = %(pendiente_id)s,
+                    pendiente_xid = %(pendiente_xid)s, actualizado = now()
+                WHERE nombre = 'Resumen_Ventas_Diario'
+            ''', {"hasta": hasta, "pendiente_id": pendiente[0] if pendiente else None,
+                  "pendiente_xid": pendiente[1] if pendiente else None})
+            return hasta - desde
+
+
+# Reconstrucción completa (por ejemplo tras cargar ventas con los disparadores desactivados).
+# Con transacciones en curso el horizonte avanza por pasos, así que se repite hasta que la marca
+# de agua cubre todas las ventas que había al empezar (y que siguen existiendo).
+def reconstruir_rollups():
+    crear_rollups()
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE Resumen_Ventas_Diario")
+            cur.execute('''
+                UPDATE Control_Rollups
+                SET ultimo_id_venta = 0, pendiente_id_venta = NULL, pendiente_xid = NULL, actualizado = now()
+                WHERE nombre = 'Resumen_Ventas_Diario'
+            ''')
+            cur.execute("SELECT COALESCE(MAX(id_venta), 0) FROM Hechos_Ventas")
+            objetivo = cur.fetchone()[0]
+    filas = refrescar_rollups()
+    esperas = 0
+    while True:
+        with conexion() as conn:
+            with conn.cursor() as cur:
+                cur.execute(QUERY_AVANCE_RECONSTRUCCION)
+                marca, maximo = cur.fetchone()
+        # La venta con el id objetivo puede haberse borrado durante la reconstrucción
+        if marca >= min(objetivo, maximo):
+            return filas
+        if esperas >= MAX_ESPERAS_HORIZONTE:
+            raise RuntimeError(f"El horizonte seguro no pasa de id_venta {marca} (objetivo {objetivo}): "
+                               "hay transacciones abiertas; vuelva a reconstruir cuando terminen")
+        time.sleep(ESPERA_HORIZONTE_SEGUNDOS)
+        avance = refrescar_rollups()
+        filas += avance
+        esperas = 0 if avance else esperas + 1
+
+
+# Llamada desde el tablero: acumula lo nuevo como mucho cada intervalo. No crea nada (los índices
+# sobre Hechos_Ventas y la primera carga del resumen bloquean y tardan): eso es `python rollups.py
+# crear`. Devuelve False si el resumen todavía no existe.
+def refrescar_si_necesario(forzar=False):
+    global _ultimo_refresco
+    with _candado_refresco:
+        if not forzar and time.monotonic() - _ultimo_refresco < INTERVALO_REFRESCO_SEGUNDOS:
+            return True
+        with conexion() as conn:
+            with conn.cursor() as cur:
+                cur.execute(QUERY_ESQUEMA_RESUMEN)
+                existe = cur.fetchone()[0]
+        if not existe:
+            return False
+        if refrescar_rollups() > 0:
+            # Los resultados en caché se calcularon sobre el resumen anterior
+            cache_consultas.limpiar()
+        _ultimo_refresco = time.monotonic()
+        return True
+
+
+if __name__ == "__main__":
+    # Uso: python rollups.py [crear|refrescar|reconstruir|migrar]
+    accion = sys.argv[1] if len(sys.argv) > 1 else "refrescar"
+    inicio = time.perf_counter()
+    if accion == "migrar":
+        creados, quitados = migrar_indices()
+        print(f"migrar: índices creados {creados or 'ninguno'}, quitados {quitados or 'ninguno'} "
+              f"en {time.perf_counter() - inicio:.2f} s")
+    else:
+        if accion == "reconstruir":
+            filas = reconstruir_rollups()
+        else:
+            if accion == "crear":
+                crear_rollups()
+            filas = refrescar_rollups()
+        print(f"{accion}: {filas} ventas acumuladas en {time.perf_counter() - inicio:.2f} s")
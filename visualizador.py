@@ -1,63 +1,126 @@
 import streamlit as st
-import psycopg2
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import zipfile
-import io
-
-# Configuración de conexión a PostgreSQL
-conexion = psycopg2.connect(
-    dbname="dpanchita2",
-    user="postgres",
-    password="123456",
-    host="localhost",  # o la IP de tu servidor
-    port="5432"        # Puerto por defecto de PostgreSQL
-)
-
-# Función para obtener datos de la base de datos
-def obtener_datos(query):
-    return pd.read_sql(query, conexion)
-
-# Función para generar archivos CSV y comprimirlos en un ZIP
-def crear_zip_con_datos(dfs, nombres_archivos):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for df, nombre in zip(dfs, nombres_archivos):
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            zip_file.writestr(f"{nombre}.csv", csv_buffer.getvalue())
-    return zip_buffer
+
+# Las consultas pasan por el pool de conexiones y la caché compartida de acceso_datos
+# (psycopg2 y la conexión se cargan con la primera consulta, no al importar)
+from acceso_datos import cache_consultas, obtener_datos
+from rollups import AVISO_SIN_RESUMEN, refrescar_si_necesario
+from cubo_ventas import obtener_cubo
+from consultas_tablero import QUERY_GENEROS, Filtros, consulta_hechos, obtener_reporte, opciones_filtros
+from refresco_tablero import ACTIVO as REFRESCO_EN_FONDO, ESPERA_PRIMERA_SEGUNDOS, obtener_refrescador
+from cache_figuras import figura, tabla
+from exportacion import FORMATOS, crear_zip
+from instrumentacion import finalizar_ejecucion, iniciar_ejecucion, marcar, tramo
+
+# Tramos de tiempo de esta ejecución (panel de perfilado en la barra lateral)
+iniciar_ejecucion('visualizador')
+
+# Visualización en Streamlit: el título se envía antes de tocar la base de datos (primer pintado)
+st.title('Análisis de Ventas por Día de la Semana y Producto')
+marcar('primer_pintado')
+
+# Los reportes sin filtros salen de la instantánea que prepara un hilo en segundo plano (avisos
+# LISTEN/NOTIFY de Hechos_Ventas y refresco programado): la ejecución no espera a PostgreSQL y
+# muestra la última instantánea mientras se calcula la siguiente. Solo la primera vez se espera.
+refrescador = obtener_refrescador() if REFRESCO_EN_FONDO else None
+instantanea = refrescador.instantanea() if refrescador else None
+if refrescador and instantanea is None:
+    with st.spinner('Preparando los reportes...'):
+        instantanea = refrescador.instantanea(espera=ESPERA_PRIMERA_SEGUNDOS)
+
+# Sin instantánea (refresco desactivado o error de conexión) se consulta como antes: los reportes
+# leen Resumen_Ventas_Diario y se acumulan las ventas nuevas antes de consultar
+if instantanea is None:
+    with st.spinner('Actualizando el resumen de ventas...'):
+        resumen_listo = refrescar_si_necesario()
+    if not resumen_listo:
+        st.error(AVISO_SIN_RESUMEN)
+        st.stop()
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre',
+         'Noviembre', 'Diciembre']
+
+# Función para la barra de filtros. Lo que queda en su valor inicial no se filtra, así la vista
+# sin filtros sigue usando las mismas consultas (y la misma caché) que antes.
+def barra_filtros(opciones):
+    desde, hasta = opciones['desde'], opciones['hasta']
+    if desde is None:
+        return Filtros()
+    with st.expander('Filtros', expanded=True):
+        col_fechas, col_calendario, col_dimensiones = st.columns(3)
+        rango = col_fechas.date_input('Rango de fechas', value=(desde, hasta), min_value=desde, max_value=hasta)
+        anios = col_fechas.multiselect('Año', list(range(desde.year, hasta.year + 1)))
+        trimestres = col_calendario.multiselect('Trimestre', [1, 2, 3, 4])
+        meses = col_calendario.multiselect('Mes', list(range(1, 13)), format_func=lambda m: MESES[m - 1])
+        sucursales = opciones['sucursales'].set_index('id_sucursal')['nombre']
+        categorias = opciones['categorias'].set_index('id_categoria')['nombre']
+        ids_sucursales = col_dimensiones.multiselect('Sucursal', list(sucursales.index),
+                                                     format_func=lambda i: sucursales[i])
+        ids_categorias = col_dimensiones.multiselect('Categoría', list(categorias.index),
+                                                     format_func=lambda i: categorias[i])
+    rango = tuple(rango) if isinstance(rango, (tuple, list)) else (rango,)
+    return Filtros(
+        fecha_desde=rango[0] if rango and rango[0] > desde else None,
+        fecha_hasta=rango[1] if len(rango) == 2 and rango[1] < hasta else None,
+        anios=tuple(anios),
+        trimestres=tuple(trimestres),
+        meses=tuple(meses),
+        sucursales=tuple(int(i) for i in ids_sucursales),
+        categorias=tuple(int(i) for i in ids_categorias),
+    )
+
+filtros = barra_filtros(opciones_filtros(instantanea.datos if instantanea else None))
+
+# Modo cubo: un solo extracto por refresco y todos los agregados calculados en memoria. Con filtros
+# activos los reportes se piden a PostgreSQL con los filtros en el WHERE, en lugar de recortar el cubo.
+# Con la instantánea de fondo disponible el cubo es opcional (su construcción sí espera a la base).
+modo_cubo = st.sidebar.checkbox('Calcular reportes en memoria (cubo de ventas)', value=False)
+usar_cubo = modo_cubo and not filtros.activos()
+if filtros.activos():
+    st.caption('Filtros activos: los reportes se calculan en PostgreSQL solo con las ventas filtradas.')
+elif instantanea is not None and not usar_cubo:
+    actualizando = ' (actualizando en segundo plano)' if refrescador.refrescando else ''
+    st.caption(f'Reportes calculados hace {instantanea.edad:.0f} s{actualizando}.')
+    if refrescador.ultimo_error is not None:
+        st.caption(f'No se pudo actualizar: {refrescador.ultimo_error}')
+with st.spinner('Cargando el cubo de ventas...'):
+    cubo = obtener_cubo() if usar_cubo else None
+
+# Función para obtener un reporte: con filtros se consulta PostgreSQL; sin filtros se calcula en
+# el cubo o se lee de la instantánea (y sin ninguno de los dos, de la caché de consultas)
+def reporte(nombre):
+    if filtros.activos():
+        return obtener_reporte(nombre, filtros)
+    if usar_cubo:
+        return getattr(cubo, f'ventas_{nombre}')()
+    if instantanea is not None:
+        return instantanea.reporte(nombre)
+    return obtener_reporte(nombre)
+
+# Función para mostrar una figura de Plotly midiendo su serialización y envío al navegador. Las
+# figuras salen de la caché de figuras: cambiar de reporte o de tipo de gráfico no las reconstruye.
+def mostrar_grafico(fig):
+    with tramo('plotly_chart', 'grafico'):
+        st.plotly_chart(fig)
+
+# Función para generar archivos CSV (o Parquet) y comprimirlos en un ZIP. Acepta DataFrames o
+# consultas SQL (con sus parámetros); las consultas se transmiten por bloques desde PostgreSQL.
+def crear_zip_con_datos(dfs, nombres_archivos, formato='CSV'):
+    return crear_zip(dfs, nombres_archivos, formato)
 
 ########
 
-# Consulta para obtener la media de la cantidad de producto vendido y el total por día de la semana, desglosado por producto
-query_cantidad_total_por_dia_semana_producto = '''
-    SELECT f.dia_semana AS dia_semana,
-           p.nombre AS nombre_producto,
-           AVG(hv.cantidad) AS promedio_cantidad_vendida,
-           SUM(hv.total) AS total_ventas_dia
-    FROM Hechos_Ventas hv
-    JOIN Dim_Fecha f ON hv.id_fecha = f.id_fecha
-    JOIN Dim_Productos p ON hv.id_producto = p.id_producto
-    GROUP BY f.dia_semana, p.nombre
-    ORDER BY 
-        CASE 
-            WHEN f.dia_semana = 'Lunes' THEN 1
-            WHEN f.dia_semana = 'Martes' THEN 2
-            WHEN f.dia_semana = 'Miércoles' THEN 3
-            WHEN f.dia_semana = 'Jueves' THEN 4
-            WHEN f.dia_semana = 'Viernes' THEN 5
-            WHEN f.dia_semana = 'Sábado' THEN 6
-            WHEN f.dia_semana = 'Domingo' THEN 7
-        END, p.nombre
-'''
-
-# Ejecutar la consulta y cargar los datos en un DataFrame
-df_ventas_dia_semana_producto = obtener_datos(query_cantidad_total_por_dia_semana_producto)
-
-# Visualización en Streamlit
-st.title('Análisis de Ventas por Día de la Semana y Producto')
+# Media de la cantidad de producto vendido y total por día de la semana, desglosado por producto
+df_ventas_dia_semana_producto = reporte('dia_semana_producto')
+
+# Versión de los datos mostrados, parte de la clave de las figuras y tablas en caché: el número de
+# la instantánea o, si se consulta PostgreSQL o el cubo, los filtros y la generación de la caché
+# de consultas (que cambia cuando cambia Hechos_Ventas; la consulta de arriba ya lo comprobó)
+if instantanea is not None and not filtros.activos() and not usar_cubo:
+    version_datos = ('instantanea', instantanea.numero)
+else:
+    version_datos = (filtros, usar_cubo, cache_consultas.generacion)
+version_generos = ('instantanea', instantanea.numero) if instantanea else cache_consultas.generacion
 
 # Mostrar la tabla con la media de la cantidad de producto vendido y el total por día de la semana
 st.subheader('Media de la Cantidad de Producto Vendido y Total por Día de la Semana, Desglosado por Producto')
@@ -67,30 +130,42 @@ st.write(df_ventas_dia_semana_producto)
 st.subheader('Media de Cantidad de Producto Vendido por Día de la Semana y Producto')
 
 # Usamos un gráfico de barras apiladas para mostrar los productos y sus cantidades vendidas por día
-st.bar_chart(df_ventas_dia_semana_producto.pivot_table(index='dia_semana', columns='nombre_producto', values='promedio_cantidad_vendida'))
+pivot_promedio = tabla('dia_semana_producto', 'promedio_cantidad', version_datos,
+                       lambda: df_ventas_dia_semana_producto.pivot_table(index='dia_semana', columns='nombre_producto', values='promedio_cantidad_vendida'))
+st.bar_chart(pivot_promedio)
 
 # Gráfica del total de ventas por día de la semana, desglosado por producto
 st.subheader('Total de Ventas por Día de la Semana y Producto')
 
 # Gráfico de barras apiladas para mostrar el total de ventas por producto y día de la semana
-st.bar_chart(df_ventas_dia_semana_producto.pivot_table(index='dia_semana', columns='nombre_producto', values='total_ventas_dia'))
+pivot_total = tabla('dia_semana_producto', 'total_ventas', version_datos,
+                    lambda: df_ventas_dia_semana_producto.pivot_table(index='dia_semana', columns='nombre_producto', values='total_ventas_dia'))
+st.bar_chart(pivot_total)
 
 ##############3
 
-# Consulta para obtener el total de ventas por mes
-query_ventas_mes = '''
-    SELECT d.mes, SUM(hv.total) AS total_ventas
-    FROM Hechos_Ventas hv
-    JOIN Dim_Fecha d ON hv.id_fecha = d.id_fecha
-    GROUP BY d.mes
-    ORDER BY d.mes
-'''
+# Total de ventas por mes
+df_ventas_mes = reporte('mes')
 
-df_ventas_mes = obtener_datos(query_ventas_mes)
+# Exportación de datos: la tabla de hechos (con los mismos filtros) y los reportes de ventas
+st.sidebar.subheader('Exportar datos')
+formato_exportacion = st.sidebar.selectbox('Formato', FORMATOS)
+if st.sidebar.button('Preparar ZIP'):
+    archivo_zip = crear_zip_con_datos(
+        [consulta_hechos(filtros), df_ventas_dia_semana_producto, df_ventas_mes],
+        ['hechos_ventas', 'ventas_dia_semana_producto', 'ventas_mes'],
+        formato_exportacion
+    )
+    st.sidebar.download_button('Descargar ZIP', data=archivo_zip, file_name='datos_ventas.zip', mime='application/zip')
 
 # Título de la aplicación
 st.title('Reportes de Ventas - Doña Panchita')
 
+# Plotly solo lo usan los reportes de abajo: se importa aquí, después de que las tablas y los
+# gráficos nativos de arriba ya se enviaron al navegador
+import plotly.express as px
+import plotly.graph_objects as go
+
 # Menú lateral para seleccionar el reporte
 opciones = ['Univariados', 'Bivariados']
 reporte_seleccionado = st.sidebar.selectbox('Selecciona el reporte', opciones)
@@ -99,60 +174,42 @@ if reporte_seleccionado == 'Univariados':
     st.header('Reportes Univariados')
 
     # Reporte: Distribución de Ventas por Sucursal
-    sucursales = obtener_datos(''' 
-        SELECT s.nombre, COUNT(hv.id_venta) AS total_ventas
-        FROM Hechos_Ventas hv
-        JOIN Dim_Sucursales s ON hv.id_sucursal = s.id_sucursal
-        GROUP BY s.nombre
-    ''')
     st.subheader('Distribución de Ventas por Sucursal')
     grafico_sucursales = st.selectbox('Selecciona el tipo de gráfico', ['Barra', 'Pastel'])
     if grafico_sucursales == 'Barra':
         # Gráfico de barra interactivo
-        fig = px.bar(sucursales, x='nombre', y='total_ventas', title='Ventas por Sucursal', 
-                     labels={'nombre': 'Sucursal', 'total_ventas': 'Total de Ventas'}, 
-                     text='total_ventas')
-        fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
-        st.plotly_chart(fig)
+        def construir():
+            fig = px.bar(reporte('sucursal'), x='nombre', y='total_ventas', title='Ventas por Sucursal', 
+                         labels={'nombre': 'Sucursal', 'total_ventas': 'Total de Ventas'}, 
+                         text='total_ventas')
+            fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
+            return fig
     else:
         # Gráfico de pastel interactivo
-        # Crear gráfico de pastel
-        fig = px.pie(sucursales, names='nombre', values='total_ventas', title='Distribución de Ventas por Sucursal')
-        # Actualizar el gráfico para agregar texto con etiquetas y porcentajes
-        fig.update_traces(textinfo='label+percent', pull=[0.1, 0.1, 0.1])  # Personalizar el texto
-
-        st.plotly_chart(fig)
+        def construir():
+            # Crear gráfico de pastel
+            fig = px.pie(reporte('sucursal'), names='nombre', values='total_ventas',
+                         title='Distribución de Ventas por Sucursal')
+            # Actualizar el gráfico para agregar texto con etiquetas y porcentajes
+            fig.update_traces(textinfo='label+percent', pull=[0.1, 0.1, 0.1])  # Personalizar el texto
+            return fig
+    mostrar_grafico(figura('sucursal', grafico_sucursales, version_datos, construir))
 
     # Reporte: Cantidad de Ventas por Categoría y Subcategoría de Producto
-    categorias = obtener_datos(''' 
-        SELECT c.nombre AS categoria, sc.nombre_subcategoria, COUNT(hv.id_venta) AS total_ventas
-        FROM Hechos_Ventas hv
-        JOIN Dim_Productos p ON hv.id_producto = p.id_producto
-        JOIN Dim_Subcategorias sc ON p.id_subcategoria = sc.id_subcategoria
-        JOIN Dim_Categorias c ON sc.id_categoria = c.id_categoria
-        GROUP BY c.nombre, sc.nombre_subcategoria
-        ORDER BY total_ventas DESC
-    ''')
     st.subheader('Cantidad de Ventas por Categoría y Subcategoría')
     grafico_categorias = st.selectbox('Selecciona el tipo de gráfico', ['Barra'])
     if grafico_categorias == 'Barra':
         # Gráfico de barras interactivo
-        fig = px.bar(categorias, x='total_ventas', y='categoria', color='nombre_subcategoria', 
-                     title='Ventas por Categoría y Subcategoría', 
-                     labels={'categoria': 'Categoría', 'total_ventas': 'Total de Ventas'}, 
-                     text='total_ventas', orientation='h')
-        fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
-        st.plotly_chart(fig)
+        def construir():
+            fig = px.bar(reporte('categoria_subcategoria'), x='total_ventas', y='categoria', color='nombre_subcategoria', 
+                         title='Ventas por Categoría y Subcategoría', 
+                         labels={'categoria': 'Categoría', 'total_ventas': 'Total de Ventas'}, 
+                         text='total_ventas', orientation='h')
+            fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
+            return fig
+        mostrar_grafico(figura('categoria_subcategoria', grafico_categorias, version_datos, construir))
 
     # Reporte: Distribución de Clientes por Género
-    # Obtener datos de género
-    generos = obtener_datos(''' 
-        SELECT g.genero, COUNT(c.id_cliente) AS total_clientes
-        FROM Dim_Clientes c
-        JOIN Dim_Genero g ON c.id_genero = g.id_genero
-        GROUP BY g.genero
-    ''')
-
     # Título de la sección
     st.subheader('Distribución de Clientes por Género')
 
@@ -161,25 +218,22 @@ if reporte_seleccionado == 'Univariados':
 
     # Si elige "Pie chart"
     if grafico_genero == 'Pie chart':
-        # Crear el gráfico de pastel
-        fig = px.pie(generos, names='genero', values='total_clientes', 
-                    title='Distribución de Clientes por Género')
-        
-        # Configurar el texto y la información del hover
-        fig.update_traces(textinfo='label+percent', hoverinfo='label+percent+value')
+        def construir():
+            # Obtener datos de género
+            generos = instantanea.reporte('generos') if instantanea else obtener_datos(QUERY_GENEROS)
 
-        # Mostrar el gráfico en Streamlit
-        st.plotly_chart(fig)
+            # Crear el gráfico de pastel
+            fig = px.pie(generos, names='genero', values='total_clientes', 
+                        title='Distribución de Clientes por Género')
+            
+            # Configurar el texto y la información del hover
+            fig.update_traces(textinfo='label+percent', hoverinfo='label+percent+value')
+            return fig
 
-    # Reporte: Métodos de Pago Utilizados
-    # Obtener datos de métodos de pago
-    metodos_pago = obtener_datos(''' 
-        SELECT mp.metodo_pago, COUNT(hv.id_venta) AS total_ventas
-        FROM Hechos_Ventas hv
-        JOIN Dim_Metodos_Pago mp ON hv.id_metodo_pago = mp.id_metodo_pago
-        GROUP BY mp.metodo_pago
-    ''')
+        # Mostrar el gráfico en Streamlit (los géneros no dependen de los filtros)
+        mostrar_grafico(figura('generos', grafico_genero, version_generos, construir))
 
+    # Reporte: Métodos de Pago Utilizados
     # Título de la sección
     st.subheader('Métodos de Pago Utilizados')
 
@@ -188,83 +242,70 @@ if reporte_seleccionado == 'Univariados':
 
     # Si elige "Pie chart"
     if grafico_metodos_pago == 'Pie chart':
-        # Crear el gráfico de pastel
-        fig = px.pie(metodos_pago, names='metodo_pago', values='total_ventas', 
-                    title='Métodos de Pago Utilizados')
-        
-        # Configurar el texto y la información del hover
-        fig.update_traces(textinfo='label+percent', hoverinfo='label+percent+value')
-
-        # Mostrar el gráfico en Streamlit
-        st.plotly_chart(fig)
+        def construir():
+            # Crear el gráfico de pastel
+            fig = px.pie(reporte('metodo_pago'), names='metodo_pago', values='total_ventas', 
+                        title='Métodos de Pago Utilizados')
+            
+            # Configurar el texto y la información del hover
+            fig.update_traces(textinfo='label+percent', hoverinfo='label+percent+value')
+            return fig
 
     # Si elige "Barra"
     else:
-        # Crear el gráfico de barras
-        fig = px.bar(metodos_pago, x='metodo_pago', y='total_ventas', 
-                    title='Métodos de Pago Utilizados', 
-                    labels={'metodo_pago': 'Método de Pago', 'total_ventas': 'Total de Ventas'}, 
-                    text='total_ventas')
-        
-        # Configurar el texto de las barras y la información del hover
-        fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
+        def construir():
+            # Crear el gráfico de barras
+            fig = px.bar(reporte('metodo_pago'), x='metodo_pago', y='total_ventas', 
+                        title='Métodos de Pago Utilizados', 
+                        labels={'metodo_pago': 'Método de Pago', 'total_ventas': 'Total de Ventas'}, 
+                        text='total_ventas')
+            
+            # Configurar el texto de las barras y la información del hover
+            fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
+            return fig
 
-        # Mostrar el gráfico en Streamlit
-        st.plotly_chart(fig)
-        
-    
+    # Mostrar el gráfico en Streamlit
+    mostrar_grafico(figura('metodo_pago', grafico_metodos_pago, version_datos, construir))
         
 elif reporte_seleccionado == 'Bivariados':
     st.header('Reportes Bivariados')
     #reporte 1
-    # Obtener datos de ventas por sucursal y fecha
-    ventas_sucursal_fecha = obtener_datos(''' 
-        SELECT s.nombre AS sucursal, f.dia_semana, SUM(hv.total) AS total_ventas
-        FROM Hechos_Ventas hv
-        JOIN Dim_Sucursales s ON hv.id_sucursal = s.id_sucursal
-        JOIN Dim_Fecha f ON hv.id_fecha = f.id_fecha
-        GROUP BY s.nombre, f.dia_semana
-        ORDER BY total_ventas DESC
-    ''')
-
     # Título de la sección
     st.subheader('Total de Ventas por Sucursal y por Fecha')
 
-    # Gráfico de heatmap
-    ventas_sucursal_fecha_pivot = ventas_sucursal_fecha.pivot(index='sucursal', columns='dia_semana', values='total_ventas')
+    # Gráfico de heatmap sobre las ventas por sucursal y día de la semana
+    def construir():
+        ventas_sucursal_fecha = reporte('sucursal_dia_semana')
+        ventas_sucursal_fecha_pivot = ventas_sucursal_fecha.pivot(index='sucursal', columns='dia_semana', values='total_ventas')
 
-    # Crear el gráfico de heatmap
-    fig = go.Figure(data=go.Heatmap(z=ventas_sucursal_fecha_pivot.values, 
-                                x=ventas_sucursal_fecha_pivot.columns, 
-                                y=ventas_sucursal_fecha_pivot.index, 
-                                colorscale='Viridis'))
+        # Crear el gráfico de heatmap
+        return go.Figure(data=go.Heatmap(z=ventas_sucursal_fecha_pivot.values, 
+                                    x=ventas_sucursal_fecha_pivot.columns, 
+                                    y=ventas_sucursal_fecha_pivot.index, 
+                                    colorscale='Viridis'))
 
     # Mostrar el gráfico en Streamlit
-    st.plotly_chart(fig)
+    mostrar_grafico(figura('sucursal_dia_semana', 'Heatmap', version_datos, construir))
 
     # Cantidad de Productos Vendidos por Categoría y por Sucursal
-    productos_categorias_sucursales = obtener_datos(''' 
-        SELECT c.nombre AS categoria, s.nombre AS sucursal, COUNT(hv.id_venta) AS total_ventas
-        FROM Hechos_Ventas hv
-        JOIN Dim_Productos p ON hv.id_producto = p.id_producto
-        JOIN Dim_Subcategorias sc ON p.id_subcategoria = sc.id_subcategoria
-        JOIN Dim_Categorias c ON sc.id_categoria = c.id_categoria
-        JOIN Dim_Sucursales s ON hv.id_sucursal = s.id_sucursal
-        GROUP BY c.nombre, s.nombre
-    ''')
     st.subheader('Cantidad de Productos Vendidos por Categoría y por Sucursal')
     grafico_prod_sucursal = st.selectbox('Selecciona el tipo de gráfico', ['Barra', 'Stacked Barra'])
     if grafico_prod_sucursal == 'Barra':
         # Gráfico de barras interactivo
-        fig = px.bar(productos_categorias_sucursales, x='total_ventas', y='categoria', color='sucursal', 
-                     title='Productos Vendidos por Categoría y Sucursal', 
-                     labels={'categoria': 'Categoría', 'total_ventas': 'Total de Ventas'}, 
-                     text='total_ventas', orientation='h')
-        fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
-        st.plotly_chart(fig)
+        def construir():
+            fig = px.bar(reporte('categoria_sucursal'), x='total_ventas', y='categoria', color='sucursal', 
+                         title='Productos Vendidos por Categoría y Sucursal', 
+                         labels={'categoria': 'Categoría', 'total_ventas': 'Total de Ventas'}, 
+                         text='total_ventas', orientation='h')
+            fig.update_traces(texttemplate='%{text}', textposition='outside', hoverinfo='x+y')
+            return fig
     else:
         # Gráfico de barras apiladas
-        fig = px.bar(productos_categorias_sucursales, x='categoria', y='total_ventas', color='sucursal', 
-                     title='Productos Vendidos por Categoría y Sucursal', 
-                     labels={'categoria': 'Categoría', 'total_ventas': 'Total de Ventas'})
-        st.plotly_chart(fig)
+        def construir():
+            return px.bar(reporte('categoria_sucursal'), x='categoria', y='total_ventas', color='sucursal', 
+                          title='Productos Vendidos por Categoría y Sucursal', 
+                          labels={'categoria': 'Categoría', 'total_ventas': 'Total de Ventas'})
+    mostrar_grafico(figura('categoria_sucursal', grafico_prod_sucursal, version_datos, construir))
+
+# Panel de perfilado (opcional) con los tiempos de esta ejecución
+finalizar_ejecucion()